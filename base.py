@@ -1,13 +1,66 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import Dict, List, Any, Optional
+from itertools import islice
+from typing import Dict, List, Any, Optional, Iterable, Iterator, Tuple
+from urllib.parse import urlsplit
 import logging
+import queue
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from .rate_limiter import get_rate_limiter
+from .record_batch import RecordBatch
 
 logger = logging.getLogger(__name__)
 
+# Pooled HTTP sessions shared by every integration instance, keyed by platform,
+# host, whether non-idempotent requests are retried and the session settings
+_http_sessions: Dict[Tuple[Any, ...], requests.Session] = {}
+_http_sessions_lock = threading.Lock()
+
+# Child accounts of manager accounts, keyed by platform and manager account
+_account_hierarchy_cache: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+_account_hierarchy_lock = threading.Lock()
+
+
+class AuthenticationError(Exception):
+    """Raised by integrations when the platform rejects the credentials"""
+    pass
+
+
+def batched(items: Iterable[Any], batch_size: int) -> Iterator[List[Any]]:
+    """Group an iterable of records or rows into lists of at most batch_size items"""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
 class BaseIntegration(ABC):
     """Base class for all marketing platform integrations"""
     
+    # Default number of records per batch yielded by iter_extract
+    DEFAULT_BATCH_SIZE = 1000
+    
+    # HTTP defaults, overridable through the http_* config keys
+    HTTP_POOL_SIZE = 10
+    HTTP_MAX_RETRIES = 3
+    HTTP_BACKOFF_FACTOR = 0.5
+    HTTP_TIMEOUT = 30
+    HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+    
+    # Requests per second and burst size per platform account (None disables
+    # limiting), overridable through the rate_limit_* config keys
+    RATE_LIMIT_PER_SECOND = None
+    RATE_LIMIT_BURST = 10
+    RATE_LIMIT_MAX_RETRIES = 3
+    RATE_LIMIT_PENALTY_SECONDS = 60
+    
     def __init__(self, credentials: Dict[str, Any], config: Dict[str, Any] = None):
         """
         Initialize the integration with credentials and configuration
@@ -62,6 +115,40 @@ class BaseIntegration(ABC):
         """
         pass
     
+    def iter_extract(self,
+                     start_date: datetime,
+                     end_date: datetime,
+                     metrics: List[str] = None,
+                     dimensions: List[str] = None,
+                     filters: Dict[str, Any] = None,
+                     batch_size: int = None) -> Iterator[RecordBatch]:
+        """
+        Extract data from the platform as a stream of bounded batches
+        
+        The default implementation adapts extract_data for connectors that
+        only return a materialized list. Connectors that can page or stream
+        should override this so memory stays flat regardless of row count,
+        building RecordBatch columns directly instead of per-row records.
+        
+        Args:
+            start_date: Start date for data extraction
+            end_date: End date for data extraction
+            metrics: List of metrics to extract
+            dimensions: List of dimensions to group by
+            filters: Additional filters to apply
+            batch_size: Maximum number of records per batch
+            
+        Returns:
+            Iterator over RecordBatch objects
+        """
+        records = self.extract_data(start_date, end_date, metrics, dimensions, filters) or []
+        for batch in batched(records, self.get_batch_size(batch_size)):
+            yield RecordBatch.from_records(batch, self.platform_name)
+    
+    def get_batch_size(self, batch_size: int = None) -> int:
+        """Resolve the batch size from the argument, the config or the default"""
+        return max(1, int(batch_size or self.config.get('batch_size') or self.DEFAULT_BATCH_SIZE))
+    
     def get_account_info(self) -> Dict[str, Any]:
         """Get basic account information (optional, can be overridden)"""
         return {
@@ -101,6 +188,136 @@ class BaseIntegration(ABC):
         
         return record
     
+    def http_request(self,
+                     method: str,
+                     url: str,
+                     rate_limited: bool = True,
+                     read_only: bool = False,
+                     rate_limit_cost: int = 1,
+                     **kwargs) -> requests.Response:
+        """
+        Send an HTTP request through the pooled session for the URL's host
+        
+        Connections are kept alive and reused across requests and
+        integration instances. 5xx responses to idempotent requests are
+        retried with exponential backoff, honouring Retry-After; other
+        requests such as POSTs are only retried when read_only is set, so a
+        report submission is never sent twice. When the integration has a
+        rate limit, each request first takes a token from the platform
+        account's bucket, and throttled requests pause the bucket and are
+        retried.
+        
+        Args:
+            method: HTTP method
+            url: Request URL
+            rate_limited: Whether the request counts against the platform quota
+            read_only: Whether a non-idempotent request (e.g. a POST that
+                only reads data) is safe to send again
+            rate_limit_cost: Tokens the request takes, e.g. one per call of a
+                batch request
+            **kwargs: Passed on to requests.Session.request
+            
+        Returns:
+            Response of the last attempt
+        """
+        kwargs.setdefault('timeout', self.config.get('http_timeout', self.HTTP_TIMEOUT))
+        session = self.get_http_session(url, retry_all_methods=read_only)
+        rate = self._get_rate_limit()
+        if not rate_limited or rate is None:
+            return session.request(method, url, **kwargs)
+        
+        limiter = get_rate_limiter()
+        key = self.config.get('rate_limit_key') or self.get_rate_limit_key()
+        burst = float(self.config.get('rate_limit_burst', self.RATE_LIMIT_BURST))
+        for attempt in range(self.RATE_LIMIT_MAX_RETRIES + 1):
+            limiter.acquire(key, rate, burst, rate_limit_cost)
+            response = session.request(method, url, **kwargs)
+            penalty = self.observe_rate_limit(response)
+            if penalty is None or attempt == self.RATE_LIMIT_MAX_RETRIES:
+                return response
+            limiter.penalize(key, penalty)
+            response.close()
+    
+    def get_rate_limit_key(self) -> str:
+        """Rate limiter bucket key for this platform account"""
+        account = self.credentials.get('account_id') or self.credentials.get('customer_id') or 'default'
+        return f'{self.platform_name}:{account}'
+    
+    def observe_rate_limit(self, response: requests.Response) -> Optional[float]:
+        """
+        Inspect a response for quota signals
+        
+        Connectors override this to adapt the limiter to platform usage
+        headers and quota errors.
+        
+        Args:
+            response: Response of a rate limited request
+            
+        Returns:
+            Seconds to pause the bucket before retrying, or None if the
+            request was not throttled
+        """
+        if response.status_code != 429:
+            return None
+        retry_after = response.headers.get('Retry-After', '')
+        return float(retry_after) if retry_after.isdigit() else self.RATE_LIMIT_PENALTY_SECONDS
+    
+    def _get_rate_limit(self) -> Optional[float]:
+        """Base request rate for this integration, or None when not limited"""
+        rate = self.config.get('rate_limit_per_second', self.RATE_LIMIT_PER_SECOND)
+        return float(rate) if rate else None
+    
+    def get_http_session(self, url: str, retry_all_methods: bool = False) -> requests.Session:
+        """
+        Return the shared session for this platform and the URL's host
+        
+        Instances whose http_* config differs get their own session, so a
+        session always matches the config of the integration using it.
+        """
+        settings = self._get_http_session_settings()
+        key = (self.platform_name, urlsplit(url).netloc, retry_all_methods) + settings
+        with _http_sessions_lock:
+            session = _http_sessions.get(key)
+            if session is None:
+                session = self._create_http_session(settings, retry_all_methods)
+                _http_sessions[key] = session
+            return session
+    
+    def _get_http_session_settings(self) -> Tuple[int, int, float, Tuple[int, ...]]:
+        """(pool size, max retries, backoff factor, retried statuses) of this instance's sessions"""
+        # 429s of rate limited integrations are left to the shared rate limiter
+        retry_statuses = tuple(
+            status for status in self.HTTP_RETRY_STATUSES
+            if status != 429 or self._get_rate_limit() is None
+        )
+        return (
+            int(self.config.get('http_pool_size', self.HTTP_POOL_SIZE)),
+            int(self.config.get('http_max_retries', self.HTTP_MAX_RETRIES)),
+            float(self.config.get('http_backoff_factor', self.HTTP_BACKOFF_FACTOR)),
+            retry_statuses
+        )
+    
+    @staticmethod
+    def _create_http_session(settings: Tuple[int, int, float, Tuple[int, ...]],
+                             retry_all_methods: bool = False) -> requests.Session:
+        """Create a keep-alive session with a sized pool and a retry policy"""
+        pool_size, max_retries, backoff_factor, retry_statuses = settings
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=retry_statuses,
+            # None retries every method, for read-only POSTs such as OAuth and GAQL
+            allowed_methods=None if retry_all_methods else Retry.DEFAULT_ALLOWED_METHODS,
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+    
     def handle_api_error(self, error: Exception, context: str = "") -> None:
         """Handle API errors with logging"""
         error_msg = f"{self.platform_name} API error"
@@ -109,11 +326,185 @@ class BaseIntegration(ABC):
         error_msg += f": {str(error)}"
         
         logger.error(error_msg)
+        if isinstance(error, AuthenticationError):
+            # Callers rely on the type to trigger credential revalidation
+            raise AuthenticationError(error_msg) from error
         raise Exception(error_msg) from error
 
 
+class FanOutMixin(ABC):
+    """
+    Fan-out over the child accounts of a manager account
+    
+    Mixed into the integrations of platforms with manager accounts (Google
+    Ads MCCs, Facebook Business Managers), ahead of BaseIntegration. With
+    the fan_out config key set, their iter_extract extracts every child
+    account through iter_fan_out.
+    """
+    
+    # Worker threads, overridable with the fan_out_max_workers config key
+    FAN_OUT_MAX_WORKERS = 4
+    ACCOUNT_HIERARCHY_TTL_SECONDS = 3600
+    # Whether child accounts draw from the manager account's rate limit bucket
+    FAN_OUT_SHARED_RATE_LIMIT = False
+    
+    def is_fan_out(self) -> bool:
+        """Whether extraction fans out over the child accounts of a manager account"""
+        return bool(self.config.get('fan_out'))
+    
+    @abstractmethod
+    def list_child_accounts(self) -> List[Dict[str, Any]]:
+        """
+        List the accounts managed by the credential's manager account
+        
+        Returns:
+            Child accounts with at least an 'id' and a 'name'
+        """
+        pass
+    
+    @abstractmethod
+    def for_account(self, account_id: str) -> BaseIntegration:
+        """Create an integration for one child account of the manager account"""
+        pass
+    
+    def get_child_accounts(self, force_refresh: bool = False) -> List[Dict[str, Any]]:
+        """
+        Return the child accounts, listing them at most once per TTL
+        
+        Args:
+            force_refresh: List the accounts even if a cached hierarchy exists
+            
+        Returns:
+            Child accounts, restricted to the account_ids config key if set
+        """
+        key = self.get_rate_limit_key()
+        with _account_hierarchy_lock:
+            cached = _account_hierarchy_cache.get(key)
+        if cached and not force_refresh and time.time() - cached[0] < self.ACCOUNT_HIERARCHY_TTL_SECONDS:
+            accounts = cached[1]
+        else:
+            accounts = self.list_child_accounts()
+            with _account_hierarchy_lock:
+                _account_hierarchy_cache[key] = (time.time(), accounts)
+            logger.info(f"Found {len(accounts)} child accounts for {key}")
+        
+        account_ids = self.config.get('account_ids')
+        if account_ids:
+            wanted = {str(account_id) for account_id in account_ids}
+            accounts = [account for account in accounts if str(account['id']) in wanted]
+        return accounts
+    
+    def iter_fan_out(self,
+                     start_date: datetime,
+                     end_date: datetime,
+                     metrics: List[str] = None,
+                     dimensions: List[str] = None,
+                     filters: Dict[str, Any] = None,
+                     batch_size: int = None) -> Iterator[RecordBatch]:
+        """
+        Extract all child accounts concurrently as one stream of batches
+        
+        Each child account is extracted in a worker thread under the
+        platform rate limit. Batches are merged in arrival order and every
+        record is tagged with its account_id and account_name. The first
+        error stops the remaining accounts and is raised.
+        
+        Args:
+            start_date: Start date for data extraction
+            end_date: End date for data extraction
+            metrics: List of metrics to extract
+            dimensions: List of dimensions to group by
+            filters: Additional filters to apply
+            batch_size: Maximum number of records per batch
+            
+        Returns:
+            Iterator over RecordBatch objects with account columns
+        """
+        accounts = self.get_child_accounts()
+        if not accounts:
+            return
+        
+        max_workers = min(len(accounts), int(self.config.get('fan_out_max_workers', self.FAN_OUT_MAX_WORKERS)))
+        # Bounded so fast accounts cannot buffer unlimited batches ahead of storage
+        results = queue.Queue(maxsize=max_workers * 2)
+        stop_event = threading.Event()
+        done = object()
+        
+        def put(item):
+            while not stop_event.is_set():
+                try:
+                    results.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def extract_account(account):
+            try:
+                integration = self.for_account(str(account['id']))
+                for batch in integration.iter_extract(start_date, end_date, metrics, dimensions, filters, batch_size):
+                    batch.set_column('account_id', [str(account['id'])] * len(batch))
+                    batch.set_column('account_name', [account.get('name')] * len(batch))
+                    if not put(batch):
+                        return
+                put(done)
+            except Exception as e:
+                put(e)
+        
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f'{self.platform_name}-fan-out')
+        try:
+            for account in accounts:
+                executor.submit(extract_account, account)
+            
+            remaining = len(accounts)
+            while remaining:
+                item = results.get()
+                if item is done:
+                    remaining -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+        finally:
+            stop_event.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _fan_out_config(self) -> Dict[str, Any]:
+        """Config for child account integrations"""
+        config = dict(self.config, fan_out=False)
+        config.pop('account_ids', None)
+        if self.FAN_OUT_SHARED_RATE_LIMIT:
+            config['rate_limit_key'] = self.get_rate_limit_key()
+        return config
+
+
 class MockIntegration(BaseIntegration):
-    """Mock integration for testing purposes"""
+    """
+    Mock integration for testing purposes
+    
+    Data is generated with NumPy one column at a time, so large date
+    ranges and dimension cardinalities can be produced quickly for load
+    tests. Rows are the cross product of the days in the range, the
+    campaigns and any other requested dimensions. Config keys:
+    
+        seed: Makes the generated data reproducible
+        campaign_count: Number of campaigns (default 4)
+        dimension_cardinalities: Number of distinct values per dimension
+    """
+    
+    CAMPAIGNS = ['Summer Sale', 'Brand Awareness', 'Product Launch', 'Holiday Special']
+    
+    # Fixed value pools; other dimensions get generated labels
+    DIMENSION_VALUES = {
+        'device': ['desktop', 'mobile', 'tablet'],
+        'gender': ['male', 'female', 'unknown'],
+        'age_group': ['18-24', '25-34', '35-44', '45-54', '55-64', '65+']
+    }
+    DEFAULT_CARDINALITY = 10
+    
+    # Rows generated per random draw, independent of the batch size so a
+    # seeded run yields the same data for any batch size
+    GENERATION_CHUNK_SIZE = 65536
     
     def __init__(self, platform_name: str, credentials: Dict[str, Any], config: Dict[str, Any] = None):
         self._platform_name = platform_name
@@ -146,42 +537,111 @@ class MockIntegration(BaseIntegration):
                     dimensions: List[str] = None,
                     filters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
         """Generate mock data for testing"""
-        import random
-        from datetime import timedelta
-        
-        if not metrics:
-            metrics = ['impressions', 'clicks', 'cost']
-        if not dimensions:
-            dimensions = ['date', 'campaign_name']
-        
-        # Generate mock data for each day in the date range
-        data = []
-        current_date = start_date
-        
-        campaigns = ['Summer Sale', 'Brand Awareness', 'Product Launch', 'Holiday Special']
-        
-        while current_date <= end_date:
-            for campaign in campaigns:
-                record = {
-                    'date': current_date.strftime('%Y-%m-%d'),
-                    'campaign_name': campaign,
-                    'impressions': random.randint(1000, 10000),
-                    'clicks': random.randint(50, 500),
-                    'cost': round(random.uniform(100, 1000), 2),
-                    'conversions': random.randint(5, 50),
-                    'revenue': round(random.uniform(500, 5000), 2),
-                }
-                
-                # Calculate derived metrics
-                record['ctr'] = round((record['clicks'] / record['impressions']) * 100, 2)
-                record['cpc'] = round(record['cost'] / record['clicks'], 2) if record['clicks'] > 0 else 0
-                record['cpm'] = round((record['cost'] / record['impressions']) * 1000, 2)
-                record['roas'] = round(record['revenue'] / record['cost'], 2) if record['cost'] > 0 else 0
-                
-                formatted_record = self.format_data_record(record, metrics, dimensions)
-                data.append(formatted_record)
+        records = []
+        for batch in self.iter_extract(start_date, end_date, metrics, dimensions, filters):
+            records.extend(batch.to_records())
+        return records
+    
+    def iter_extract(self,
+                     start_date: datetime,
+                     end_date: datetime,
+                     metrics: List[str] = None,
+                     dimensions: List[str] = None,
+                     filters: Dict[str, Any] = None,
+                     batch_size: int = None) -> Iterator[RecordBatch]:
+        """Generate mock data for testing in bounded batches"""
+        for columns in self.iter_columns(start_date, end_date, metrics, dimensions, batch_size):
+            yield RecordBatch(self.platform_name, columns)
+    
+    def iter_columns(self,
+                     start_date: datetime,
+                     end_date: datetime,
+                     metrics: List[str] = None,
+                     dimensions: List[str] = None,
+                     batch_size: int = None) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily generate mock data as columnar batches
+        
+        Args:
+            start_date: First day to generate
+            end_date: Last day to generate
+            metrics: Metrics to include
+            dimensions: Dimensions to include
+            batch_size: Maximum number of rows per batch
             
-            current_date += timedelta(days=1)
+        Returns:
+            Iterator over dicts of column name to NumPy array, dimensions first
+        """
+        import numpy as np
         
-        return data
-
+        metrics, dimensions = self._resolve_fields(metrics, dimensions)
+        batch_size = self.get_batch_size(batch_size)
+        
+        # Rows enumerate the cross product of all dimension values, date first
+        pools = [self._dimension_values(dimension, start_date, end_date) for dimension in dimensions]
+        cardinalities = [len(pool) for pool in pools]
+        total_rows = int(np.prod(cardinalities)) if cardinalities else 0
+        strides = [int(np.prod(cardinalities[i + 1:])) for i in range(len(cardinalities))]
+        
+        seed = self.config.get('seed')
+        for chunk_start in range(0, total_rows, self.GENERATION_CHUNK_SIZE):
+            chunk_end = min(chunk_start + self.GENERATION_CHUNK_SIZE, total_rows)
+            rng = np.random.default_rng(None if seed is None else [int(seed), chunk_start // self.GENERATION_CHUNK_SIZE])
+            row_index = np.arange(chunk_start, chunk_end)
+            
+            columns = {}
+            for dimension, pool, cardinality, stride in zip(dimensions, pools, cardinalities, strides):
+                columns[dimension] = pool[(row_index // stride) % cardinality]
+            generated = self._generate_metrics(rng, chunk_end - chunk_start)
+            for metric in metrics:
+                if metric in generated:
+                    columns[metric] = generated[metric]
+            
+            for offset in range(0, chunk_end - chunk_start, batch_size):
+                yield {name: column[offset:offset + batch_size] for name, column in columns.items()}
+    
+    @staticmethod
+    def _generate_metrics(rng, size: int) -> Dict[str, Any]:
+        """Draw the additive base metrics for a whole chunk"""
+        import numpy as np
+        
+        # Ratios such as ctr or roas are derived at read time, not generated
+        return {
+            'impressions': rng.integers(1000, 10001, size),
+            'clicks': rng.integers(50, 501, size),
+            'cost': np.round(rng.uniform(100, 1000, size), 2),
+            'conversions': rng.integers(5, 51, size),
+            'revenue': np.round(rng.uniform(500, 5000, size), 2)
+        }
+    
+    def _dimension_values(self, dimension: str, start_date: datetime, end_date: datetime):
+        """Distinct values of a dimension as a NumPy array"""
+        import numpy as np
+        
+        if dimension == 'date':
+            days = np.arange(np.datetime64(start_date, 'D'), np.datetime64(end_date, 'D') + 1)
+            return np.datetime_as_string(days, unit='D').astype(object)
+        
+        cardinalities = self.config.get('dimension_cardinalities') or {}
+        if dimension == 'campaign_name':
+            count = int(self.config.get('campaign_count', cardinalities.get(dimension, len(self.CAMPAIGNS))))
+            names = self.CAMPAIGNS[:count] + [f'Campaign {i + 1}' for i in range(len(self.CAMPAIGNS), count)]
+            return np.array(names, dtype=object)
+        
+        pool = self.DIMENSION_VALUES.get(dimension)
+        count = int(cardinalities.get(dimension, len(pool) if pool else self.DEFAULT_CARDINALITY))
+        if pool and count <= len(pool):
+            return np.array(pool[:count], dtype=object)
+        label = dimension.replace('_name', '').replace('_', ' ').title()
+        return np.array([f'{label} {i + 1}' for i in range(count)], dtype=object)
+    
+    @staticmethod
+    def _resolve_fields(metrics: List[str] = None, dimensions: List[str] = None) -> Tuple[List[str], List[str]]:
+        """Apply the default metrics and dimensions, always generating one row per day"""
+        metrics = list(metrics or ['impressions', 'clicks', 'cost'])
+        dimensions = list(dimensions or ['date', 'campaign_name'])
+        if 'date' not in dimensions:
+            dimensions.insert(0, 'date')
+        else:
+            dimensions.insert(0, dimensions.pop(dimensions.index('date')))
+        return metrics, dimensions
@@ -0,0 +1,109 @@
+"""
+Import-time budget check
+
+Measures how long importing the WSGI application (main:app) takes in a
+fresh interpreter, which every gunicorn worker, worker.py and scheduler.py
+process pays on startup, and fails when it exceeds the budget or when a
+platform connector that should load lazily was imported. Run it with:
+    
+    python check_import_time.py [--budget-ms 1500] [--runs 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+DEFAULT_BUDGET_MS = 1500
+DEFAULT_RUNS = 5
+TARGET_MODULE = 'main'
+
+# Modules only needed once an extraction actually runs
+LAZY_MODULES = (
+    'src.integrations.google_ads',
+    'src.integrations.facebook_ads',
+    'google.ads',
+    'facebook_business',
+)
+
+
+def measure_import(module: str) -> Tuple[float, Dict[str, float], List[str]]:
+    """
+    Import a module in a fresh interpreter with -X importtime
+    
+    Args:
+        module: Module to import
+    
+    Returns:
+        (cumulative milliseconds for the module,
+         cumulative milliseconds of each top-level import,
+         names of all modules loaded afterwards)
+    """
+    code = f"import {module}, sys, json; print(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    
+    total_ms = None
+    top_level = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|', 2)
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        # Nested imports are indented by two spaces per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        milliseconds = int(cumulative) / 1000
+        if name == module and depth == 0:
+            total_ms = milliseconds
+        elif depth == 1:
+            top_level[name] = milliseconds
+    
+    if total_ms is None:
+        raise RuntimeError(f"No import time reported for {module}, was it already imported?")
+    return total_ms, top_level, json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Check the import-time budget of main:app')
+    parser.add_argument('--budget-ms', type=float,
+                        default=float(os.getenv('IMPORT_TIME_BUDGET_MS', DEFAULT_BUDGET_MS)))
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS)
+    parser.add_argument('--top', type=int, default=10, help='Number of slowest imports to list')
+    args = parser.parse_args()
+    
+    timings = []
+    top_level = {}
+    loaded = []
+    for _ in range(args.runs):
+        total_ms, top_level, loaded = measure_import(TARGET_MODULE)
+        timings.append(total_ms)
+    median_ms = statistics.median(timings)
+    
+    print(f"import {TARGET_MODULE}: median {median_ms:.0f} ms over {args.runs} runs "
+          f"(min {min(timings):.0f} ms, max {max(timings):.0f} ms, budget {args.budget_ms:.0f} ms)")
+    print(f"Slowest imports of the last run:")
+    for name, milliseconds in sorted(top_level.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {milliseconds:8.1f} ms  {name}")
+    
+    failed = False
+    if median_ms > args.budget_ms:
+        print(f"FAIL: import time exceeds the {args.budget_ms:.0f} ms budget")
+        failed = True
+    eager = [name for name in loaded if any(name == lazy or name.startswith(lazy + '.') for lazy in LAZY_MODULES)]
+    if eager:
+        print(f"FAIL: modules that should be imported lazily were loaded: {', '.join(eager)}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -28,6 +28,9 @@ class Credential(db.Model):
     # Unique constraint for project_id and platform combination
     __table_args__ = (db.UniqueConstraint('project_id', 'platform', name='unique_project_platform_credential'),)
     
+    # Seconds a successful validation is trusted before the platform is asked again
+    VALIDATION_TTL_SECONDS = int(os.getenv('CREDENTIAL_VALIDATION_TTL', 3600))
+    
     def __init__(self, project_id, platform, credential_type, credentials_data, **kwargs):
         self.project_id = project_id
         self.platform = platform
@@ -82,6 +85,23 @@ class Credential(db.Model):
         db.session.commit()
         return True
     
+    def is_validation_fresh(self, ttl_seconds=None):
+        """Check if the last successful validation is recent enough to reuse"""
+        if self.validation_status != 'valid' or not self.last_validated_at:
+            return False
+        ttl_seconds = self.VALIDATION_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        last_validated_at = self.last_validated_at
+        if last_validated_at.tzinfo is None:
+            # SQLite returns naive datetimes; values are stored in UTC
+            last_validated_at = last_validated_at.replace(tzinfo=timezone.utc)
+        return (datetime.now(timezone.utc) - last_validated_at).total_seconds() < ttl_seconds
+    
+    def record_validation(self, is_valid):
+        """Persist the outcome of a platform credential check"""
+        self.last_validated_at = datetime.now(timezone.utc)
+        self.validation_status = 'valid' if is_valid else 'invalid'
+        db.session.commit()
+    
     def is_expired(self):
         """Check if credentials are expired"""
         if not self.expires_at:
@@ -1,23 +1,73 @@
-from datetime import datetime, timezone
-from typing import Dict, List, Any, Optional
+from datetime import datetime, timezone, date, timedelta
+from typing import Dict, List, Any, Optional, Tuple
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import logging
 import json
+from flask import current_app
 from sqlalchemy.exc import SQLAlchemyError
 
 from user import db
 from project import Project
 from credential import Credential
-from data_source import DataSource
+from data_source import DataSource, ExtractionJob
 from extracted_data import ExtractedData
+from extraction_coverage import ExtractionCoverage
+from partitioning import ExtractedDataPartitions
+from src.integrations.base import AuthenticationError
+from src.integrations.record_batch import RecordBatch
+from src.integrations.normalization import normalize_batch, PLATFORM_FIELD_MAPPINGS
+from derived_metrics import DERIVED_METRICS, is_derived_metric, add_derived_metrics
 from src.integrations.factory import IntegrationFactory
 
 logger = logging.getLogger(__name__)
 
+
+class UndatedRecordsError(Exception):
+    """Raised when records without a date dimension are returned for a span of several days"""
+    pass
+
+
 class DataExtractionService:
     """Service for handling data extraction from marketing platforms"""
     
-    def __init__(self):
+    # Upper bound on data sources extracted at the same time in concurrent mode
+    MAX_CONCURRENT_EXTRACTIONS = 8
+    
+    # Per-platform caps so a single API is never hit by more than a few
+    # extractions at once; platforms not listed use the 'default' entry
+    PLATFORM_CONCURRENCY_LIMITS = {
+        'google_ads': 2,
+        'facebook_ads': 2,
+        'meta_ads': 2,
+        'default': 4,
+    }
+    
+    # Data type stored for records when the extraction config doesn't set one
+    DEFAULT_DATA_TYPE = ExtractedData.DEFAULT_DATA_TYPE
+    
+    # Dimensions that carry a record's day, in order of preference
+    RECORD_DATE_FIELDS = ('date', 'date_start')
+    
+    # Derived metrics added to rows returned by get_extracted_data
+    DEFAULT_DERIVED_METRICS = ('ctr', 'cpc', 'cpm', 'roas')
+    
+    # Backfills are split into windows of this many days
+    BACKFILL_WINDOW_DAYS = 7
+    
+    # Upper bound on backfill windows extracted at the same time
+    BACKFILL_MAX_WORKERS = 4
+    
+    def __init__(self, max_workers: int = None, platform_limits: Dict[str, int] = None):
         self.integration_factory = IntegrationFactory()
+        self.max_workers = max_workers or self.MAX_CONCURRENT_EXTRACTIONS
+        self.platform_limits = dict(self.PLATFORM_CONCURRENCY_LIMITS)
+        if platform_limits:
+            self.platform_limits.update(platform_limits)
+    
+    def _get_platform_limit(self, platform: str) -> int:
+        """Return the concurrency cap for a platform"""
+        return max(1, self.platform_limits.get(platform, self.platform_limits.get('default', 1)))
     
     def extract_data_for_source(self, 
                                data_source_id: str,
@@ -27,116 +77,629 @@ class DataExtractionService:
         """
         Extract data for a specific data source
         
+        Only the days in the range that were not extracted yet with the
+        source's current config are requested from the platform, so a
+        scheduled daily run costs a single day of API calls instead of the
+        whole window.
+        
         Args:
             data_source_id: ID of the data source
             start_date: Start date for extraction
             end_date: End date for extraction
-            force_refresh: Whether to force refresh even if data exists
+            force_refresh: Whether to re-extract the whole range, replacing data already stored
             
         Returns:
             Extraction result with status and details
         """
         try:
-            # Get data source and related objects
-            data_source = DataSource.query.get(data_source_id)
-            if not data_source:
-                return {'success': False, 'error': 'Data source not found'}
-            
-            if not data_source.is_active:
-                return {'success': False, 'error': 'Data source is not active'}
-            
-            # Get credential
-            credential = Credential.query.get(data_source.credential_id)
-            if not credential or not credential.is_active:
-                return {'success': False, 'error': 'Credential not found or inactive'}
-            
-            # Check if data already exists (unless force refresh)
-            if not force_refresh:
-                existing_data = ExtractedData.query.filter(
-                    ExtractedData.data_source_id == data_source_id,
-                    ExtractedData.date_start <= start_date,
-                    ExtractedData.date_end >= end_date
-                ).first()
+            data_source, credential, error = self._load_data_source(data_source_id)
+            if error:
+                return {'success': False, 'error': error}
+            
+            # Work out which day spans still need extracting (unless force refresh)
+            if force_refresh:
+                spans = [(self._as_date(start_date), self._as_date(end_date))]
+            else:
+                spans = self.find_missing_date_spans(data_source_id, start_date, end_date)
                 
-                if existing_data:
+                if not spans:
                     return {
                         'success': True,
                         'message': 'Data already exists',
-                        'records_count': 0,
-                        'existing_data_id': existing_data.id
+                        'records_count': 0
                     }
             
-            # Create integration instance
-            credentials_data = credential.get_credentials()
-            integration = self.integration_factory.create_integration(
-                credential.platform,
-                credentials_data,
-                data_source.get_config()
-            )
+            job = self._create_job(data_source_id, 'manual', start_date, end_date, force_refresh)
+            db.session.commit()
             
-            if not integration:
-                return {'success': False, 'error': f'Integration not available for platform: {credential.platform}'}
+            return self._run_job(job, data_source, credential, spans, replace_existing=force_refresh)
+            
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Data extraction failed for source {data_source_id}: {str(e)}")
+            return {'success': False, 'error': str(e)}
+    
+    def run_extraction_job(self, job_id: str) -> Dict[str, Any]:
+        """
+        Run a previously created extraction job
+        
+        The job's date range and force_refresh flag are read from its
+        job_config. Jobs that are already completed are not run again, and
+        jobs that were started before only extract the days their earlier
+        attempts did not complete.
+        
+        Args:
+            job_id: ID of the extraction job
             
-            # Validate credentials
-            if not integration.validate_credentials():
-                return {'success': False, 'error': 'Credential validation failed'}
+        Returns:
+            Extraction result with status and details
+        """
+        try:
+            job = ExtractionJob.query.get(job_id)
+            if not job:
+                return {'success': False, 'error': 'Extraction job not found'}
+            
+            if job.status == 'completed':
+                return {
+                    'success': True,
+                    'message': 'Extraction job already completed',
+                    'records_count': 0,
+                    'extraction_job_id': job.id
+                }
             
-            # Extract data
-            logger.info(f"Extracting data for source {data_source_id} from {start_date} to {end_date}")
+            data_source, credential, error = self._load_data_source(job.data_source_id)
+            if error:
+                job.fail_job(error)
+                return {'success': False, 'error': error, 'extraction_job_id': job.id}
             
-            config = data_source.get_config()
-            metrics = config.get('metrics', [])
-            dimensions = config.get('dimensions', [])
-            filters = config.get('filters', {})
+            job_config = job.get_job_config()
+            start_day = date.fromisoformat(job_config['start_date'])
+            end_day = date.fromisoformat(job_config['end_date'])
             
-            raw_data = integration.extract_data(
-                start_date=start_date,
-                end_date=end_date,
-                metrics=metrics,
-                dimensions=dimensions,
-                filters=filters
-            )
+            if job_config.get('force_refresh'):
+                spans = [(start_day, end_day)]
+            else:
+                spans = self.find_missing_date_spans(job.data_source_id, start_day, end_day)
+            
+            return self._run_job(job, data_source, credential, spans,
+                                 replace_existing=bool(job_config.get('force_refresh')))
+            
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Extraction job {job_id} failed: {str(e)}")
+            return {'success': False, 'error': str(e)}
+    
+    def enqueue_extraction(self,
+                           data_source_id: str,
+                           start_date: datetime,
+                           end_date: datetime,
+                           job_type: str = 'manual',
+                           force_refresh: bool = False) -> Dict[str, Any]:
+        """
+        Queue an extraction job for a worker process and return immediately
+        
+        Args:
+            data_source_id: ID of the data source
+            start_date: Start date for extraction
+            end_date: End date for extraction
+            job_type: Job type recorded on the job (manual, scheduled, backfill)
+            force_refresh: Whether to re-extract the whole range, replacing data already stored
+            
+        Returns:
+            Result with the queued job
+        """
+        try:
+            data_source, credential, error = self._load_data_source(data_source_id)
+            if error:
+                return {'success': False, 'error': error}
+            
+            job = self._create_job(data_source_id, job_type, start_date, end_date, force_refresh)
+            job.status = 'queued'
+            db.session.commit()
+            
+            return {
+                'success': True,
+                'message': 'Extraction job queued',
+                'extraction_job_id': job.id,
+                'job': job.to_dict()
+            }
+            
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Failed to queue extraction for source {data_source_id}: {str(e)}")
+            return {'success': False, 'error': str(e)}
+    
+    def backfill_data_source(self,
+                             data_source_id: str,
+                             start_date: datetime,
+                             end_date: datetime,
+                             window_days: int = None,
+                             max_workers: int = None,
+                             enqueue: bool = False) -> Dict[str, Any]:
+        """
+        Backfill a long date range for a data source in fixed windows
+        
+        Each window is recorded as an ExtractionJob with job_type 'backfill'
+        and windows run in parallel. Windows whose job is already completed
+        are skipped, so calling this again after a crash resumes where the
+        previous backfill stopped.
+        
+        Args:
+            data_source_id: ID of the data source
+            start_date: Start date of the backfill
+            end_date: End date of the backfill
+            window_days: Number of days per window
+            max_workers: Maximum number of windows extracted at once
+            enqueue: Queue the windows for worker processes instead of
+                running them in this process
             
-            if not raw_data:
-                return {'success': False, 'error': 'No data returned from platform'}
+        Returns:
+            Backfill summary with one result per window
+        """
+        try:
+            data_source, credential, error = self._load_data_source(data_source_id)
+            if error:
+                return {'success': False, 'error': error}
+            
+            window_days = window_days or self.BACKFILL_WINDOW_DAYS
+            max_workers = min(
+                max_workers or self.BACKFILL_MAX_WORKERS,
+                self._get_platform_limit(credential.platform)
+            )
             
-            # Store extracted data
-            extracted_data = ExtractedData(
+            # Index earlier backfill jobs by their window so they can be reused
+            existing_jobs = {}
+            for existing_job in ExtractionJob.query.filter_by(
                 data_source_id=data_source_id,
-                date_start=start_date,
-                date_end=end_date,
-                records_count=len(raw_data),
-                extraction_config={
-                    'metrics': metrics,
-                    'dimensions': dimensions,
-                    'filters': filters
+                job_type='backfill'
+            ).order_by(ExtractionJob.created_at).all():
+                job_config = existing_job.get_job_config()
+                existing_jobs[(job_config.get('start_date'), job_config.get('end_date'))] = existing_job
+            
+            windows = []
+            window_start = self._as_date(start_date)
+            end_day = self._as_date(end_date)
+            while window_start <= end_day:
+                window_end = min(window_start + timedelta(days=window_days - 1), end_day)
+                window_key = (window_start.isoformat(), window_end.isoformat())
+                job = existing_jobs.get(window_key)
+                if not job:
+                    job = self._create_job(data_source_id, 'backfill', window_start, window_end)
+                windows.append((window_key, job))
+                window_start = window_end + timedelta(days=1)
+            
+            db.session.commit()
+            
+            # Windows already queued for (or leased by) a worker are left to it
+            runnable_jobs = [
+                job for _, job in windows
+                if job.status in ('pending', 'failed') or (job.status == 'running' and not job.lease_expires_at)
+            ]
+            skipped_windows = len([job for _, job in windows if job.status == 'completed'])
+            
+            if enqueue:
+                for job in runnable_jobs:
+                    job.status = 'queued'
+                    job.attempts = 0
+                db.session.commit()
+                
+                return {
+                    'success': True,
+                    'message': f'Backfill queued {len(runnable_jobs)}/{len(windows)} windows',
+                    'total_windows': len(windows),
+                    'skipped_windows': skipped_windows,
+                    'queued_windows': len(runnable_jobs),
+                    'extraction_job_ids': [job.id for _, job in windows]
                 }
+            
+            pending_job_ids = [job.id for job in runnable_jobs]
+            
+            job_results = {}
+            if pending_job_ids:
+                app = current_app._get_current_object()
+                with ThreadPoolExecutor(max_workers=min(max_workers, len(pending_job_ids))) as executor:
+                    for job_id, result in zip(pending_job_ids, executor.map(
+                        lambda job_id: self._call_in_app_context(app, self.run_extraction_job, job_id),
+                        pending_job_ids
+                    )):
+                        job_results[job_id] = result
+            
+            results = []
+            records_count = 0
+            failed_windows = 0
+            for (window_start, window_end), job in windows:
+                if job.id in job_results:
+                    result = job_results[job.id]
+                elif job.status == 'completed':
+                    result = {'success': True, 'message': 'Window already completed', 'records_count': 0}
+                else:
+                    result = {'success': True, 'message': 'Window queued for a worker', 'records_count': 0}
+                result.update({'start': window_start, 'end': window_end, 'extraction_job_id': job.id})
+                results.append(result)
+                
+                if result['success']:
+                    records_count += result.get('records_count', 0)
+                else:
+                    failed_windows += 1
+            
+            return {
+                'success': failed_windows == 0,
+                'message': f'Backfill completed for {len(windows) - failed_windows}/{len(windows)} windows',
+                'records_count': records_count,
+                'total_windows': len(windows),
+                'skipped_windows': skipped_windows,
+                'failed_windows': failed_windows,
+                'results': results
+            }
+            
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Backfill failed for source {data_source_id}: {str(e)}")
+            return {'success': False, 'error': str(e)}
+    
+    def _load_data_source(self, data_source_id: str) -> Tuple[Optional[DataSource], Optional[Credential], Optional[str]]:
+        """Load an active data source and its credential, or return an error message"""
+        data_source = DataSource.query.get(data_source_id)
+        if not data_source:
+            return None, None, 'Data source not found'
+        
+        if not data_source.is_active:
+            return None, None, 'Data source is not active'
+        
+        credential = Credential.query.get(data_source.credential_id)
+        if not credential or not credential.is_active:
+            return None, None, 'Credential not found or inactive'
+        
+        return data_source, credential, None
+    
+    def _create_job(self,
+                    data_source_id: str,
+                    job_type: str,
+                    start_date: datetime,
+                    end_date: datetime,
+                    force_refresh: bool = False) -> ExtractionJob:
+        """Add a pending extraction job for a date range to the session"""
+        job = ExtractionJob(data_source_id=data_source_id, job_type=job_type)
+        job.set_job_config({
+            'start_date': self._as_date(start_date).isoformat(),
+            'end_date': self._as_date(end_date).isoformat(),
+            'force_refresh': force_refresh
+        })
+        db.session.add(job)
+        return job
+    
+    def _run_job(self,
+                 job: ExtractionJob,
+                 data_source: DataSource,
+                 credential: Credential,
+                 spans: List[Tuple[date, date]],
+                 replace_existing: bool = False) -> Dict[str, Any]:
+        """
+        Extract and store the given day spans, tracking progress on the job
+        
+        The rows already stored for a span are deleted before it is
+        extracted, so rows whose metrics changed and rows left by an
+        interrupted run are replaced. Batches are committed as they are
+        stored, and a span that fails partway has its rows deleted again.
+        When replace_existing is set, the whole span is committed at once
+        instead, so readers never see it half refreshed. A span's days are
+        recorded in ExtractionCoverage once all its batches are stored,
+        including days the platform returned nothing for.
+        
+        Args:
+            job: Extraction job to update
+            data_source: Data source being extracted
+            credential: Credential of the data source
+            spans: Inclusive (start, end) day spans to extract
+            replace_existing: Replace the rows already stored for each span
+            
+        Returns:
+            Extraction result with status and details
+        """
+        try:
+            # Create integration instance
+            config = data_source.get_extraction_config()
+            integration = self.integration_factory.create_integration(
+                credential.platform,
+                credential.get_credentials(),
+                config
             )
             
-            extracted_data.set_data(raw_data)
+            if not integration:
+                error = f'Integration not available for platform: {credential.platform}'
+                job.fail_job(error)
+                return {'success': False, 'error': error, 'extraction_job_id': job.id}
+            
+            # Validate credentials (reusing a recent successful validation)
+            if not self._ensure_valid_credential(credential, integration):
+                job.fail_job('Credential validation failed')
+                return {'success': False, 'error': 'Credential validation failed', 'extraction_job_id': job.id}
             
-            db.session.add(extracted_data)
-            db.session.commit()
+            metrics = self._get_requested_metrics(credential.platform, config.get('metrics', []))
+            dimensions = config.get('dimensions', [])
+            filters = config.get('filters', {})
+            data_type = config.get('data_type', self.DEFAULT_DATA_TYPE)
+            config_hash = ExtractionCoverage.config_hash_of(config)
+            
+            job.start_job()
+            data_source.update_extraction_status('running')
+            
+            # Extract and store each missing span
+            spans = list(spans)
+            records_count = 0
+            span_index = 0
+            revalidated = False
+            while span_index < len(spans):
+                span_start, span_end = spans[span_index]
+                span_records_start = records_count
+                logger.info(f"Extracting data for source {data_source.id} from {span_start} to {span_end}")
+                
+                try:
+                    # Rows of uncovered days are left over from an interrupted run
+                    ExtractedData.delete_date_range(data_source.id, data_type, span_start, span_end)
+                    # Persist batch by batch so memory stays flat for large accounts
+                    for batch in integration.iter_extract(
+                        start_date=datetime.combine(span_start, datetime.min.time()),
+                        end_date=datetime.combine(span_end, datetime.min.time()),
+                        metrics=metrics,
+                        dimensions=dimensions,
+                        filters=filters
+                    ):
+                        records_count += self._store_records(data_source.id, job.id, data_type, batch,
+                                                             span_start, span_end)
+                        job.records_processed = records_count
+                        if not replace_existing:
+                            db.session.commit()
+                    # Days without rows are covered too: the platform had nothing for them
+                    ExtractionCoverage.record_days(data_source.id, data_type, config_hash, job.id,
+                                                   self._iter_days(span_start, span_end))
+                    db.session.commit()
+                except AuthenticationError:
+                    # The cached validation may be stale; check again and retry the span once
+                    db.session.rollback()
+                    records_count = span_records_start
+                    if revalidated or not self._ensure_valid_credential(credential, integration, force=True):
+                        raise
+                    revalidated = True
+                    continue
+                except UndatedRecordsError:
+                    # Without a date dimension a record's day is only known from a
+                    # single-day span, so extract the remaining spans day by day
+                    db.session.rollback()
+                    records_count = span_records_start
+                    logger.info(f"Records of source {data_source.id} have no date, extracting day by day")
+                    spans[span_index:] = [
+                        (day, day)
+                        for remaining_start, remaining_end in spans[span_index:]
+                        for day in self._iter_days(remaining_start, remaining_end)
+                    ]
+                    continue
+                except Exception:
+                    # Don't leave the span half stored; its days are not covered and
+                    # are extracted again by the next run
+                    db.session.rollback()
+                    if not replace_existing:
+                        self._discard_span(data_source.id, data_type, span_start, span_end)
+                    raise
+                
+                span_index += 1
             
-            logger.info(f"Successfully extracted {len(raw_data)} records for data source {data_source_id}")
+            job.complete_job(records_processed=records_count)
+            data_source.update_extraction_status('completed')
+            
+            logger.info(f"Successfully extracted {records_count} records for data source {data_source.id}")
             
             return {
                 'success': True,
                 'message': 'Data extraction completed successfully',
-                'records_count': len(raw_data),
-                'extracted_data_id': extracted_data.id
+                'records_count': records_count,
+                'extraction_job_id': job.id,
+                'extracted_spans': [
+                    {'start': span_start.isoformat(), 'end': span_end.isoformat()}
+                    for span_start, span_end in spans
+                ]
             }
             
         except Exception as e:
             db.session.rollback()
-            logger.error(f"Data extraction failed for source {data_source_id}: {str(e)}")
-            return {'success': False, 'error': str(e)}
+            logger.error(f"Data extraction failed for source {data_source.id}: {str(e)}")
+            job.fail_job(str(e))
+            data_source.update_extraction_status('failed')
+            return {'success': False, 'error': str(e), 'extraction_job_id': job.id}
+    
+    def _get_requested_metrics(self, platform: str, metrics: List[str]) -> List[str]:
+        """
+        Platform metrics to request for the configured metrics
+        
+        Derived metrics are never stored, so they are requested as the
+        platform fields of their inputs instead, e.g. ctr as clicks and
+        impressions, and computed from those at read time.
+        """
+        platform_fields = {
+            canonical: field for field, (canonical, _) in PLATFORM_FIELD_MAPPINGS.get(platform, {}).items()
+        }
+        requested = []
+        for name in metrics:
+            if is_derived_metric(name):
+                names = [platform_fields.get(input_name, input_name) for input_name in DERIVED_METRICS[name].inputs]
+            else:
+                names = [name]
+            for field in names:
+                if field not in requested:
+                    requested.append(field)
+        return requested
+    
+    def _discard_span(self, data_source_id: str, data_type: str, span_start: date, span_end: date):
+        """Delete the rows a failed span committed, leaving them to the next run if that fails too"""
+        try:
+            ExtractedData.delete_date_range(data_source_id, data_type, span_start, span_end)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Could not delete partial data of source {data_source_id} "
+                           f"from {span_start} to {span_end}: {str(e)}")
+    
+    def _ensure_valid_credential(self, credential: Credential, integration, force: bool = False) -> bool:
+        """
+        Validate a credential against its platform unless a recent check passed
+        
+        Results are persisted on the credential's last_validated_at and
+        validation_status columns, so all workers share them for
+        Credential.VALIDATION_TTL_SECONDS.
+        
+        Args:
+            credential: Credential being used for extraction
+            integration: Integration instance built from the credential
+            force: Ignore a cached successful validation
+            
+        Returns:
+            Whether the credential is valid
+        """
+        if not force and credential.is_validation_fresh():
+            return True
+        
+        is_valid = integration.validate_credentials()
+        credential.record_validation(is_valid)
+        return is_valid
+    
+    @staticmethod
+    def _call_in_app_context(app, func, *args, **kwargs):
+        """Call func inside a fresh app context so it gets its own session"""
+        with app.app_context():
+            return func(*args, **kwargs)
+    
+    def find_missing_date_spans(self,
+                                data_source_id: str,
+                                start_date: datetime,
+                                end_date: datetime) -> List[Tuple[date, date]]:
+        """
+        Find the day spans in a range that still need extracting
+        
+        A day is present once a run extracted it with the source's current
+        data type, metrics, dimensions and filters (see ExtractionCoverage),
+        whether or not the platform returned rows for it. The days that are
+        not present are collapsed into contiguous (start, end) spans.
+        
+        Args:
+            data_source_id: ID of the data source
+            start_date: Start of the requested range
+            end_date: End of the requested range (inclusive)
+            
+        Returns:
+            List of inclusive (start, end) date tuples, oldest first
+        """
+        start_day = self._as_date(start_date)
+        end_day = self._as_date(end_date)
+        
+        data_source = db.session.get(DataSource, data_source_id)
+        config = data_source.get_extraction_config() if data_source else {}
+        present_days = ExtractionCoverage.covered_days(
+            data_source_id,
+            config.get('data_type', self.DEFAULT_DATA_TYPE),
+            ExtractionCoverage.config_hash_of(config),
+            start_day,
+            end_day
+        )
+        
+        spans = []
+        span_start = None
+        current_day = start_day
+        while current_day <= end_day:
+            if current_day in present_days:
+                if span_start is not None:
+                    spans.append((span_start, current_day - timedelta(days=1)))
+                    span_start = None
+            elif span_start is None:
+                span_start = current_day
+            current_day += timedelta(days=1)
+        
+        if span_start is not None:
+            spans.append((span_start, end_day))
+        
+        return spans
+    
+    def _store_records(self,
+                       data_source_id: str,
+                       extraction_job_id: str,
+                       data_type: str,
+                       batch: RecordBatch,
+                       span_start: date,
+                       span_end: date) -> int:
+        """
+        Bulk insert one ExtractedData row per record of a batch
+        
+        Duplicate records are dropped by the unique_extracted_data constraint.
+        processed_data holds the batch normalized to canonical field names
+        and units, while raw_data keeps the fields as the platform returned
+        them. Derived ratio metrics are not stored since they are computed
+        at read time.
+        
+        Args:
+            data_source_id: ID of the data source
+            extraction_job_id: ID of the job the records belong to
+            data_type: Data type stored with each row
+            batch: RecordBatch (or list of records) returned by the integration
+            span_start: First day of the extracted span
+            span_end: Last day of the extracted span, used with span_start as
+                the day of records without a date dimension in single-day spans
+            
+        Returns:
+            Number of records processed
+            
+        Raises:
+            UndatedRecordsError: If records have no date and the span has several days
+        """
+        batch = RecordBatch.from_records(batch)
+        raw_batch = RecordBatch(batch.platform, batch.columns, batch.extracted_at)
+        normalize_batch(batch)
+        batch.drop_columns([name for name in batch.column_names if is_derived_metric(name)])
+        record_dates = self._get_batch_dates(batch)
+        if span_start != span_end and not all(record_dates):
+            raise UndatedRecordsError(f"Records without a date returned for {span_start} to {span_end}")
+        
+        rows = []
+        processed_rows = []
+        for raw, processed_data, record_date in zip(raw_batch.iter_data(), batch.iter_data(), record_dates):
+            rows.append(ExtractedData.build_row(
+                data_source_id=data_source_id,
+                extraction_job_id=extraction_job_id,
+                data_type=data_type,
+                data_date=record_date or span_start,
+                raw_data={'platform': batch.platform, 'extracted_at': batch.extracted_at, 'data': raw},
+                processed_data=processed_data
+            ))
+            processed_rows.append(processed_data)
+        
+        ExtractedDataPartitions.ensure_for_dates({row['data_date'] for row in rows})
+        ExtractedData.bulk_insert(rows, processed_rows)
+        return len(batch)
+    
+    def _get_batch_dates(self, batch: RecordBatch) -> List[Optional[str]]:
+        """Return each record's day from the first date column present"""
+        for field in self.RECORD_DATE_FIELDS:
+            column = batch.column(field)
+            if column is not None:
+                return [str(value)[:10] if value else None for value in column]
+        return [None] * len(batch)
+    
+    @staticmethod
+    def _as_date(value) -> date:
+        """Normalize a date or datetime to a date"""
+        return value.date() if isinstance(value, datetime) else value
+    
+    @staticmethod
+    def _iter_days(start_day: date, end_day: date):
+        """Yield each day from start_day to end_day, inclusive"""
+        while start_day <= end_day:
+            yield start_day
+            start_day += timedelta(days=1)
     
     def extract_data_for_project(self, 
                                 project_id: str,
                                 start_date: datetime,
                                 end_date: datetime,
-                                force_refresh: bool = False) -> Dict[str, Any]:
+                                force_refresh: bool = False,
+                                concurrent: bool = False) -> Dict[str, Any]:
         """
         Extract data for all data sources in a project
         
@@ -145,6 +708,8 @@ class DataExtractionService:
             start_date: Start date for extraction
             end_date: End date for extraction
             force_refresh: Whether to force refresh even if data exists
+            concurrent: Extract data sources in parallel, bounded by the global
+                and per-platform concurrency limits
             
         Returns:
             Extraction results for all data sources
@@ -166,22 +731,26 @@ class DataExtractionService:
             if not data_sources:
                 return {'success': False, 'error': 'No active data sources found'}
             
+            sources = [{
+                'data_source_id': data_source.id,
+                'data_source_name': data_source.source_name,
+                'platform': data_source.credential.platform if data_source.credential else 'unknown'
+            } for data_source in data_sources]
+            
+            if concurrent and len(sources) > 1:
+                source_results = self._extract_sources_concurrently(sources, start_date, end_date, force_refresh)
+            else:
+                source_results = [
+                    self.extract_data_for_source(source['data_source_id'], start_date, end_date, force_refresh)
+                    for source in sources
+                ]
+            
             results = []
             total_records = 0
             successful_extractions = 0
             
-            for data_source in data_sources:
-                result = self.extract_data_for_source(
-                    data_source.id,
-                    start_date,
-                    end_date,
-                    force_refresh
-                )
-                
-                result['data_source_id'] = data_source.id
-                result['data_source_name'] = data_source.source_name
-                result['platform'] = data_source.credential.platform if data_source.credential else 'unknown'
-                
+            for source, result in zip(sources, source_results):
+                result.update(source)
                 results.append(result)
                 
                 if result['success']:
@@ -201,6 +770,62 @@ class DataExtractionService:
             logger.error(f"Project data extraction failed for project {project_id}: {str(e)}")
             return {'success': False, 'error': str(e)}
     
+    def _extract_sources_concurrently(self,
+                                      sources: List[Dict[str, Any]],
+                                      start_date: datetime,
+                                      end_date: datetime,
+                                      force_refresh: bool) -> List[Dict[str, Any]]:
+        """
+        Run extract_data_for_source for several data sources in parallel
+        
+        Sources are only dispatched when both the global and their platform's
+        concurrency limit have a free slot, so one busy platform never holds
+        worker threads that other platforms could use.
+        
+        Args:
+            sources: Data source descriptors (id, name, platform)
+            start_date: Start date for extraction
+            end_date: End date for extraction
+            force_refresh: Whether to force refresh even if data exists
+            
+        Returns:
+            Extraction results in the same order as sources
+        """
+        app = current_app._get_current_object()
+        results = [None] * len(sources)
+        pending = deque(enumerate(sources))
+        running = {}
+        in_flight = Counter()
+        
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(sources))) as executor:
+            while pending or running:
+                # Dispatch every source whose platform still has a free slot
+                deferred = deque()
+                while pending and len(running) < self.max_workers:
+                    index, source = pending.popleft()
+                    platform = source['platform']
+                    if in_flight[platform] >= self._get_platform_limit(platform):
+                        deferred.append((index, source))
+                        continue
+                    in_flight[platform] += 1
+                    running[executor.submit(
+                        self._call_in_app_context, app, self.extract_data_for_source,
+                        source['data_source_id'], start_date, end_date, force_refresh
+                    )] = (index, source)
+                pending.extendleft(reversed(deferred))
+                
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, source = running.pop(future)
+                    in_flight[source['platform']] -= 1
+                    try:
+                        results[index] = future.result()
+                    except Exception as e:
+                        logger.error(f"Concurrent extraction failed for source {source['data_source_id']}: {str(e)}")
+                        results[index] = {'success': False, 'error': str(e)}
+        
+        return results
+    
     def get_extracted_data(self, 
                           data_source_id: str = None,
                           project_id: str = None,
@@ -230,34 +855,33 @@ class DataExtractionService:
                 query = query.join(DataSource).filter(DataSource.project_id == project_id)
             
             if start_date:
-                query = query.filter(ExtractedData.date_end >= start_date)
+                query = query.filter(ExtractedData.data_date >= self._as_date(start_date))
             
             if end_date:
-                query = query.filter(ExtractedData.date_start <= end_date)
+                query = query.filter(ExtractedData.data_date <= self._as_date(end_date))
             
-            # Order by extraction date (newest first) and limit results
+            # Order by data date (newest first) and limit results
             extracted_data_records = query.order_by(
-                ExtractedData.created_at.desc()
+                ExtractedData.data_date.desc()
             ).limit(limit).all()
             
             # Flatten the data records
             all_records = []
             for extracted_data in extracted_data_records:
-                data_records = extracted_data.get_data()
-                for record in data_records:
-                    # Add metadata to each record
-                    record['_metadata'] = {
-                        'extracted_data_id': extracted_data.id,
-                        'data_source_id': extracted_data.data_source_id,
-                        'extraction_date': extracted_data.created_at.isoformat(),
-                        'date_range': {
-                            'start': extracted_data.date_start.isoformat(),
-                            'end': extracted_data.date_end.isoformat()
-                        }
-                    }
-                    all_records.append(record)
+                record = extracted_data.get_processed_data()
+                # Add metadata to each record
+                record['_metadata'] = {
+                    'extracted_data_id': extracted_data.id,
+                    'data_source_id': extracted_data.data_source_id,
+                    'extraction_job_id': extracted_data.extraction_job_id,
+                    'data_type': extracted_data.data_type,
+                    'data_date': extracted_data.data_date.isoformat(),
+                    'extraction_date': extracted_data.created_at.isoformat() if extracted_data.created_at else None
+                }
+                all_records.append(record)
             
-            return all_records
+            # Ratios are not stored, so derive them from each row's base metrics
+            return add_derived_metrics(all_records, self.DEFAULT_DERIVED_METRICS)
             
         except Exception as e:
             logger.error(f"Failed to retrieve extracted data: {str(e)}")
@@ -283,9 +907,7 @@ class DataExtractionService:
             
             for data_source in data_sources:
                 # Get latest extraction
-                latest_extraction = ExtractedData.query.filter_by(
-                    data_source_id=data_source.id
-                ).order_by(ExtractedData.created_at.desc()).first()
+                latest_job = data_source.get_latest_extraction_job()
                 
                 source_status = {
                     'data_source_id': data_source.id,
@@ -297,14 +919,16 @@ class DataExtractionService:
                     'status': 'never_extracted'
                 }
                 
-                if latest_extraction:
+                if latest_job:
+                    job_config = latest_job.get_job_config()
+                    last_extraction = latest_job.completed_at or latest_job.created_at
                     source_status.update({
-                        'last_extraction': latest_extraction.created_at.isoformat(),
-                        'last_extraction_records': latest_extraction.records_count,
-                        'status': 'extracted',
+                        'last_extraction': last_extraction.isoformat() if last_extraction else None,
+                        'last_extraction_records': latest_job.records_processed,
+                        'status': latest_job.status,
                         'date_range': {
-                            'start': latest_extraction.date_start.isoformat(),
-                            'end': latest_extraction.date_end.isoformat()
+                            'start': job_config.get('start_date'),
+                            'end': job_config.get('end_date')
                         }
                     })
                 
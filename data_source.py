@@ -1,5 +1,9 @@
 from user import db
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from sqlalchemy import and_, or_
+import calendar
+import random
 import uuid
 import json
 
@@ -23,6 +27,25 @@ class DataSource(db.Model):
     # Relationships
     extraction_jobs = db.relationship('ExtractionJob', backref='data_source', lazy=True, cascade='all, delete-orphan')
     extracted_data = db.relationship('ExtractedData', backref='data_source', lazy=True, cascade='all, delete-orphan')
+    metric_facts = db.relationship('MetricFact', backref='data_source', lazy=True, cascade='all, delete-orphan')
+    daily_metric_rollups = db.relationship('DailyMetricRollup', lazy=True, cascade='all, delete-orphan')
+    weekly_metric_rollups = db.relationship('WeeklyMetricRollup', lazy=True, cascade='all, delete-orphan')
+    monthly_metric_rollups = db.relationship('MonthlyMetricRollup', lazy=True, cascade='all, delete-orphan')
+    extraction_coverage = db.relationship('ExtractionCoverage', lazy=True, cascade='all, delete-orphan')
+    
+    # Index used by the scheduler to find sources that are due
+    __table_args__ = (
+        db.Index('idx_data_source_next_extraction', 'is_active', 'next_extraction_at'),
+    )
+    
+    # Supported schedule_config frequencies ('manual' disables scheduling)
+    SCHEDULE_FREQUENCIES = ('daily', 'weekly', 'monthly')
+    
+    # Days extracted by a scheduled run, ending yesterday; days already stored are skipped
+    DEFAULT_LOOKBACK_DAYS = {'daily': 2, 'weekly': 8, 'monthly': 32}
+    
+    # Scheduled runs are spread over this many seconds after the configured time
+    DEFAULT_SCHEDULE_JITTER_SECONDS = 900
     
     def __init__(self, project_id, credential_id, platform, source_name, extraction_config, schedule_config, **kwargs):
         self.project_id = project_id
@@ -54,8 +77,79 @@ class DataSource(db.Model):
             return {}
     
     def set_schedule_config(self, config_dict):
-        """Set schedule configuration from a dictionary"""
+        """Set schedule configuration from a dictionary and reschedule"""
         self.schedule_config = json.dumps(config_dict)
+        self.schedule_next_extraction()
+    
+    def compute_next_extraction_at(self, after=None):
+        """
+        Compute the next scheduled run from schedule_config, without jitter
+        
+        schedule_config keys: enabled, frequency (daily, weekly, monthly or
+        manual), time ('HH:MM'), day_of_week (0 = Sunday), day_of_month and
+        an optional IANA timezone (defaults to UTC).
+        
+        Returns:
+            Next run time in UTC, or None if the source is not scheduled
+        """
+        config = self.get_schedule_config()
+        frequency = config.get('frequency')
+        if not config.get('enabled', True) or frequency not in self.SCHEDULE_FREQUENCIES:
+            return None
+        
+        try:
+            tz = ZoneInfo(config.get('timezone') or 'UTC')
+        except (ZoneInfoNotFoundError, ValueError):
+            tz = timezone.utc
+        
+        after = (after or datetime.now(timezone.utc)).astimezone(tz)
+        try:
+            hour, minute = (int(part) for part in str(config.get('time') or '00:00').split(':')[:2])
+        except ValueError:
+            hour, minute = 0, 0
+        candidate = after.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        
+        if frequency == 'daily':
+            if candidate <= after:
+                candidate += timedelta(days=1)
+        elif frequency == 'weekly':
+            # day_of_week follows the frontend convention where 0 is Sunday
+            day_of_week = int(config.get('day_of_week', 1)) % 7
+            candidate += timedelta(days=(day_of_week - candidate.isoweekday() % 7) % 7)
+            if candidate <= after:
+                candidate += timedelta(days=7)
+        else:
+            day_of_month = int(config.get('day_of_month', 1))
+            year, month = candidate.year, candidate.month
+            while True:
+                # Clamp to the month's length so day 31 runs on the last day of short months
+                day = min(max(day_of_month, 1), calendar.monthrange(year, month)[1])
+                candidate = candidate.replace(year=year, month=month, day=day)
+                if candidate > after:
+                    break
+                year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        
+        return candidate.astimezone(timezone.utc)
+    
+    def get_next_extraction_at(self, after=None):
+        """Return the next scheduled run plus random jitter, or None if unscheduled"""
+        next_run = self.compute_next_extraction_at(after)
+        if next_run:
+            jitter_seconds = self.get_schedule_config().get('jitter_seconds', self.DEFAULT_SCHEDULE_JITTER_SECONDS)
+            next_run += timedelta(seconds=random.uniform(0, max(jitter_seconds, 0)))
+        return next_run
+    
+    def schedule_next_extraction(self, after=None):
+        """Set next_extraction_at to the next scheduled run"""
+        self.next_extraction_at = self.get_next_extraction_at(after)
+        return self.next_extraction_at
+    
+    def get_scheduled_date_range(self, now=None):
+        """Return the (start, end) dates a scheduled run should extract"""
+        config = self.get_schedule_config()
+        lookback_days = int(config.get('lookback_days') or self.DEFAULT_LOOKBACK_DAYS.get(config.get('frequency'), 1))
+        end_date = (now or datetime.now(timezone.utc)).date() - timedelta(days=1)
+        return end_date - timedelta(days=max(lookback_days, 1) - 1), end_date
     
     def update_extraction_status(self, status, next_extraction_time=None):
         """Update extraction status and timestamps"""
@@ -114,14 +208,26 @@ class ExtractionJob(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     data_source_id = db.Column(db.String(36), db.ForeignKey('data_sources.id', ondelete='CASCADE'), nullable=False)
     job_type = db.Column(db.String(50), nullable=False)  # scheduled, manual, backfill
-    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, completed, failed
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, queued, running, completed, failed
     started_at = db.Column(db.DateTime(timezone=True))
     completed_at = db.Column(db.DateTime(timezone=True))
     records_processed = db.Column(db.Integer, default=0)
     error_message = db.Column(db.Text)
     job_config = db.Column(db.Text)  # JSON string for job-specific configuration
+    worker_id = db.Column(db.String(100))                 # Worker holding the lease on a queued job
+    attempts = db.Column(db.Integer, default=0)           # Number of times a worker claimed the job
+    heartbeat_at = db.Column(db.DateTime(timezone=True))
+    lease_expires_at = db.Column(db.DateTime(timezone=True))
     created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     
+    # Index used by workers to find the oldest claimable job
+    __table_args__ = (
+        db.Index('idx_extraction_job_status_created', 'status', 'created_at'),
+    )
+    
+    # Queued jobs are retried at most this many times after a worker lost its lease
+    MAX_ATTEMPTS = 3
+    
     def __init__(self, data_source_id, job_type, **kwargs):
         self.data_source_id = data_source_id
         self.job_type = job_type
@@ -144,6 +250,9 @@ class ExtractionJob(db.Model):
         """Mark job as started"""
         self.status = 'running'
         self.started_at = datetime.now(timezone.utc)
+        # Clear the outcome of an earlier attempt when a job is resumed
+        self.completed_at = None
+        self.error_message = None
         db.session.commit()
     
     def complete_job(self, records_processed=0):
@@ -151,6 +260,7 @@ class ExtractionJob(db.Model):
         self.status = 'completed'
         self.completed_at = datetime.now(timezone.utc)
         self.records_processed = records_processed
+        self.lease_expires_at = None
         db.session.commit()
     
     def fail_job(self, error_message):
@@ -158,7 +268,81 @@ class ExtractionJob(db.Model):
         self.status = 'failed'
         self.completed_at = datetime.now(timezone.utc)
         self.error_message = error_message
+        self.lease_expires_at = None
+        db.session.commit()
+    
+    @classmethod
+    def claim_next(cls, worker_id, lease_seconds):
+        """
+        Claim the oldest queued job, or a running job whose lease expired
+        
+        On PostgreSQL the candidate row is locked with FOR UPDATE SKIP LOCKED
+        so concurrent workers never wait on each other. The claim itself is
+        a conditional UPDATE, which keeps it safe on databases that ignore
+        row locks.
+        
+        Returns:
+            The claimed job, or None if nothing is claimable
+        """
+        now = datetime.now(timezone.utc)
+        candidate = cls.query.filter(
+            or_(
+                cls.status == 'queued',
+                and_(cls.status == 'running', cls.lease_expires_at < now)
+            ),
+            cls.attempts < cls.MAX_ATTEMPTS
+        ).order_by(cls.created_at).with_for_update(skip_locked=True).first()
+        
+        if not candidate:
+            db.session.commit()
+            return None
+        
+        claimed = cls.query.filter(
+            cls.id == candidate.id,
+            cls.status == candidate.status,
+            cls.attempts == candidate.attempts
+        ).update({
+            'status': 'running',
+            'worker_id': worker_id,
+            'attempts': candidate.attempts + 1,
+            'heartbeat_at': now,
+            'lease_expires_at': now + timedelta(seconds=lease_seconds)
+        }, synchronize_session=False)
+        db.session.commit()
+        
+        if not claimed:
+            return None
+        
+        db.session.refresh(candidate)
+        return candidate
+    
+    @classmethod
+    def renew_lease(cls, job_id, worker_id, lease_seconds):
+        """Record a worker heartbeat and extend its lease on a running job"""
+        now = datetime.now(timezone.utc)
+        renewed = cls.query.filter_by(id=job_id, worker_id=worker_id, status='running').update({
+            'heartbeat_at': now,
+            'lease_expires_at': now + timedelta(seconds=lease_seconds)
+        }, synchronize_session=False)
+        db.session.commit()
+        return bool(renewed)
+    
+    @classmethod
+    def fail_abandoned_jobs(cls):
+        """Fail running jobs whose lease expired after their last allowed attempt"""
+        now = datetime.now(timezone.utc)
+        failed = cls.query.filter(
+            cls.status == 'running',
+            cls.lease_expires_at < now,
+            cls.attempts >= cls.MAX_ATTEMPTS
+        ).update({
+            'status': 'failed',
+            'completed_at': now,
+            'lease_expires_at': None,
+            'error_message': 'Worker lease expired too many times'
+        }, synchronize_session=False)
         db.session.commit()
+        return failed
     
     def get_duration(self):
         """Get job duration in seconds"""
@@ -178,6 +362,10 @@ class ExtractionJob(db.Model):
             'records_processed': self.records_processed,
             'error_message': self.error_message,
             'job_config': self.get_job_config(),
+            'worker_id': self.worker_id,
+            'attempts': self.attempts,
+            'heartbeat_at': self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+            'lease_expires_at': self.lease_expires_at.isoformat() if self.lease_expires_at else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'duration_seconds': self.get_duration()
         }
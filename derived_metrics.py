@@ -0,0 +1,132 @@
+"""
+Derived metric registry
+
+Ratios such as CTR or ROAS don't add up across rows, so they are never
+stored. Only additive base metrics are persisted, and derived metrics are
+evaluated with NumPy at read time over whatever grouping was aggregated.
+"""
+
+from typing import Dict, List, Any, Callable, Iterable, Tuple
+import numpy as np
+
+
+class DerivedMetric:
+    """A metric computed from base metrics by a vectorized formula"""
+    
+    def __init__(self, name: str, inputs: Tuple[str, ...], formula: Callable[..., np.ndarray],
+                 aliases: Tuple[str, ...] = (), precision: int = 2):
+        """
+        Initialize the metric
+        
+        Args:
+            name: Metric name
+            inputs: Base metrics passed to formula, in order
+            formula: Function of the input arrays returning the metric array
+            aliases: Platform names for the same metric (e.g. average_cpc)
+            precision: Decimal places results are rounded to
+        """
+        self.name = name
+        self.inputs = inputs
+        self.formula = formula
+        self.aliases = aliases
+        self.precision = precision
+    
+    def evaluate(self, columns: Dict[str, Any]) -> np.ndarray:
+        """Evaluate the metric over aggregated input columns"""
+        arrays = [np.asarray(columns[name], dtype=float) for name in self.inputs]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = self.formula(*arrays)
+        # Ratios with a zero denominator are reported as 0
+        return np.round(np.where(np.isfinite(values), values, 0.0), self.precision)
+
+
+DERIVED_METRICS: Dict[str, DerivedMetric] = {}
+
+
+def register_derived_metric(name: str, inputs: Iterable[str], formula: Callable[..., np.ndarray],
+                            aliases: Iterable[str] = (), precision: int = 2) -> DerivedMetric:
+    """Register a derived metric under its name and aliases"""
+    metric = DerivedMetric(name, tuple(inputs), formula, tuple(aliases), precision)
+    for key in (name,) + metric.aliases:
+        DERIVED_METRICS[key] = metric
+    return metric
+
+
+def is_derived_metric(name: str) -> bool:
+    """Whether a metric is derived and therefore not stored"""
+    return name in DERIVED_METRICS
+
+
+def split_metrics(metrics: Iterable[str]) -> Tuple[List[str], List[str]]:
+    """
+    Split requested metrics into the base metrics to aggregate and the derived ones
+    
+    Returns:
+        (base metrics including every derived metric input, derived metrics)
+    """
+    base, derived = [], []
+    for name in metrics:
+        if is_derived_metric(name):
+            derived.append(name)
+            names = DERIVED_METRICS[name].inputs
+        else:
+            names = (name,)
+        for base_name in names:
+            if base_name not in base:
+                base.append(base_name)
+    return base, derived
+
+
+def compute_derived_metrics(columns: Dict[str, Any], metrics: Iterable[str]) -> Dict[str, np.ndarray]:
+    """
+    Evaluate derived metrics over aggregated base metric columns
+    
+    Args:
+        columns: Base metric name to array of aggregated values
+        metrics: Derived metrics to evaluate; ones with missing inputs are skipped
+    
+    Returns:
+        Derived metric name to array of values
+    """
+    results = {}
+    for name in metrics:
+        metric = DERIVED_METRICS.get(name)
+        if metric and all(input_name in columns for input_name in metric.inputs):
+            results[name] = metric.evaluate(columns)
+    return results
+
+
+def add_derived_metrics(records: List[Dict[str, Any]], metrics: Iterable[str] = None) -> List[Dict[str, Any]]:
+    """
+    Add derived metrics to each record whose base metrics are present
+    
+    Args:
+        records: Row dicts, updated in place
+        metrics: Derived metrics to add, defaults to all registered ones
+    
+    Returns:
+        The same records
+    """
+    names = list(dict.fromkeys(metrics if metrics is not None else (m.name for m in DERIVED_METRICS.values())))
+    for name in names:
+        metric = DERIVED_METRICS.get(name)
+        if not metric:
+            continue
+        rows = [record for record in records if all(
+            isinstance(record.get(input_name), (int, float)) for input_name in metric.inputs
+        )]
+        if not rows:
+            continue
+        columns = {input_name: [row[input_name] for row in rows] for input_name in metric.inputs}
+        for row, value in zip(rows, metric.evaluate(columns).tolist()):
+            row[name] = value
+    return records
+
+
+register_derived_metric('ctr', ('clicks', 'impressions'), lambda clicks, impressions: clicks / impressions * 100)
+register_derived_metric('cpc', ('cost', 'clicks'), lambda cost, clicks: cost / clicks, aliases=('average_cpc',))
+register_derived_metric('cpm', ('cost', 'impressions'), lambda cost, impressions: cost / impressions * 1000,
+                        aliases=('average_cpm',))
+register_derived_metric('roas', ('revenue', 'cost'), lambda revenue, cost: revenue / cost)
+register_derived_metric('cost_per_conversion', ('cost', 'conversions'), lambda cost, conversions: cost / conversions)
+register_derived_metric('conversion_rate', ('conversions', 'clicks'), lambda conversions, clicks: conversions / clicks * 100)
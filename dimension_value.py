@@ -0,0 +1,144 @@
+from user import db, dialect_insert
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+import threading
+
+class DimensionValue(db.Model):
+    """
+    Per-project dictionary of dimension values
+    
+    Each distinct (project, dimension, value) gets an integer id, so
+    MetricFact rows store small integer keys instead of repeating strings
+    such as campaign names. Ids are cached per process once the transaction
+    that created or read them has committed.
+    """
+    __tablename__ = 'dimension_values'
+    
+    # Longest value stored, longer values are truncated
+    MAX_VALUE_LENGTH = 255
+    # Entries kept in the process-wide cache before it is cleared
+    CACHE_MAX_ENTRIES = 200000
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    project_id = db.Column(db.String(36), db.ForeignKey('projects.id', ondelete='CASCADE'), nullable=False)
+    dimension = db.Column(db.String(50), nullable=False)
+    value = db.Column(db.String(MAX_VALUE_LENGTH), nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint('project_id', 'dimension', 'value', name='unique_dimension_value'),
+    )
+    
+    _cache = {}
+    _cache_lock = threading.Lock()
+    
+    @classmethod
+    def get_ids(cls, project_id, dimension, values, create=True):
+        """
+        Map dimension values to their ids, creating missing entries
+        
+        Args:
+            project_id: Project the values belong to
+            dimension: Dimension name (e.g. campaign_name)
+            values: Values to map; None is left out
+            create: Insert values that don't exist yet, otherwise skip them
+        
+        Returns:
+            Dict of value to id
+        """
+        values = {cls.clean_value(value) for value in values if value is not None}
+        ids = {}
+        missing = []
+        with cls._cache_lock:
+            for value in values:
+                key = (project_id, dimension, value)
+                if key in cls._cache:
+                    ids[value] = cls._cache[key]
+                else:
+                    missing.append(value)
+        if not missing:
+            return ids
+        
+        found = cls._select_ids(project_id, dimension, missing)
+        if create and len(found) < len(missing):
+            cls._insert_values(project_id, dimension, [value for value in missing if value not in found])
+            found = cls._select_ids(project_id, dimension, missing)
+        
+        # Only cache ids once they are committed, so a rolled back insert never leaves a dangling id
+        pending = db.session.info.setdefault('pending_dimension_ids', {})
+        for value, value_id in found.items():
+            pending[(project_id, dimension, value)] = value_id
+        ids.update(found)
+        return ids
+    
+    @classmethod
+    def find_ids(cls, project_ids, dimension, values):
+        """Ids of existing values of a dimension across projects, for filtering"""
+        values = [cls.clean_value(value) for value in values if value is not None]
+        if not values or not project_ids:
+            return []
+        rows = db.session.query(cls.id).filter(
+            cls.project_id.in_(project_ids),
+            cls.dimension == dimension,
+            cls.value.in_(values)
+        ).all()
+        return [row.id for row in rows]
+    
+    @classmethod
+    def _select_ids(cls, project_id, dimension, values):
+        ids = {}
+        # Chunked to stay under bind parameter limits
+        for offset in range(0, len(values), 500):
+            rows = db.session.query(cls.value, cls.id).filter(
+                cls.project_id == project_id,
+                cls.dimension == dimension,
+                cls.value.in_(values[offset:offset + 500])
+            ).all()
+            ids.update((row.value, row.id) for row in rows)
+        return ids
+    
+    @classmethod
+    def _insert_values(cls, project_id, dimension, values):
+        # Sorted so concurrent inserts lock the unique index in the same order
+        rows = [{'project_id': project_id, 'dimension': dimension, 'value': value} for value in sorted(values)]
+        statement = dialect_insert(cls.__table__)
+        if statement is not None:
+            # Concurrent workers may add the same value, the unique constraint keeps one
+            statement = statement.on_conflict_do_nothing()
+        else:
+            # values were all missing when selected, so only a concurrent insert can conflict
+            statement = cls.__table__.insert()
+        db.session.execute(statement, rows)
+    
+    @classmethod
+    def clean_value(cls, value):
+        """Value as stored in the dictionary"""
+        return str(value)[:cls.MAX_VALUE_LENGTH]
+    
+    @classmethod
+    def _promote_pending(cls, session):
+        pending = session.info.pop('pending_dimension_ids', None)
+        if not pending:
+            return
+        with cls._cache_lock:
+            if len(cls._cache) + len(pending) > cls.CACHE_MAX_ENTRIES:
+                cls._cache.clear()
+            cls._cache.update(pending)
+    
+    @classmethod
+    def clear_cache(cls):
+        """Forget all cached ids"""
+        with cls._cache_lock:
+            cls._cache.clear()
+    
+    def __repr__(self):
+        return f'<DimensionValue {self.dimension}={self.value}>'
+
+
+@event.listens_for(Session, 'after_commit')
+def _cache_committed_dimension_ids(session):
+    DimensionValue._promote_pending(session)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_pending_dimension_ids(session, previous_transaction):
+    session.info.pop('pending_dimension_ids', None)
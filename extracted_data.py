@@ -1,18 +1,51 @@
-from user import db
+from user import db, dialect_insert
 from datetime import datetime, timezone, date
 import uuid
 import json
 import hashlib
+import zlib
+import numpy as np
+from derived_metrics import split_metrics, compute_derived_metrics
+from metric_fact import MetricFact
+from metric_rollup import (add_facts_to_rollups, remove_facts_from_rollups, aggregate_rollups, bucket_by_period,
+                           ROLLUP_MODELS)
+from partitioning import partitioning_configured
 
 class ExtractedData(db.Model):
     __tablename__ = 'extracted_data'
     
+    # Rows sent per executemany call in bulk_insert
+    BULK_INSERT_CHUNK_SIZE = 1000
+    
+    # Data type stored for records when the extraction config doesn't set one
+    DEFAULT_DATA_TYPE = 'campaign'
+    
+    # raw_data starts with a one-byte codec marker followed by the encoded JSON
+    RAW_DATA_CODEC_JSON = b'j'          # uncompressed
+    RAW_DATA_CODEC_ZLIB = b'z'          # zlib stream
+    RAW_DATA_CODEC_DEFLATE_DICT = b'd'  # raw deflate primed with RAW_DATA_DICTIONARY
+    RAW_DATA_COMPRESSION_LEVEL = 6
+    # Preset dictionary of the field names and values shared by most records, so
+    # records of a few hundred bytes still compress well on their own. Rows
+    # written with it can only be decoded with the exact same bytes: add a new
+    # codec marker instead of editing it.
+    RAW_DATA_DICTIONARY = (
+        b'"account_name":"account_id":"ad_group_name":"adset_name":"keyword_text":"keyword":'
+        b'"age_range":"age_group":"gender":"location":"device_platform":"device":"mobile","desktop","tablet",'
+        b'"conversion_values":"conversions_value":"conversions":"revenue":"spend":"cost_micros":"cost":'
+        b'"reach":"frequency":"clicks":"impressions":"date_start":"date_stop":"date":"20","campaign_name":"Campaign ",'
+        b'"data":{"extracted_at":"20T00:00:00.000000+00:00","platform":"facebook_ads","google_ads","meta_ads"}'
+    )
+    
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     data_source_id = db.Column(db.String(36), db.ForeignKey('data_sources.id', ondelete='CASCADE'), nullable=False)
     extraction_job_id = db.Column(db.String(36), db.ForeignKey('extraction_jobs.id'), nullable=False)
     data_type = db.Column(db.String(100), nullable=False)  # campaign, ad_group, keyword, etc.
-    data_date = db.Column(db.Date, nullable=False)
-    raw_data = db.Column(db.Text, nullable=False)      # JSON string of raw API response
+    # Part of the primary key of partitioned tables, which PostgreSQL requires
+    # of the partition key (see partitioning.py)
+    data_date = db.Column(db.Date, primary_key=partitioning_configured(), nullable=False)
+    # Compressed raw API response, only loaded when accessed
+    raw_data = db.deferred(db.Column(db.LargeBinary, nullable=False))
     processed_data = db.Column(db.Text, nullable=False) # JSON string of processed/normalized data
     metrics = db.Column(db.Text)                        # JSON string of calculated metrics
     data_hash = db.Column(db.String(64), nullable=False) # Hash for deduplication
@@ -24,6 +57,7 @@ class ExtractedData(db.Model):
                           name='unique_extracted_data'),
         db.Index('idx_data_source_date', 'data_source_id', 'data_date'),
         db.Index('idx_data_type_date', 'data_type', 'data_date'),
+        {'postgresql_partition_by': 'RANGE (data_date)'} if partitioning_configured() else {},
     )
     
     def __init__(self, data_source_id, extraction_job_id, data_type, data_date, raw_data, processed_data, **kwargs):
@@ -39,15 +73,47 @@ class ExtractedData(db.Model):
                 setattr(self, key, value)
     
     def get_raw_data(self):
-        """Get raw data as a dictionary"""
+        """Get raw data as a dictionary, decompressing it on access"""
         try:
-            return json.loads(self.raw_data) if self.raw_data else {}
-        except json.JSONDecodeError:
+            return self.decode_raw_data(self.raw_data)
+        except (ValueError, zlib.error):
             return {}
     
     def set_raw_data(self, data_dict):
         """Set raw data from a dictionary"""
-        self.raw_data = json.dumps(data_dict, sort_keys=True)
+        self.raw_data = self.encode_raw_data(data_dict)
+    
+    @classmethod
+    def encode_raw_data(cls, data_dict):
+        """Serialize raw data as compact JSON compressed with the preset dictionary, behind its codec marker"""
+        payload = json.dumps(data_dict, separators=(',', ':')).encode('utf-8')
+        compressor = zlib.compressobj(cls.RAW_DATA_COMPRESSION_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS,
+                                      zdict=cls.RAW_DATA_DICTIONARY)
+        return cls.RAW_DATA_CODEC_DEFLATE_DICT + compressor.compress(payload) + compressor.flush()
+    
+    @classmethod
+    def decode_raw_data(cls, value):
+        """
+        Decode a stored raw_data value
+        
+        Accepts every codec marker, and plain JSON text written before raw
+        data was compressed.
+        """
+        if not value:
+            return {}
+        if isinstance(value, str):
+            return json.loads(value)
+        value = bytes(value)
+        codec, payload = value[:1], value[1:]
+        if codec == cls.RAW_DATA_CODEC_DEFLATE_DICT:
+            decompressor = zlib.decompressobj(-zlib.MAX_WBITS, zdict=cls.RAW_DATA_DICTIONARY)
+            return json.loads(decompressor.decompress(payload) + decompressor.flush())
+        if codec == cls.RAW_DATA_CODEC_ZLIB:
+            return json.loads(zlib.decompress(payload))
+        if codec == cls.RAW_DATA_CODEC_JSON:
+            return json.loads(payload)
+        # Legacy JSON text read back as bytes
+        return json.loads(value)
     
     def get_processed_data(self):
         """Get processed data as a dictionary"""
@@ -77,13 +143,175 @@ class ExtractedData(db.Model):
         hash_string = f"{self.data_source_id}:{self.data_type}:{self.data_date}:{self.processed_data}"
         self.data_hash = hashlib.sha256(hash_string.encode()).hexdigest()
     
+    @classmethod
+    def build_row(cls, data_source_id, extraction_job_id, data_type, data_date, raw_data, processed_data):
+        """
+        Build a column dictionary for bulk_insert without going through the ORM
+        
+        Produces the same data_hash as the constructor while serializing the
+        processed data only once.
+        """
+        if not isinstance(data_date, date):
+            data_date = datetime.strptime(data_date, '%Y-%m-%d').date()
+        processed_json = json.dumps(processed_data, sort_keys=True)
+        hash_string = f"{data_source_id}:{data_type}:{data_date}:{processed_json}"
+        return {
+            'id': str(uuid.uuid4()),
+            'data_source_id': data_source_id,
+            'extraction_job_id': extraction_job_id,
+            'data_type': data_type,
+            'data_date': data_date,
+            'raw_data': cls.encode_raw_data(raw_data),
+            'processed_data': processed_json,
+            'data_hash': hashlib.sha256(hash_string.encode()).hexdigest(),
+            'created_at': datetime.now(timezone.utc)
+        }
+    
+    @classmethod
+    def bulk_insert(cls, rows, processed_rows=None):
+        """
+        Insert rows built by build_row in batched INSERT statements
+        
+        Rows that collide with the unique_extracted_data constraint are
+        dropped by the database (ON CONFLICT DO NOTHING on PostgreSQL and
+        SQLite), or left out after looking them up on other databases. When processed_rows is given, a MetricFact is inserted for
+        each row that was actually inserted, using the ids returned by the
+        INSERT. The caller is responsible for committing.
+        
+        Args:
+            rows: Row dictionaries from build_row
+            processed_rows: Processed data of each row, in the same order
+        
+        Returns:
+            Number of rows actually inserted
+        """
+        if not rows:
+            return 0
+        
+        statement = dialect_insert(cls.__table__)
+        if statement is not None:
+            statement = statement.on_conflict_do_nothing()
+            if processed_rows is not None:
+                statement = statement.returning(cls.__table__.c.id)
+        
+        # executemany reuses one compiled statement and lets the driver batch
+        # the rows instead of issuing one ORM flush per object
+        inserted = 0
+        facts = []
+        for offset in range(0, len(rows), cls.BULK_INSERT_CHUNK_SIZE):
+            chunk = rows[offset:offset + cls.BULK_INSERT_CHUNK_SIZE]
+            if statement is None:
+                # Without ON CONFLICT, rows that are already stored are left out up front
+                new_rows = cls._without_stored_rows(chunk)
+                if new_rows:
+                    db.session.execute(cls.__table__.insert(), new_rows)
+                inserted_ids = {row['id'] for row in new_rows}
+            elif processed_rows is None:
+                inserted += max(db.session.execute(statement, chunk).rowcount or 0, 0)
+                continue
+            else:
+                # Duplicates skipped by ON CONFLICT are not returned
+                inserted_ids = set(db.session.execute(statement, chunk).scalars().all())
+            inserted += len(inserted_ids)
+            if processed_rows is None:
+                continue
+            
+            chunk_processed = processed_rows[offset:offset + cls.BULK_INSERT_CHUNK_SIZE]
+            facts.extend(
+                MetricFact.build_row(row, processed)
+                for row, processed in zip(chunk, chunk_processed)
+                if row['id'] in inserted_ids
+            )
+        
+        if facts:
+            MetricFact.bulk_insert(facts)
+            add_facts_to_rollups(facts)
+        return inserted
+    
+    @classmethod
+    def _without_stored_rows(cls, rows):
+        """Rows not yet stored under unique_extracted_data, keeping the first of duplicates within rows"""
+        unique = {}
+        for row in rows:
+            unique.setdefault((row['data_source_id'], row['data_type'], row['data_date'], row['data_hash']), row)
+        stored = {
+            tuple(key) for key in db.session.query(
+                cls.data_source_id, cls.data_type, cls.data_date, cls.data_hash
+            ).filter(cls.data_hash.in_({row['data_hash'] for row in rows}))
+        }
+        return [row for key, row in unique.items() if key not in stored]
+    
+    @classmethod
+    def delete_date_range(cls, data_source_id, data_type, start_date, end_date):
+        """
+        Delete the rows of a data source and data type within a date range
+        
+        Their MetricFact rows are deleted too and subtracted from the
+        rollups, so a re-extraction can replace rows whose metrics changed
+        instead of storing them next to the old ones. The caller is
+        responsible for committing.
+        
+        Returns:
+            Number of rows deleted
+        """
+        start_date, end_date = cls._to_date(start_date), cls._to_date(end_date)
+        fact_filters = (
+            MetricFact.data_source_id == data_source_id,
+            MetricFact.data_type == data_type,
+            MetricFact.data_date >= start_date,
+            MetricFact.data_date <= end_date
+        )
+        facts = [row._asdict() for row in db.session.execute(db.select(MetricFact.__table__).where(*fact_filters))]
+        if facts:
+            remove_facts_from_rollups(facts)
+            MetricFact.query.filter(*fact_filters).delete(synchronize_session=False)
+        
+        return cls.query.filter(
+            cls.data_source_id == data_source_id,
+            cls.data_type == data_type,
+            cls.data_date >= start_date,
+            cls.data_date <= end_date
+        ).delete(synchronize_session=False)
+    
+    @classmethod
+    def backfill_metric_facts(cls, chunk_size=1000):
+        """
+        Create the missing MetricFact and rollup totals of rows stored before facts existed
+        
+        Commits after each chunk so it can be stopped and resumed.
+        
+        Returns:
+            Number of facts created
+        """
+        created = 0
+        while True:
+            rows = db.session.query(
+                cls.id, cls.data_source_id, cls.data_type, cls.data_date, cls.processed_data
+            ).outerjoin(MetricFact, MetricFact.id == cls.id).filter(
+                MetricFact.id.is_(None)
+            ).limit(chunk_size).all()
+            if not rows:
+                return created
+            
+            facts = []
+            for row in rows:
+                try:
+                    processed = json.loads(row.processed_data) if row.processed_data else {}
+                except json.JSONDecodeError:
+                    processed = {}
+                facts.append(MetricFact.build_row(row._asdict(), processed))
+            MetricFact.bulk_insert(facts)
+            add_facts_to_rollups(facts)
+            db.session.commit()
+            created += len(facts)
+    
     @classmethod
     def get_data_for_date_range(cls, data_source_id, start_date, end_date, data_types=None):
         """Get extracted data for a date range"""
         query = cls.query.filter(
             cls.data_source_id == data_source_id,
-            cls.data_date >= start_date,
-            cls.data_date <= end_date
+            cls.data_date >= cls._to_date(start_date),
+            cls.data_date <= cls._to_date(end_date)
         )
         
         if data_types:
@@ -100,11 +328,115 @@ class ExtractedData(db.Model):
         ).order_by(cls.data_date.desc()).limit(limit).all()
     
     @classmethod
-    def aggregate_metrics_by_date(cls, data_source_ids, start_date, end_date, metrics_list):
-        """Aggregate metrics across multiple data sources by date"""
-        # This would implement complex aggregation logic
-        # For now, return a placeholder structure
-        return {}
+    def aggregate_metrics_by_date(cls, data_source_ids, start_date, end_date, metrics_list, filters=None,
+                                  granularity='day', data_type=DEFAULT_DATA_TYPE):
+        """
+        Aggregate metrics across multiple data sources by date
+        
+        Additive base metrics are summed per period, then derived metrics
+        such as ctr or roas are evaluated over the period totals, so ratios
+        stay correct however many rows a period has. Unfiltered queries on
+        the typed MetricFact metrics read the coarsest metric rollups that
+        cover the range, ones filtered on MetricFact dimensions sum
+        MetricFact rows in SQL, and any other metric or filter falls back to
+        summing the processed_data JSON. Only rows of one data type are
+        summed, since e.g. campaign rows repeat the totals of ad group rows.
+        
+        Args:
+            data_source_ids: Data sources to include
+            start_date: First day, inclusive
+            end_date: Last day, inclusive
+            metrics_list: Base and derived metrics to return
+            filters: Optional {dimension: value or list of values} to restrict rows
+            granularity: Period of the results: day, week (starting Monday) or month
+            data_type: Data type of the rows to sum
+        
+        Returns:
+            Dict of ISO period start date to metric name to value, ordered by date
+        """
+        if granularity not in ROLLUP_MODELS:
+            raise ValueError(f"Unsupported granularity: {granularity}")
+        start_date, end_date = cls._to_date(start_date), cls._to_date(end_date)
+        base_metrics, derived_metrics = split_metrics(metrics_list)
+        typed = (all(metric in MetricFact.METRICS for metric in base_metrics)
+                 and all(dimension in MetricFact.DIMENSIONS for dimension in filters or {}))
+        if typed:
+            if filters:
+                daily = bucket_by_period(MetricFact.aggregate_by_date(
+                    data_source_ids, data_type, start_date, end_date, base_metrics, filters
+                ), granularity)
+            else:
+                daily = aggregate_rollups(data_source_ids, data_type, start_date, end_date, base_metrics, granularity)
+        else:
+            daily = bucket_by_period(cls._aggregate_processed_data(
+                data_source_ids, data_type, start_date, end_date, base_metrics, filters
+            ), granularity)
+        if not daily:
+            return {}
+        
+        dates = [day for day, _ in daily]
+        totals = np.array([values for _, values in daily], dtype=float).reshape(len(dates), len(base_metrics))
+        columns = {metric: totals[:, position] for position, metric in enumerate(base_metrics)}
+        columns.update(compute_derived_metrics(columns, derived_metrics))
+        
+        requested = [metric for metric in metrics_list if metric in columns]
+        result = {}
+        for position, day in enumerate(dates):
+            result[day.isoformat()] = {
+                metric: cls._to_number(columns[metric][position]) for metric in requested
+            }
+        return result
+    
+    @classmethod
+    def _aggregate_processed_data(cls, data_source_ids, data_type, start_date, end_date, metrics, filters=None):
+        """Sum metrics of one data type per day by decoding processed_data, as (date, totals) tuples ordered by date"""
+        rows = db.session.query(cls.data_date, cls.processed_data).filter(
+            cls.data_source_id.in_(data_source_ids),
+            cls.data_type == data_type,
+            cls.data_date >= start_date,
+            cls.data_date <= end_date
+        ).all()
+        rows = [(row.data_date, json.loads(row.processed_data) if row.processed_data else {}) for row in rows]
+        for dimension, values in (filters or {}).items():
+            if not isinstance(values, (list, tuple, set)):
+                values = [values]
+            wanted = {str(value) for value in values}
+            rows = [(day, data) for day, data in rows if str(data.get(dimension)) in wanted]
+        if not rows:
+            return []
+        
+        dates = sorted({day for day, _ in rows})
+        date_index = {day: position for position, day in enumerate(dates)}
+        values = np.zeros((len(rows), len(metrics)))
+        for position, (_, data) in enumerate(rows):
+            values[position] = [
+                data[metric] if isinstance(data.get(metric), (int, float)) else 0
+                for metric in metrics
+            ]
+        
+        totals = np.zeros((len(dates), len(metrics)))
+        np.add.at(totals, [date_index[day] for day, _ in rows], values)
+        return list(zip(dates, totals))
+    
+    @staticmethod
+    def _to_date(value):
+        """
+        Normalize a date bound to a date
+        
+        Comparing data_date with plain dates keeps the bounds usable for
+        partition pruning on PostgreSQL.
+        """
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, str):
+            return datetime.strptime(value[:10], '%Y-%m-%d').date()
+        return value
+    
+    @staticmethod
+    def _to_number(value):
+        """Convert a NumPy value to an int when whole, otherwise a rounded float"""
+        value = float(value)
+        return int(value) if value.is_integer() else round(value, 2)
     
     def to_dict(self, include_raw_data=False):
         """Convert extracted data to dictionary representation"""
@@ -122,7 +454,7 @@ class ExtractedData(db.Model):
         
         if include_raw_data:
             data['raw_data'] = self.get_raw_data()
-            
+        
         return data
     
     def __repr__(self):
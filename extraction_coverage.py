@@ -0,0 +1,87 @@
+from user import db, dialect_insert
+from datetime import datetime, timezone
+import hashlib
+import json
+
+class ExtractionCoverage(db.Model):
+    """
+    Days whose extraction completed for a data source and data type
+    
+    A day is only recorded once every batch of its span has been stored, so
+    days with no rows (paused or zero-delivery entities) count as extracted
+    and a day left half-stored by a failed run does not. config_hash
+    fingerprints the metrics, dimensions and filters the day was extracted
+    with, so changing them makes the days missing again. Days recorded from
+    data stored before coverage existed have no config_hash and match any
+    config.
+    """
+    __tablename__ = 'extraction_coverage'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    data_source_id = db.Column(db.String(36), db.ForeignKey('data_sources.id', ondelete='CASCADE'), nullable=False)
+    data_type = db.Column(db.String(100), nullable=False)
+    data_date = db.Column(db.Date, nullable=False)
+    config_hash = db.Column(db.String(64))
+    extraction_job_id = db.Column(db.String(36))
+    completed_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    
+    __table_args__ = (
+        db.UniqueConstraint('data_source_id', 'data_type', 'data_date', name='unique_extraction_coverage'),
+    )
+    
+    @staticmethod
+    def config_hash_of(config):
+        """Fingerprint of the extraction config fields that decide which rows are stored"""
+        fields = {key: config.get(key) or None for key in ('metrics', 'dimensions', 'filters')}
+        return hashlib.sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest()
+    
+    @classmethod
+    def covered_days(cls, data_source_id, data_type, config_hash, start_date, end_date):
+        """Days in a range that were extracted with the given data type and config"""
+        rows = db.session.query(cls.data_date).filter(
+            cls.data_source_id == data_source_id,
+            cls.data_type == data_type,
+            cls.data_date >= start_date,
+            cls.data_date <= end_date,
+            db.or_(cls.config_hash == config_hash, cls.config_hash.is_(None))
+        )
+        return {row.data_date for row in rows}
+    
+    @classmethod
+    def record_days(cls, data_source_id, data_type, config_hash, extraction_job_id, days):
+        """
+        Record days as extracted, replacing earlier records of the same days
+        
+        The caller is responsible for committing, together with the rows.
+        """
+        rows = [{
+            'data_source_id': data_source_id,
+            'data_type': data_type,
+            'data_date': day,
+            'config_hash': config_hash,
+            'extraction_job_id': extraction_job_id,
+            'completed_at': datetime.now(timezone.utc)
+        } for day in sorted(set(days))]
+        if not rows:
+            return
+        
+        statement = dialect_insert(cls.__table__)
+        if statement is None:
+            cls.query.filter(
+                cls.data_source_id == data_source_id,
+                cls.data_type == data_type,
+                cls.data_date.in_([row['data_date'] for row in rows])
+            ).delete(synchronize_session=False)
+            db.session.execute(cls.__table__.insert(), rows)
+            return
+        statement = statement.on_conflict_do_update(
+            index_elements=['data_source_id', 'data_type', 'data_date'],
+            set_={
+                column: statement.excluded[column]
+                for column in ('config_hash', 'extraction_job_id', 'completed_at')
+            }
+        )
+        db.session.execute(statement, rows)
+    
+    def __repr__(self):
+        return f'<ExtractionCoverage {self.data_type} ({self.data_date})>'
@@ -1,14 +1,93 @@
-from datetime import datetime
-from typing import Dict, List, Any
-import requests
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Iterator, Tuple, Optional
+from urllib.parse import urlencode
+import json
 import logging
-from .base import BaseIntegration
+import os
+import time
+from .base import BaseIntegration, FanOutMixin, AuthenticationError, batched
+from .rate_limiter import get_rate_limiter
+from .record_batch import RecordBatch
 
 logger = logging.getLogger(__name__)
 
-class FacebookAdsIntegration(BaseIntegration):
+class FacebookAdsIntegration(FanOutMixin, BaseIntegration):
     """Facebook/Meta Marketing API integration"""
     
+    # Graph API endpoint, overridable with the graph_base_url config key or
+    # FACEBOOK_GRAPH_BASE_URL (e.g. to point at a local stand-in server)
+    GRAPH_BASE_URL = 'https://graph.facebook.com'
+    API_VERSION = 'v18.0'
+    
+    # Async report runs, overridable with the matching lowercase config keys
+    REPORT_WINDOW_DAYS = 7
+    MAX_CONCURRENT_REPORTS = 3
+    REPORT_MAX_ATTEMPTS = 2
+    REPORT_TIMEOUT_SECONDS = 3600
+    POLL_INITIAL_INTERVAL = 2.0
+    POLL_MAX_INTERVAL = 30.0
+    POLL_BACKOFF_FACTOR = 1.5
+    RESULTS_PAGE_SIZE = 500
+    
+    # Sub-requests per Graph batch call (the API maximum)
+    BATCH_MAX_SIZE = 50
+    
+    ACCOUNT_FIELDS = 'id,account_id,name,currency,timezone_name,account_status'
+    CAMPAIGN_FIELDS = 'id,name,status,objective'
+    
+    # Graph error code for invalid or expired access tokens
+    INVALID_TOKEN_ERROR_CODE = 190
+    
+    # Requests per second per ad account; the limiter also slows down as
+    # the usage headers approach the quota
+    RATE_LIMIT_PER_SECOND = 5
+    USAGE_HEADERS = ('X-Business-Use-Case-Usage', 'X-Ad-Account-Usage', 'X-FB-Ads-Insights-Throttle', 'X-App-Usage')
+    USAGE_FIELDS = ('call_count', 'total_cputime', 'total_time', 'acc_id_util_pct', 'app_id_util_pct')
+    THROTTLING_ERROR_CODES = {4, 17, 32, 613} | set(range(80000, 80015))
+    
+    DEFAULT_METRICS = ['impressions', 'clicks', 'spend']
+    DEFAULT_DIMENSIONS = ['date_start', 'campaign_name']
+    
+    # Insights fields for metrics whose name differs from the API field
+    METRIC_FIELDS = {
+        'link_clicks': 'inline_link_clicks',
+        'post_engagement': 'inline_post_engagement',
+        'video_views': 'video_play_actions',
+        'video_view_time': 'video_avg_time_watched_actions'
+    }
+    
+    # Insights fields returned as lists of {'action_type', 'value'} stats.
+    # They are summed over the action types set with the action_types config
+    # key (a list, or a dict of lists per metric), or over every returned
+    # action type when none are set.
+    ACTION_STAT_FIELDS = {
+        'actions', 'conversions', 'conversion_values', 'cost_per_action_type',
+        'video_play_actions', 'video_avg_time_watched_actions'
+    }
+    
+    # Dimensions that are requested as breakdowns rather than fields
+    DIMENSION_BREAKDOWNS = {
+        'age': ['age'],
+        'gender': ['gender'],
+        'country': ['country'],
+        'region': ['region'],
+        'publisher_platform': ['publisher_platform'],
+        'platform_position': ['publisher_platform', 'platform_position'],
+        'placement': ['publisher_platform', 'platform_position'],
+        'device_platform': ['device_platform']
+    }
+    
+    # Name fields and the report level they require, most granular first
+    LEVEL_FIELDS = [('ad_name', 'ad'), ('adset_name', 'adset'), ('campaign_name', 'campaign')]
+    
+    # Graph filtering fields for dimension filters
+    FILTER_FIELDS = {
+        'campaign_name': 'campaign.name',
+        'adset_name': 'adset.name',
+        'ad_name': 'ad.name'
+    }
+    
     def get_platform_name(self) -> str:
         return 'facebook_ads'
     
@@ -23,13 +102,13 @@ class FacebookAdsIntegration(BaseIntegration):
                 return False
             
             # Test API call to validate credentials
-            url = 'https://graph.facebook.com/v18.0/me'
+            url = f'{self._get_graph_url()}/me'
             params = {
                 'access_token': self.credentials['access_token'],
                 'fields': 'id,name'
             }
             
-            response = requests.get(url, params=params, timeout=30)
+            response = self.http_request('GET', url, params=params)
             return response.status_code == 200
             
         except Exception as e:
@@ -83,30 +162,445 @@ class FacebookAdsIntegration(BaseIntegration):
                     dimensions: List[str] = None,
                     filters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
         """Extract data from Facebook Marketing API"""
+        records = []
+        for batch in self.iter_extract(start_date, end_date, metrics, dimensions, filters):
+            records.extend(batch.to_records())
+        return records
+    
+    def iter_extract(self,
+                     start_date: datetime,
+                     end_date: datetime,
+                     metrics: List[str] = None,
+                     dimensions: List[str] = None,
+                     filters: Dict[str, Any] = None,
+                     batch_size: int = None) -> Iterator[RecordBatch]:
+        """
+        Extract Insights through async report runs in bounded batches
+        
+        The date range is split into windows, each submitted as its own
+        report run. Several runs are kept in flight and each one is
+        downloaded as soon as it completes. With fan_out set, all ad
+        accounts of the Business Manager are extracted instead.
+        """
+        if self.is_fan_out():
+            yield from self.iter_fan_out(start_date, end_date, metrics, dimensions, filters, batch_size)
+            return
+        
         try:
-            # For now, return mock data since we don't have real credentials
-            # In a production environment, this would make actual API calls
             logger.info(f"Extracting Facebook Ads data from {start_date} to {end_date}")
+            metrics = list(metrics or self.DEFAULT_METRICS)
+            dimensions = list(dimensions or self.DEFAULT_DIMENSIONS)
+            # Records are stored per day, so the window start date is always returned
+            if 'date_start' not in dimensions:
+                dimensions = ['date_start'] + dimensions
             
-            # Use mock integration for demonstration
-            from .base import MockIntegration
-            mock_integration = MockIntegration('facebook_ads', self.credentials, self.config)
-            return mock_integration.extract_data(start_date, end_date, metrics, dimensions, filters)
-            
+            names = dimensions + metrics
+            for rows in batched(self._iter_report_rows(start_date, end_date, metrics, dimensions, filters),
+                                self.get_batch_size(batch_size)):
+                yield RecordBatch.from_rows(self.platform_name, names, rows)
         except Exception as e:
             self.handle_api_error(e, "data extraction")
     
+    def build_report_params(self,
+                            start_date: datetime,
+                            end_date: datetime,
+                            metrics: List[str],
+                            dimensions: List[str],
+                            filters: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        Build the parameters of an async Insights report run
+        
+        Args:
+            start_date: First day of the report window
+            end_date: Last day of the report window
+            metrics: Metric names from get_available_metrics
+            dimensions: Dimension names from get_available_dimensions
+            filters: Dimension name (or Graph filtering field) to a value or list of values
+            
+        Returns:
+            Request parameters for POST /act_<id>/insights
+        """
+        level = next((level for name, level in self.LEVEL_FIELDS if name in dimensions), 'account')
+        breakdowns = []
+        for dimension in dimensions:
+            for breakdown in self.DIMENSION_BREAKDOWNS.get(dimension, []):
+                if breakdown not in breakdowns:
+                    breakdowns.append(breakdown)
+        fields = [
+            dimension for dimension in dimensions
+            if dimension not in self.DIMENSION_BREAKDOWNS and dimension not in ('date_start', 'date_stop')
+        ] + [self.METRIC_FIELDS.get(metric, metric) for metric in metrics]
+        
+        params = {
+            'async': 'true',
+            'level': level,
+            'fields': ','.join(fields),
+            'time_range': json.dumps({'since': f'{start_date:%Y-%m-%d}', 'until': f'{end_date:%Y-%m-%d}'}),
+            # One row per day so records map onto data_date
+            'time_increment': 1
+        }
+        if breakdowns:
+            params['breakdowns'] = ','.join(breakdowns)
+        if filters:
+            params['filtering'] = json.dumps([
+                {
+                    'field': self.FILTER_FIELDS.get(name, name),
+                    'operator': 'IN' if isinstance(value, (list, tuple, set)) else 'EQUAL',
+                    'value': list(value) if isinstance(value, (list, tuple, set)) else value
+                }
+                for name, value in filters.items()
+            ])
+        return params
+    
+    def _iter_report_rows(self,
+                          start_date: datetime,
+                          end_date: datetime,
+                          metrics: List[str],
+                          dimensions: List[str],
+                          filters: Dict[str, Any] = None) -> Iterator[Tuple[Any, ...]]:
+        """Run report windows concurrently and yield row tuples as runs complete"""
+        max_concurrent = int(self.config.get('max_concurrent_reports', self.MAX_CONCURRENT_REPORTS))
+        max_attempts = int(self.config.get('report_max_attempts', self.REPORT_MAX_ATTEMPTS))
+        timeout = float(self.config.get('report_timeout_seconds', self.REPORT_TIMEOUT_SECONDS))
+        initial_interval = float(self.config.get('poll_initial_interval', self.POLL_INITIAL_INTERVAL))
+        max_interval = float(self.config.get('poll_max_interval', self.POLL_MAX_INTERVAL))
+        
+        pending = deque((window, 1) for window in self._split_windows(start_date, end_date))
+        running = {}  # report_run_id -> (window, attempt, submitted_at)
+        interval = initial_interval
+        
+        def submit_pending():
+            while pending and len(running) < max_concurrent:
+                window, attempt = pending.popleft()
+                params = self.build_report_params(window[0], window[1], metrics, dimensions, filters)
+                report_run_id = self._graph_request('POST', f'{self._get_account_path()}/insights', params)['report_run_id']
+                logger.info(f"Submitted Facebook Ads report run {report_run_id} for {window[0]:%Y-%m-%d} to {window[1]:%Y-%m-%d}")
+                running[report_run_id] = (window, attempt, time.monotonic())
+        
+        while pending or running:
+            submit_pending()
+            
+            completed = []
+            for report_run_id, (window, attempt, submitted_at) in list(running.items()):
+                status = self._graph_request('GET', report_run_id, {'fields': 'async_status,async_percent_completion'})
+                async_status = status.get('async_status')
+                if async_status == 'Job Completed':
+                    completed.append(report_run_id)
+                elif async_status in ('Job Failed', 'Job Skipped'):
+                    del running[report_run_id]
+                    if attempt >= max_attempts:
+                        raise Exception(f"Report run {report_run_id} for {window[0]:%Y-%m-%d} to "
+                                        f"{window[1]:%Y-%m-%d} ended with status '{async_status}'")
+                    logger.warning(f"Report run {report_run_id} ended with status '{async_status}', resubmitting")
+                    pending.append((window, attempt + 1))
+                elif time.monotonic() - submitted_at > timeout:
+                    raise Exception(f"Report run {report_run_id} did not complete within {timeout:.0f} seconds")
+            
+            if not completed:
+                if running:
+                    time.sleep(interval)
+                    interval = min(interval * self.POLL_BACKOFF_FACTOR, max_interval)
+                continue
+            
+            interval = initial_interval
+            for report_run_id in completed:
+                del running[report_run_id]
+                # Submit the next window before downloading so it runs meanwhile
+                submit_pending()
+                for row in self._iter_report_results(report_run_id):
+                    yield self._convert_row(row, metrics, dimensions)
+    
+    def _iter_report_results(self, report_run_id: str) -> Iterator[Dict[str, Any]]:
+        """Download the rows of a completed report run following the paging cursors"""
+        params = {'limit': int(self.config.get('results_page_size', self.RESULTS_PAGE_SIZE))}
+        while True:
+            page = self._graph_request('GET', f'{report_run_id}/insights', params)
+            yield from page.get('data', [])
+            paging = page.get('paging', {})
+            after = paging.get('cursors', {}).get('after')
+            if not paging.get('next') or not after:
+                return
+            params['after'] = after
+    
+    def get_rate_limit_key(self) -> str:
+        """Rate limiter bucket key for the ad account"""
+        return f'{self.platform_name}:{self._get_account_path()}'
+    
+    def observe_rate_limit(self, response) -> Optional[float]:
+        """Adapt to the Graph usage headers and pause on throttling errors"""
+        usage, regain_minutes = self._parse_usage_headers(response.headers)
+        if usage is not None:
+            get_rate_limiter().adapt(self.get_rate_limit_key(), usage / 100)
+        
+        if response.status_code == 200:
+            return None
+        try:
+            error = response.json().get('error') or {}
+        except (ValueError, AttributeError):
+            error = {}
+        if error.get('code') not in self.THROTTLING_ERROR_CODES and response.status_code != 429:
+            return None
+        if regain_minutes:
+            return regain_minutes * 60
+        return super().observe_rate_limit(response) or self.RATE_LIMIT_PENALTY_SECONDS
+    
+    def _parse_usage_headers(self, headers) -> Tuple[Optional[float], float]:
+        """Highest quota usage percentage and minutes until access is regained"""
+        usage = None
+        regain_minutes = 0.0
+        for header in self.USAGE_HEADERS:
+            try:
+                value = json.loads(headers.get(header) or 'null')
+            except ValueError:
+                continue
+            # Business use case usage is keyed by business id with a list per use case
+            entries = []
+            for entry in (value.values() if header == 'X-Business-Use-Case-Usage' and isinstance(value, dict) else [value]):
+                entries.extend(entry if isinstance(entry, list) else [entry])
+            for entry in entries:
+                if not isinstance(entry, dict):
+                    continue
+                for field in self.USAGE_FIELDS:
+                    if isinstance(entry.get(field), (int, float)):
+                        usage = max(usage or 0.0, float(entry[field]))
+                regain_minutes = max(regain_minutes, float(entry.get('estimated_time_to_regain_access') or 0))
+        return usage, regain_minutes
+    
+    def _convert_row(self, row: Dict[str, Any], metrics: List[str], dimensions: List[str]) -> Tuple[Any, ...]:
+        """Turn an Insights row into dimension then metric values, parsing numeric strings"""
+        values = [row.get('platform_position' if dimension == 'placement' else dimension) for dimension in dimensions]
+        for metric in metrics:
+            field = self.METRIC_FIELDS.get(metric, metric)
+            if field in self.ACTION_STAT_FIELDS:
+                values.append(self._sum_action_stats(row.get(field), self._get_action_types(metric)))
+            else:
+                values.append(self._parse_number(row.get(field)))
+        return tuple(values)
+    
+    def _get_action_types(self, metric: str) -> Optional[set]:
+        """Action types summed for an action stat metric, or None for all of them"""
+        action_types = self.config.get('action_types')
+        if isinstance(action_types, dict):
+            action_types = action_types.get(metric)
+        return set(action_types) if action_types else None
+    
+    @classmethod
+    def _sum_action_stats(cls, stats: Optional[List[Dict[str, Any]]], action_types: Optional[set]) -> Any:
+        """Sum the values of an action stat list over the given action types"""
+        # Rows without any matching actions omit the field
+        total = 0
+        for stat in stats or []:
+            if action_types is not None and stat.get('action_type') not in action_types:
+                continue
+            value = cls._parse_number(stat.get('value'))
+            if isinstance(value, (int, float)):
+                total += value
+        return total
+    
+    @staticmethod
+    def _parse_number(value: Any) -> Any:
+        """Parse a numeric string, leaving other values unchanged"""
+        if isinstance(value, str):
+            try:
+                return int(value) if value.lstrip('-').isdigit() else float(value)
+            except ValueError:
+                pass
+        return value
+    
+    def _split_windows(self, start_date: datetime, end_date: datetime) -> List[Tuple[datetime, datetime]]:
+        """Split a date range into consecutive report windows"""
+        window_days = max(1, int(self.config.get('report_window_days', self.REPORT_WINDOW_DAYS)))
+        windows = []
+        window_start = start_date
+        while window_start <= end_date:
+            window_end = min(window_start + timedelta(days=window_days - 1), end_date)
+            windows.append((window_start, window_end))
+            window_start = window_end + timedelta(days=1)
+        return windows
+    
+    def batch_request(self, calls: List[Tuple[str, str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Send Graph API calls packed into batch requests
+        
+        Calls are sent BATCH_MAX_SIZE at a time and the responses are
+        demultiplexed back into call order. Sub-requests that fail are
+        retried individually; if the retry fails too, the result holds an
+        'error' entry instead of raising, so one inaccessible object does
+        not fail the whole batch.
+        
+        Args:
+            calls: (method, path, params) for each call
+            
+        Returns:
+            Decoded response body for each call, in the same order
+        """
+        results = []
+        for chunk in batched(calls, self.BATCH_MAX_SIZE):
+            batch = [
+                {
+                    'method': method,
+                    'relative_url': f'{path}?{urlencode(params)}' if params else path
+                }
+                for method, path, params in chunk
+            ]
+            # Each call of a batch counts against the quota
+            responses = self._graph_request('POST', '', {'batch': json.dumps(batch), 'include_headers': 'false'},
+                                            rate_limit_cost=len(chunk))
+            # Responses are matched to calls by position, so a short reply would misattribute them
+            if not isinstance(responses, list) or len(responses) != len(chunk):
+                count = len(responses) if isinstance(responses, list) else 'no'
+                raise Exception(f"Graph batch request returned {count} responses for {len(chunk)} calls")
+            
+            for (method, path, params), response in zip(chunk, responses):
+                body = None
+                if response and response.get('code') == 200:
+                    try:
+                        body = json.loads(response.get('body') or '{}')
+                    except ValueError:
+                        body = None
+                if body is not None and 'error' not in body:
+                    results.append(body)
+                    continue
+                
+                # Sub-requests time out as null and fail with their own error codes
+                try:
+                    results.append(self._graph_request(method, path, params))
+                except AuthenticationError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Graph batch sub-request to {path} failed: {str(e)}")
+                    results.append({'error': {'message': str(e)}})
+        return results
+    
+    def get_accounts_info(self, account_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Fetch metadata for several ad accounts through batch requests
+        
+        Args:
+            account_ids: Ad account ids, with or without the act_ prefix
+            
+        Returns:
+            Account metadata (or an 'error' entry) for each account, in order
+        """
+        return self.batch_request([
+            ('GET', self._format_account_path(account_id), {'fields': self.ACCOUNT_FIELDS})
+            for account_id in account_ids
+        ])
+    
+    def list_campaigns(self, account_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        List the campaigns of several ad accounts through batch requests
+        
+        The first page of every account is fetched in batches; accounts
+        with more campaigns are then paged individually.
+        
+        Args:
+            account_ids: Ad account ids, with or without the act_ prefix
+            
+        Returns:
+            Campaigns keyed by account id
+        """
+        params = {'fields': self.CAMPAIGN_FIELDS, 'limit': int(self.config.get('results_page_size', self.RESULTS_PAGE_SIZE))}
+        pages = self.batch_request([
+            ('GET', f'{self._format_account_path(account_id)}/campaigns', params)
+            for account_id in account_ids
+        ])
+        
+        campaigns = {}
+        for account_id, page in zip(account_ids, pages):
+            if 'error' in page:
+                logger.error(f"Failed to list campaigns for {account_id}: {page['error'].get('message')}")
+                campaigns[account_id] = []
+                continue
+            campaigns[account_id] = self._follow_pages(f'{self._format_account_path(account_id)}/campaigns', params, page)
+        return campaigns
+    
+    def list_child_accounts(self) -> List[Dict[str, Any]]:
+        """List the active ad accounts owned by or shared with the Business Manager"""
+        business_id = self.credentials.get('business_id') or self.config.get('business_id')
+        if not business_id:
+            raise ValueError('Fan-out requires a business_id in the credentials or config')
+        
+        params = {'fields': self.ACCOUNT_FIELDS, 'limit': int(self.config.get('results_page_size', self.RESULTS_PAGE_SIZE))}
+        edges = [f'{business_id}/owned_ad_accounts', f'{business_id}/client_ad_accounts']
+        pages = self.batch_request([('GET', edge, params) for edge in edges])
+        
+        accounts = {}
+        for edge, page in zip(edges, pages):
+            if 'error' in page:
+                raise Exception(f"Failed to list {edge}: {page['error'].get('message')}")
+            for account in self._follow_pages(edge, params, page):
+                # Only active accounts (status 1) can be reported on
+                if account.get('account_status', 1) != 1:
+                    continue
+                account_id = str(account.get('account_id') or account['id']).replace('act_', '')
+                accounts[account_id] = {
+                    'id': account_id,
+                    'name': account.get('name'),
+                    'currency': account.get('currency'),
+                    'timezone': account.get('timezone_name')
+                }
+        return list(accounts.values())
+    
+    def for_account(self, account_id: str) -> 'FacebookAdsIntegration':
+        """Create an integration for one ad account of the Business Manager"""
+        return self.__class__(dict(self.credentials, account_id=account_id), self._fan_out_config())
+    
+    def _follow_pages(self, path: str, params: Dict[str, Any], page: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Collect the data of a first page and every following page"""
+        items = list(page.get('data', []))
+        while page.get('paging', {}).get('next') and page['paging'].get('cursors', {}).get('after'):
+            page = self._graph_request('GET', path, dict(params, after=page['paging']['cursors']['after']))
+            items.extend(page.get('data', []))
+        return items
+    
+    def _graph_request(self, method: str, path: str, params: Dict[str, Any], rate_limit_cost: int = 1) -> Any:
+        """Call the Graph API and return the decoded response, raising on errors"""
+        params = dict(params, access_token=self.credentials['access_token'])
+        # POST parameters go in the body, which keeps large batch payloads out of the URL
+        request_args = {'data': params} if method == 'POST' else {'params': params}
+        response = self.http_request(method, f'{self._get_graph_url()}/{path}', rate_limit_cost=rate_limit_cost,
+                                     **request_args)
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {}
+        
+        error = payload.get('error') if isinstance(payload, dict) else None
+        if error or response.status_code != 200:
+            message = (error or {}).get('message', response.text)
+            if (error or {}).get('code') == self.INVALID_TOKEN_ERROR_CODE or response.status_code == 401:
+                raise AuthenticationError(message)
+            raise Exception(f"Graph API request to {path} failed with status {response.status_code}: {message}")
+        return payload
+    
+    def _get_graph_url(self) -> str:
+        """Versioned Graph API base URL"""
+        base_url = self.config.get('graph_base_url') or os.getenv('FACEBOOK_GRAPH_BASE_URL', self.GRAPH_BASE_URL)
+        return f"{base_url.rstrip('/')}/{self.config.get('api_version', self.API_VERSION)}"
+    
+    def _get_account_path(self) -> str:
+        """Ad account node of the credential, e.g. act_1234"""
+        return self._format_account_path(self.credentials.get('account_id', ''))
+    
+    @staticmethod
+    def _format_account_path(account_id: str) -> str:
+        """Ad account node for an account id, e.g. act_1234"""
+        account_id = str(account_id)
+        return account_id if account_id.startswith('act_') else f'act_{account_id}'
+    
     def get_account_info(self) -> Dict[str, Any]:
         """Get Facebook Ads account information"""
         try:
             base_info = super().get_account_info()
+            account = self.get_accounts_info([self._get_account_path()])[0]
             
             # Add Facebook Ads specific account info
             base_info.update({
                 'account_id': self.credentials.get('account_id', 'N/A'),
-                'account_name': 'Facebook Ads Account',  # Would be fetched from API
-                'currency': 'USD',  # Would be fetched from API
-                'timezone': 'America/New_York'  # Would be fetched from API
+                'account_name': account.get('name', 'Facebook Ads Account'),
+                'currency': account.get('currency', 'USD'),
+                'timezone': account.get('timezone_name', 'America/New_York')
             })
             
             return base_info
@@ -1,29 +1,58 @@
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Union
+from importlib import import_module
+from importlib.metadata import entry_points
 import logging
+import threading
 from .base import BaseIntegration, MockIntegration
-from .google_ads import GoogleAdsIntegration
-from .facebook_ads import FacebookAdsIntegration
 
 logger = logging.getLogger(__name__)
 
 class IntegrationFactory:
-    """Factory class for creating platform integrations"""
+    """
+    Factory class for creating platform integrations
     
-    # Registry of available integrations
-    INTEGRATIONS = {
-        'google_ads': GoogleAdsIntegration,
-        'facebook_ads': FacebookAdsIntegration,
-        'meta_ads': FacebookAdsIntegration,  # Alias for Facebook Ads
-        'ga4': MockIntegration,  # Google Analytics 4 (mock for now)
-        'google_analytics': MockIntegration,  # Google Analytics (mock for now)
-        'instagram_insights': MockIntegration,  # Instagram Insights (mock for now)
-        'facebook_insights': MockIntegration,  # Facebook Insights (mock for now)
-        'shopify': MockIntegration,  # Shopify (mock for now)
-        'amazon_ads': MockIntegration,  # Amazon Advertising (mock for now)
-        'metricool': MockIntegration,  # Metricool (mock for now)
-        'klaviyo': MockIntegration,  # Klaviyo (mock for now)
+    Integrations are registered as "module:attribute" references and only
+    imported the first time an integration for that platform is created, so
+    processes that never extract don't pay for loading every connector.
+    Third-party connectors can be installed as plugins exposing an entry
+    point in the PLUGIN_ENTRY_POINT_GROUP group, named after the platform.
+    """
+    
+    # Registry of available integrations, relative modules resolve against this package
+    INTEGRATIONS: Dict[str, Union[str, Any]] = {
+        'google_ads': '.google_ads:GoogleAdsIntegration',
+        'facebook_ads': '.facebook_ads:FacebookAdsIntegration',
+        'meta_ads': '.facebook_ads:FacebookAdsIntegration',  # Alias for Facebook Ads
+        'ga4': '.base:MockIntegration',  # Google Analytics 4 (mock for now)
+        'google_analytics': '.base:MockIntegration',  # Google Analytics (mock for now)
+        'instagram_insights': '.base:MockIntegration',  # Instagram Insights (mock for now)
+        'facebook_insights': '.base:MockIntegration',  # Facebook Insights (mock for now)
+        'shopify': '.base:MockIntegration',  # Shopify (mock for now)
+        'amazon_ads': '.base:MockIntegration',  # Amazon Advertising (mock for now)
+        'metricool': '.base:MockIntegration',  # Metricool (mock for now)
+        'klaviyo': '.base:MockIntegration',  # Klaviyo (mock for now)
     }
     
+    PLUGIN_ENTRY_POINT_GROUP = 'marketing_import.integrations'
+    
+    _resolved: Dict[str, type] = {}
+    _plugins_loaded = False
+    _lock = threading.Lock()
+    
+    @classmethod
+    def register_integration(cls, platform: str, target: Union[str, type]) -> None:
+        """
+        Register an integration for a platform
+        
+        Args:
+            platform: Platform name
+            target: Integration class, "module:attribute" reference or entry point
+        """
+        platform = platform.lower()
+        with cls._lock:
+            cls.INTEGRATIONS[platform] = target
+            cls._resolved.pop(platform, None)
+    
     @classmethod
     def create_integration(cls, 
                           platform: str, 
@@ -43,12 +72,11 @@ class IntegrationFactory:
         try:
             platform = platform.lower()
             
-            if platform not in cls.INTEGRATIONS:
+            integration_class = cls.get_integration_class(platform)
+            if integration_class is None:
                 logger.error(f"Unsupported platform: {platform}")
                 return None
             
-            integration_class = cls.INTEGRATIONS[platform]
-            
             # Handle mock integrations
             if integration_class == MockIntegration:
                 return MockIntegration(platform, credentials, config)
@@ -60,9 +88,75 @@ class IntegrationFactory:
             logger.error(f"Failed to create integration for {platform}: {str(e)}")
             return None
     
+    @classmethod
+    def get_integration_class(cls, platform: str) -> Optional[type]:
+        """
+        Resolve the integration class of a platform, importing it on first use
+        
+        Args:
+            platform: Platform name
+        
+        Returns:
+            Integration class or None if platform not supported
+        """
+        platform = platform.lower()
+        integration_class = cls._resolved.get(platform)
+        if integration_class is not None:
+            return integration_class
+        
+        cls._load_plugins()
+        with cls._lock:
+            target = cls.INTEGRATIONS.get(platform)
+            if target is None:
+                return None
+            integration_class = cls._resolve(target)
+            cls._resolved[platform] = integration_class
+            return integration_class
+    
+    @classmethod
+    def _resolve(cls, target: Union[str, Any]) -> type:
+        """Import the class behind a registry entry"""
+        if isinstance(target, str):
+            module_name, _, attribute = target.partition(':')
+            module = import_module(module_name, package=__package__)
+            return getattr(module, attribute)
+        if hasattr(target, 'load'):
+            # importlib.metadata.EntryPoint
+            return target.load()
+        return target
+    
+    @classmethod
+    def _load_plugins(cls) -> None:
+        """Register plugin entry points once, without importing them"""
+        if cls._plugins_loaded:
+            return
+        with cls._lock:
+            if cls._plugins_loaded:
+                return
+            try:
+                discovered = entry_points()
+                if hasattr(discovered, 'select'):
+                    plugins = discovered.select(group=cls.PLUGIN_ENTRY_POINT_GROUP)
+                else:
+                    # Python 3.9 returns a dict of groups
+                    plugins = discovered.get(cls.PLUGIN_ENTRY_POINT_GROUP, [])
+            except Exception as e:
+                logger.error(f"Failed to discover integration plugins: {str(e)}")
+                plugins = []
+            
+            for entry_point in plugins:
+                platform = entry_point.name.lower()
+                if platform in cls.INTEGRATIONS:
+                    logger.warning(f"Ignoring integration plugin {entry_point.value}: {platform} is already registered")
+                    continue
+                cls.INTEGRATIONS[platform] = entry_point
+                logger.info(f"Registered integration plugin {entry_point.value} for {platform}")
+            cls._plugins_loaded = True
+    
     @classmethod
     def get_supported_platforms(cls) -> List[str]:
         """Get list of supported platform names"""
+        cls._load_plugins()
         return list(cls.INTEGRATIONS.keys())
     
     @classmethod
@@ -1,14 +1,141 @@
 from datetime import datetime
-from typing import Dict, List, Any
-import requests
+from typing import Dict, List, Any, Optional, Tuple, Iterator
+import codecs
+import json
 import logging
-from .base import BaseIntegration
+import os
+import re
+from .base import BaseIntegration, FanOutMixin, AuthenticationError, batched
+from .record_batch import RecordBatch
+from .token_cache import get_token_cache
 
 logger = logging.getLogger(__name__)
 
-class GoogleAdsIntegration(BaseIntegration):
+
+class JsonArrayStreamParser:
+    """
+    Incrementally split a streamed top-level JSON array into its elements
+    
+    Text is fed as it arrives and each element is decoded as soon as its
+    closing bracket has been received, so a large response never has to be
+    buffered in full.
+    """
+    
+    # Complete strings are skipped whole; a lone quote is a string that is still arriving
+    _TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|[{}\[\]]|"')
+    
+    def __init__(self):
+        self._buffer = ''
+        self._pos = 0
+        self._depth = 0
+        self._start = None
+    
+    def feed(self, text: str) -> Iterator[Any]:
+        """
+        Add received text and yield every element it completes
+        
+        Args:
+            text: Next piece of the response body
+            
+        Returns:
+            Iterator over decoded array elements
+        """
+        self._buffer += text
+        pos = self._pos
+        completed = []
+        while True:
+            match = self._TOKEN.search(self._buffer, pos)
+            if not match:
+                pos = len(self._buffer)
+                break
+            token = match.group()
+            if token == '"':
+                pos = match.start()
+                break
+            pos = match.end()
+            if token in '{[':
+                if self._depth == 1:
+                    self._start = match.start()
+                self._depth += 1
+            elif token in '}]':
+                self._depth -= 1
+                if self._depth == 1:
+                    completed.append(self._buffer[self._start:pos])
+                    self._start = None
+        
+        # Keep only the text that is still needed
+        keep_from = self._start if self._start is not None else pos
+        self._buffer = self._buffer[keep_from:]
+        self._pos = pos - keep_from
+        if self._start is not None:
+            self._start = 0
+        
+        for element in completed:
+            yield json.loads(element)
+
+
+class GoogleAdsIntegration(FanOutMixin, BaseIntegration):
     """Google Ads API integration"""
     
+    # Endpoints, overridable with the api_base_url/token_url config keys or
+    # environment variables (e.g. to point at a local stub server)
+    API_BASE_URL = 'https://googleads.googleapis.com'
+    API_VERSION = 'v14'
+    TOKEN_URL = 'https://oauth2.googleapis.com/token'
+    
+    # Bytes read from the searchStream response at a time
+    STREAM_CHUNK_SIZE = 64 * 1024
+    
+    # Requests per second per customer account
+    RATE_LIMIT_PER_SECOND = 10
+    # API quota is tied to the developer token, so child accounts of a
+    # manager account share its bucket
+    FAN_OUT_SHARED_RATE_LIMIT = True
+    
+    DEFAULT_METRICS = ['impressions', 'clicks', 'cost_micros']
+    DEFAULT_DIMENSIONS = ['date', 'campaign_name']
+    
+    # GAQL fields for the metrics and dimensions offered by this integration
+    METRIC_FIELDS = {
+        'impressions': 'metrics.impressions',
+        'clicks': 'metrics.clicks',
+        'cost_micros': 'metrics.cost_micros',
+        'conversions': 'metrics.conversions',
+        'conversions_value': 'metrics.conversions_value',
+        'ctr': 'metrics.ctr',
+        'average_cpc': 'metrics.average_cpc',
+        'average_cpm': 'metrics.average_cpm',
+        'search_impression_share': 'metrics.search_impression_share',
+        'search_rank_lost_impression_share': 'metrics.search_rank_lost_impression_share',
+        'quality_score': 'ad_group_criterion.quality_info.quality_score',
+        'bounce_rate': 'metrics.bounce_rate',
+        'view_through_conversions': 'metrics.view_through_conversions'
+    }
+    DIMENSION_FIELDS = {
+        'date': 'segments.date',
+        'campaign_name': 'campaign.name',
+        'ad_group_name': 'ad_group.name',
+        'keyword_text': 'ad_group_criterion.keyword.text',
+        'device': 'segments.device',
+        'geo_target_city': 'segments.geo_target_city',
+        'geo_target_region': 'segments.geo_target_region',
+        'age_range': 'ad_group_criterion.age_range.type',
+        'gender': 'ad_group_criterion.gender.type',
+        'ad_network_type': 'segments.ad_network_type',
+        'click_type': 'segments.click_type'
+    }
+    
+    # Fields that can only be selected from a specific resource
+    FIELD_RESOURCES = {
+        'ad_group.name': 'ad_group',
+        'ad_group_criterion.keyword.text': 'keyword_view',
+        'ad_group_criterion.quality_info.quality_score': 'keyword_view',
+        'ad_group_criterion.age_range.type': 'age_range_view',
+        'ad_group_criterion.gender.type': 'gender_view',
+        'segments.geo_target_city': 'geographic_view',
+        'segments.geo_target_region': 'geographic_view'
+    }
+    
     def get_platform_name(self) -> str:
         return 'google_ads'
     
@@ -28,17 +155,16 @@ class GoogleAdsIntegration(BaseIntegration):
                 return False
             
             # Test API call to validate credentials
-            headers = {
-                'Authorization': f'Bearer {access_token}',
-                'developer-token': self.credentials['developer_token'],
-                'Content-Type': 'application/json'
-            }
+            headers = self._get_headers(access_token)
             
             # Simple test call to get customer info
             customer_id = self.credentials.get('customer_id', 'customers')
-            url = f'https://googleads.googleapis.com/v14/{customer_id}'
+            url = f'{self._get_api_url()}/{customer_id}'
             
-            response = requests.get(url, headers=headers, timeout=30)
+            response = self.http_request('GET', url, headers=headers)
+            if response.status_code == 401:
+                # The cached token was revoked or expired early
+                get_token_cache().invalidate(self._get_token_cache_key())
             return response.status_code == 200
             
         except Exception as e:
@@ -46,9 +172,21 @@ class GoogleAdsIntegration(BaseIntegration):
             return False
     
     def _get_access_token(self) -> str:
-        """Get access token using refresh token"""
+        """Get access token using refresh token, reusing a cached token while it is valid"""
+        return get_token_cache().get_token(self._get_token_cache_key(), self._fetch_access_token)
+    
+    def _get_token_cache_key(self) -> str:
+        """Cache key identifying this credential's OAuth client and refresh token"""
+        return get_token_cache().make_key(
+            self.get_platform_name(),
+            self.credentials.get('client_id'),
+            self.credentials.get('refresh_token')
+        )
+    
+    def _fetch_access_token(self) -> Tuple[Optional[str], int]:
+        """Exchange the refresh token for a new access token and its lifetime"""
         try:
-            token_url = 'https://oauth2.googleapis.com/token'
+            token_url = self.config.get('token_url') or os.getenv('GOOGLE_OAUTH_TOKEN_URL', self.TOKEN_URL)
             data = {
                 'client_id': self.credentials['client_id'],
                 'client_secret': self.credentials['client_secret'],
@@ -56,16 +194,17 @@ class GoogleAdsIntegration(BaseIntegration):
                 'grant_type': 'refresh_token'
             }
             
-            response = requests.post(token_url, data=data, timeout=30)
+            response = self.http_request('POST', token_url, rate_limited=False, read_only=True, data=data)
             if response.status_code == 200:
-                return response.json().get('access_token')
+                token_data = response.json()
+                return token_data.get('access_token'), token_data.get('expires_in', 3600)
             else:
                 logger.error(f"Failed to get access token: {response.text}")
-                return None
+                return None, 0
                 
         except Exception as e:
             logger.error(f"Error getting access token: {str(e)}")
-            return None
+            return None, 0
     
     def get_available_metrics(self) -> List[str]:
         """Return available Google Ads metrics"""
@@ -108,19 +247,253 @@ class GoogleAdsIntegration(BaseIntegration):
                     dimensions: List[str] = None,
                     filters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
         """Extract data from Google Ads API"""
+        records = []
+        for batch in self.iter_extract(start_date, end_date, metrics, dimensions, filters):
+            records.extend(batch.to_records())
+        return records
+    
+    def iter_extract(self,
+                     start_date: datetime,
+                     end_date: datetime,
+                     metrics: List[str] = None,
+                     dimensions: List[str] = None,
+                     filters: Dict[str, Any] = None,
+                     batch_size: int = None) -> Iterator[RecordBatch]:
+        """
+        Stream report rows from the searchStream endpoint in bounded batches
+        
+        The whole report is fetched with a single request and rows are
+        yielded as the response arrives, instead of paging through search.
+        With fan_out set, all client accounts of the manager account are
+        extracted instead.
+        """
+        if self.is_fan_out():
+            yield from self.iter_fan_out(start_date, end_date, metrics, dimensions, filters, batch_size)
+            return
+        
         try:
-            # For now, return mock data since we don't have real credentials
-            # In a production environment, this would make actual API calls
             logger.info(f"Extracting Google Ads data from {start_date} to {end_date}")
-            
-            # Use mock integration for demonstration
-            from .base import MockIntegration
-            mock_integration = MockIntegration('google_ads', self.credentials, self.config)
-            return mock_integration.extract_data(start_date, end_date, metrics, dimensions, filters)
-            
+            yield from self._stream_batches(start_date, end_date, metrics, dimensions, filters, batch_size)
         except Exception as e:
             self.handle_api_error(e, "data extraction")
     
+    def build_query(self,
+                    start_date: datetime,
+                    end_date: datetime,
+                    metrics: List[str],
+                    dimensions: List[str],
+                    filters: Dict[str, Any] = None) -> str:
+        """
+        Build the GAQL query for a report
+        
+        Args:
+            start_date: First day of the report
+            end_date: Last day of the report
+            metrics: Metric names from get_available_metrics
+            dimensions: Dimension names from get_available_dimensions
+            filters: Dimension name (or GAQL field) to a value or list of values
+            
+        Returns:
+            GAQL query string
+        """
+        fields = [self.DIMENSION_FIELDS[name] for name in dimensions] + [self.METRIC_FIELDS[name] for name in metrics]
+        
+        conditions = [f"segments.date BETWEEN '{start_date:%Y-%m-%d}' AND '{end_date:%Y-%m-%d}'"]
+        for name, value in (filters or {}).items():
+            field = self.DIMENSION_FIELDS.get(name, name if '.' in name else None)
+            if not field:
+                logger.warning(f"Ignoring unsupported Google Ads filter: {name}")
+                continue
+            if isinstance(value, (list, tuple, set)):
+                conditions.append(f"{field} IN ({', '.join(self._format_gaql_value(v) for v in value)})")
+            else:
+                conditions.append(f"{field} = {self._format_gaql_value(value)}")
+        
+        return (f"SELECT {', '.join(fields)} FROM {self._get_query_resource(fields)} "
+                f"WHERE {' AND '.join(conditions)}")
+    
+    def _stream_batches(self,
+                        start_date: datetime,
+                        end_date: datetime,
+                        metrics: List[str] = None,
+                        dimensions: List[str] = None,
+                        filters: Dict[str, Any] = None,
+                        batch_size: int = None) -> Iterator[RecordBatch]:
+        """Run a searchStream request and yield record batches as rows arrive"""
+        metrics = self._supported_names(metrics or self.DEFAULT_METRICS, self.METRIC_FIELDS, 'metric')
+        dimensions = self._supported_names(dimensions or self.DEFAULT_DIMENSIONS, self.DIMENSION_FIELDS, 'dimension')
+        # Records are stored per day, so the date segment is always selected
+        if 'date' not in dimensions:
+            dimensions = ['date'] + dimensions
+        
+        query = self.build_query(start_date, end_date, metrics, dimensions, filters)
+        columns = [
+            (name, self._response_path(self.DIMENSION_FIELDS[name]), False) for name in dimensions
+        ] + [
+            (name, self._response_path(self.METRIC_FIELDS[name]), True) for name in metrics
+        ]
+        
+        names = dimensions + metrics
+        for rows in batched(self._search_stream(query), self.get_batch_size(batch_size)):
+            yield RecordBatch.from_rows(self.platform_name, names, [self._flatten_row(row, columns) for row in rows])
+    
+    def _search_stream(self, query: str) -> Iterator[Dict[str, Any]]:
+        """Run a GAQL query through searchStream and yield result rows as they arrive"""
+        access_token = self._get_access_token()
+        if not access_token:
+            raise AuthenticationError('Could not obtain a Google Ads access token')
+        
+        url = f'{self._get_api_url()}/customers/{self._get_customer_id()}/googleAds:searchStream'
+        with self.http_request('POST', url, read_only=True, headers=self._get_headers(access_token),
+                               json={'query': query}, stream=True) as response:
+            if response.status_code == 401:
+                get_token_cache().invalidate(self._get_token_cache_key())
+                raise AuthenticationError(response.text)
+            if response.status_code != 200:
+                raise Exception(f"searchStream failed with status {response.status_code}: {response.text}")
+            
+            parser = JsonArrayStreamParser()
+            decoder = codecs.getincrementaldecoder('utf-8')()
+            for chunk in response.iter_content(chunk_size=self.STREAM_CHUNK_SIZE):
+                for message in parser.feed(decoder.decode(chunk)):
+                    if 'error' in message:
+                        raise Exception(f"searchStream error: {message['error'].get('message', message['error'])}")
+                    yield from message.get('results', [])
+    
+    def list_child_accounts(self) -> List[Dict[str, Any]]:
+        """List the enabled client accounts below the manager account at any depth"""
+        query = (
+            "SELECT customer_client.id, customer_client.descriptive_name, "
+            "customer_client.currency_code, customer_client.time_zone "
+            "FROM customer_client "
+            "WHERE customer_client.manager = FALSE AND customer_client.status = 'ENABLED'"
+        )
+        accounts = []
+        for row in self._search_stream(query):
+            client = row.get('customerClient', {})
+            accounts.append({
+                'id': str(client.get('id')),
+                'name': client.get('descriptiveName'),
+                'currency': client.get('currencyCode'),
+                'timezone': client.get('timeZone')
+            })
+        return accounts
+    
+    def for_account(self, account_id: str) -> 'GoogleAdsIntegration':
+        """Create an integration for a client account, accessed through the manager account"""
+        credentials = dict(
+            self.credentials,
+            customer_id=account_id,
+            login_customer_id=self.credentials.get('login_customer_id') or self._get_customer_id()
+        )
+        return self.__class__(credentials, self._fan_out_config())
+    
+    def get_rate_limit_key(self) -> str:
+        """Rate limiter bucket key for the customer account"""
+        return f'{self.platform_name}:{self._get_customer_id() or "default"}'
+    
+    def observe_rate_limit(self, response) -> Optional[float]:
+        """Pause for the retryDelay of RESOURCE_EXHAUSTED quota errors"""
+        if response.status_code != 429:
+            return None
+        try:
+            retry_delay = self._find_retry_delay(response.json())
+        except ValueError:
+            retry_delay = None
+        if retry_delay is None:
+            return super().observe_rate_limit(response)
+        return retry_delay
+    
+    @classmethod
+    def _find_retry_delay(cls, payload: Any) -> Optional[float]:
+        """Find a quota retryDelay such as '30s' anywhere in an error payload"""
+        if isinstance(payload, dict):
+            if isinstance(payload.get('retryDelay'), str):
+                try:
+                    return float(payload['retryDelay'].rstrip('s'))
+                except ValueError:
+                    return None
+            payload = list(payload.values())
+        if isinstance(payload, list):
+            for item in payload:
+                retry_delay = cls._find_retry_delay(item)
+                if retry_delay is not None:
+                    return retry_delay
+        return None
+    
+    @staticmethod
+    def _flatten_row(row: Dict[str, Any], columns: List[Tuple[str, Tuple[str, ...], bool]]) -> Tuple[Any, ...]:
+        """Turn a nested searchStream result into a tuple of column values"""
+        values = []
+        for name, path, is_metric in columns:
+            value = row
+            for key in path:
+                value = value.get(key) if isinstance(value, dict) else None
+            if is_metric:
+                # int64 values arrive as strings and zero values are omitted
+                if value is None:
+                    value = 0
+                elif isinstance(value, str):
+                    value = int(value) if value.lstrip('-').isdigit() else float(value)
+            values.append(value)
+        return tuple(values)
+    
+    @staticmethod
+    def _response_path(field: str) -> Tuple[str, ...]:
+        """Map a GAQL field to its camelCase path in the JSON response"""
+        return tuple(
+            re.sub(r'_([a-z0-9])', lambda match: match.group(1).upper(), part)
+            for part in field.split('.')
+        )
+    
+    def _get_query_resource(self, fields: List[str]) -> str:
+        """Pick the resource to select from for the requested fields"""
+        resources = {self.FIELD_RESOURCES[field] for field in fields if field in self.FIELD_RESOURCES}
+        views = sorted(resources - {'ad_group'})
+        if len(views) > 1:
+            raise ValueError(f"Cannot combine fields from {', '.join(views)} in one Google Ads report")
+        if views:
+            return views[0]
+        return 'ad_group' if resources else 'campaign'
+    
+    @staticmethod
+    def _supported_names(names: List[str], fields: Dict[str, str], kind: str) -> List[str]:
+        """Drop names the integration cannot query, keeping their order"""
+        unsupported = [name for name in names if name not in fields]
+        if unsupported:
+            logger.warning(f"Ignoring unsupported Google Ads {kind}s: {unsupported}")
+        return [name for name in names if name in fields]
+    
+    @staticmethod
+    def _format_gaql_value(value: Any) -> str:
+        """Format a filter value as a GAQL literal"""
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return str(value)
+        escaped = str(value).replace('\\', '\\\\').replace("'", "\\'")
+        return f"'{escaped}'"
+    
+    def _get_api_url(self) -> str:
+        """Versioned Google Ads REST base URL"""
+        base_url = self.config.get('api_base_url') or os.getenv('GOOGLE_ADS_API_BASE_URL', self.API_BASE_URL)
+        return f"{base_url.rstrip('/')}/{self.config.get('api_version', self.API_VERSION)}"
+    
+    def _get_customer_id(self) -> str:
+        """Customer id without dashes or resource prefix"""
+        customer_id = str(self.credentials.get('customer_id', ''))
+        return customer_id.replace('customers/', '').replace('-', '')
+    
+    def _get_headers(self, access_token: str) -> Dict[str, str]:
+        """Request headers for the Google Ads REST API"""
+        headers = {
+            'Authorization': f'Bearer {access_token}',
+            'developer-token': self.credentials['developer_token'],
+            'Content-Type': 'application/json'
+        }
+        if self.credentials.get('login_customer_id'):
+            # Required when accessing a client account through a manager account
+            headers['login-customer-id'] = str(self.credentials['login_customer_id']).replace('-', '')
+        return headers
+    
     def get_account_info(self) -> Dict[str, Any]:
         """Get Google Ads account information"""
         try:
@@ -15,6 +15,11 @@ from project import Project
 from credential import Credential
 from data_source import DataSource
 from extracted_data import ExtractedData
+from extraction_coverage import ExtractionCoverage
+from partitioning import ExtractedDataPartitions
+from metric_fact import MetricFact
+from dimension_value import DimensionValue
+from metric_rollup import DailyMetricRollup, WeeklyMetricRollup, MonthlyMetricRollup
 from webhook import WebhookConfig
 
 def create_app():
@@ -116,6 +121,7 @@ def create_app():
     with app.app_context():
         try:
             db.create_all()
+            ExtractedDataPartitions.ensure_ahead()
             
             # Create default admin user if it doesn't exist
             admin_user = User.query.filter_by(email='admin@marketingplatform.com').first()
@@ -0,0 +1,187 @@
+from user import db
+from sqlalchemy import func
+from data_source import DataSource
+from dimension_value import DimensionValue
+import threading
+
+class MetricFact(db.Model):
+    """
+    Typed copy of the metrics and dimensions of an ExtractedData row
+    
+    One fact per extracted row, sharing its id, so aggregations can filter
+    and sum numeric columns in SQL instead of decoding processed_data JSON.
+    Dimensions are stored as integer keys into the project's
+    DimensionValue dictionary. There is deliberately no foreign key to
+    extracted_data so that table can be partitioned; facts are removed with
+    their data source.
+    """
+    __tablename__ = 'metric_facts'
+    
+    # Canonical metrics stored as typed columns (see normalization.py)
+    METRICS = ('impressions', 'clicks', 'cost', 'conversions', 'revenue')
+    # Canonical dimensions stored as DimensionValue keys in <dimension>_key columns
+    DIMENSIONS = ('account_id', 'campaign_name', 'ad_group_name', 'keyword', 'device', 'age_group', 'gender', 'location')
+    
+    # Rows sent per executemany call in bulk_insert
+    BULK_INSERT_CHUNK_SIZE = 1000
+    
+    id = db.Column(db.String(36), primary_key=True)  # ExtractedData.id
+    data_source_id = db.Column(db.String(36), db.ForeignKey('data_sources.id', ondelete='CASCADE'), nullable=False)
+    data_type = db.Column(db.String(100), nullable=False)
+    data_date = db.Column(db.Date, nullable=False)
+    
+    # Dimensions, as DimensionValue ids
+    account_id_key = db.Column(db.Integer)
+    campaign_name_key = db.Column(db.Integer)
+    ad_group_name_key = db.Column(db.Integer)
+    keyword_key = db.Column(db.Integer)
+    device_key = db.Column(db.Integer)
+    age_group_key = db.Column(db.Integer)
+    gender_key = db.Column(db.Integer)
+    location_key = db.Column(db.Integer)
+    
+    # Metrics
+    impressions = db.Column(db.BigInteger, nullable=False, default=0)
+    clicks = db.Column(db.BigInteger, nullable=False, default=0)
+    cost = db.Column(db.Float, nullable=False, default=0)
+    conversions = db.Column(db.Float, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.Index('idx_metric_facts_source_date', 'data_source_id', 'data_date'),
+        db.Index('idx_metric_facts_type_date', 'data_type', 'data_date'),
+        db.Index('idx_metric_facts_source_campaign_date', 'data_source_id', 'campaign_name_key', 'data_date'),
+    )
+    
+    # Project of each data source, which never changes
+    _project_ids = {}
+    _project_ids_lock = threading.Lock()
+    
+    @classmethod
+    def build_row(cls, extracted_row, processed_data):
+        """
+        Build a column dictionary for bulk_insert from an ExtractedData row
+        
+        Dimension values are kept as strings under their dimension name
+        until bulk_insert maps them to keys.
+        
+        Args:
+            extracted_row: Row dictionary returned by ExtractedData.build_row
+            processed_data: Normalized record data the row was built from
+        """
+        row = {
+            'id': extracted_row['id'],
+            'data_source_id': extracted_row['data_source_id'],
+            'data_type': extracted_row['data_type'],
+            'data_date': extracted_row['data_date'],
+        }
+        for dimension in cls.DIMENSIONS:
+            value = processed_data.get(dimension)
+            row[dimension] = None if value is None else str(value)
+        for metric in cls.METRICS:
+            row[metric] = cls._to_number(processed_data.get(metric))
+        return row
+    
+    @classmethod
+    def bulk_insert(cls, rows):
+        """
+        Insert rows built by build_row in batched INSERT statements
+        
+        Dimension values are replaced by their DimensionValue ids, looked up
+        once per distinct value of the batch. The caller is responsible for
+        committing.
+        """
+        cls._encode_dimensions(rows)
+        for offset in range(0, len(rows), cls.BULK_INSERT_CHUNK_SIZE):
+            db.session.execute(cls.__table__.insert(), rows[offset:offset + cls.BULK_INSERT_CHUNK_SIZE])
+        return len(rows)
+    
+    @classmethod
+    def _encode_dimensions(cls, rows):
+        """Replace dimension values in rows by <dimension>_key ids, in place"""
+        by_project = {}
+        for row in rows:
+            by_project.setdefault(cls.get_project_id(row['data_source_id']), []).append(row)
+        
+        for project_id, project_rows in by_project.items():
+            for dimension in cls.DIMENSIONS:
+                values = {row[dimension] for row in project_rows if row.get(dimension) is not None}
+                ids = DimensionValue.get_ids(project_id, dimension, values) if values else {}
+                key = f'{dimension}_key'
+                for row in project_rows:
+                    value = row.pop(dimension, None)
+                    row[key] = None if value is None else ids.get(DimensionValue.clean_value(value))
+    
+    @classmethod
+    def get_project_id(cls, data_source_id):
+        """Project of a data source, cached per process"""
+        with cls._project_ids_lock:
+            project_id = cls._project_ids.get(data_source_id)
+        if project_id is None:
+            project_id = db.session.query(DataSource.project_id).filter(DataSource.id == data_source_id).scalar()
+            if project_id is not None:
+                with cls._project_ids_lock:
+                    cls._project_ids[data_source_id] = project_id
+        return project_id
+    
+    @classmethod
+    def dimension_filter_clauses(cls, data_source_ids, filters):
+        """
+        Turn {dimension: value or list of values} filters into key column conditions
+        
+        Values are resolved to ids once, so the query filters on indexed
+        integers. Dimensions outside DIMENSIONS are not stored on facts and
+        raise ValueError rather than being dropped from the filter.
+        """
+        unknown = sorted(set(filters or {}) - set(cls.DIMENSIONS))
+        if unknown:
+            raise ValueError(f"Cannot filter metric facts on dimensions: {', '.join(unknown)}")
+        clauses = []
+        project_ids = list({cls.get_project_id(data_source_id) for data_source_id in data_source_ids})
+        for dimension, values in (filters or {}).items():
+            if not isinstance(values, (list, tuple, set)):
+                values = [values]
+            ids = DimensionValue.find_ids(project_ids, dimension, values)
+            clauses.append(getattr(cls, f'{dimension}_key').in_(ids))
+        return clauses
+    
+    @classmethod
+    def aggregate_by_date(cls, data_source_ids, data_type, start_date, end_date, metrics, filters=None):
+        """
+        Sum metric columns of one data type per day in SQL
+        
+        Args:
+            data_source_ids: Data sources to include
+            data_type: Data type to sum, since rows of different data types overlap
+            start_date: First day, inclusive
+            end_date: Last day, inclusive
+            metrics: Names from METRICS to sum
+            filters: Optional {dimension: value or list of values} to restrict rows
+        
+        Returns:
+            List of (date, totals) tuples ordered by date, totals following metrics
+        """
+        columns = [func.coalesce(func.sum(getattr(cls, metric)), 0) for metric in metrics]
+        rows = db.session.query(cls.data_date, *columns).filter(
+            cls.data_source_id.in_(data_source_ids),
+            cls.data_type == data_type,
+            cls.data_date >= start_date,
+            cls.data_date <= end_date,
+            *cls.dimension_filter_clauses(data_source_ids, filters)
+        ).group_by(cls.data_date).order_by(cls.data_date).all()
+        return [(row[0], tuple(row[1:])) for row in rows]
+    
+    @staticmethod
+    def _to_number(value):
+        """Coerce a metric value to a number, treating missing or non-numeric values as 0"""
+        if isinstance(value, bool):
+            return int(value)
+        if isinstance(value, (int, float)):
+            return value
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return 0
+    
+    def __repr__(self):
+        return f'<MetricFact {self.data_type} ({self.data_date})>'
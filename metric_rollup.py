@@ -0,0 +1,280 @@
+from user import db, dialect_insert
+from datetime import timedelta
+from sqlalchemy import func
+from sqlalchemy.orm import declared_attr
+import calendar
+import numpy as np
+from metric_fact import MetricFact
+
+class MetricRollup(db.Model):
+    """
+    Metric totals per period, data source, data type and dimension set
+    
+    Rollups are updated incrementally from the MetricFact rows of each
+    ingested batch, in the same transaction, so reads over long ranges sum
+    a few rows per period instead of every fact. The dimension set is the
+    comma-separated list of dimensions the facts carried, which keeps
+    extractions with different breakdowns apart.
+    """
+    __abstract__ = True
+    
+    # Period the rollup is keyed by: day, week or month
+    GRAIN = None
+    
+    METRICS = MetricFact.METRICS
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    data_type = db.Column(db.String(100), nullable=False)
+    dimension_set = db.Column(db.String(255), nullable=False)
+    period_start = db.Column(db.Date, nullable=False)
+    row_count = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    impressions = db.Column(db.BigInteger, nullable=False, default=0)
+    clicks = db.Column(db.BigInteger, nullable=False, default=0)
+    cost = db.Column(db.Float, nullable=False, default=0)
+    conversions = db.Column(db.Float, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    
+    @declared_attr
+    def data_source_id(cls):
+        return db.Column(db.String(36), db.ForeignKey('data_sources.id', ondelete='CASCADE'), nullable=False)
+    
+    @declared_attr
+    def __table_args__(cls):
+        return (
+            db.UniqueConstraint('data_source_id', 'data_type', 'dimension_set', 'period_start',
+                                name=f'unique_{cls.__tablename__}'),
+            db.Index(f'idx_{cls.__tablename__}_source_period', 'data_source_id', 'period_start'),
+        )
+    
+    @classmethod
+    def period_start_of(cls, day):
+        """First day of the period containing day; weeks start on Monday"""
+        if cls.GRAIN == 'week':
+            return day - timedelta(days=day.weekday())
+        if cls.GRAIN == 'month':
+            return day.replace(day=1)
+        return day
+    
+    @classmethod
+    def period_end_of(cls, day):
+        """Last day of the period containing day"""
+        if cls.GRAIN == 'week':
+            return cls.period_start_of(day) + timedelta(days=6)
+        if cls.GRAIN == 'month':
+            return day.replace(day=calendar.monthrange(day.year, day.month)[1])
+        return day
+    
+    @classmethod
+    def add_facts(cls, facts, sign=1):
+        """
+        Add fact rows to the rollups of this grain with an upsert
+        
+        Args:
+            facts: Encoded MetricFact rows (as inserted by MetricFact.bulk_insert)
+            sign: 1 to add the facts, -1 to subtract facts that are being deleted
+        """
+        totals = {}
+        for fact in facts:
+            key = (
+                fact['data_source_id'],
+                fact['data_type'],
+                dimension_set_of(fact),
+                cls.period_start_of(fact['data_date'])
+            )
+            row = totals.get(key)
+            if row is None:
+                row = totals[key] = dict(zip(
+                    ('data_source_id', 'data_type', 'dimension_set', 'period_start'), key
+                ), row_count=0, **{metric: 0 for metric in cls.METRICS})
+            row['row_count'] += sign
+            for metric in cls.METRICS:
+                row[metric] += sign * fact[metric]
+        if not totals:
+            return
+        
+        # Sorted so concurrent batches lock rollup rows in the same order
+        rows = [totals[key] for key in sorted(totals, key=lambda item: tuple(str(part) for part in item))]
+        statement = dialect_insert(cls.__table__)
+        if statement is None:
+            cls._add_totals_without_upsert(rows)
+            return
+        statement = statement.on_conflict_do_update(
+            index_elements=['data_source_id', 'data_type', 'dimension_set', 'period_start'],
+            set_={
+                column: cls.__table__.c[column] + statement.excluded[column]
+                for column in ('row_count',) + cls.METRICS
+            }
+        )
+        db.session.execute(statement, rows)
+    
+    @classmethod
+    def _add_totals_without_upsert(cls, rows):
+        for row in rows:
+            existing = cls.query.filter_by(
+                data_source_id=row['data_source_id'],
+                data_type=row['data_type'],
+                dimension_set=row['dimension_set'],
+                period_start=row['period_start']
+            ).with_for_update().first()
+            if existing is None:
+                db.session.add(cls(**row))
+                continue
+            for column in ('row_count',) + cls.METRICS:
+                setattr(existing, column, getattr(existing, column) + row[column])
+        db.session.flush()
+    
+    @classmethod
+    def sum_by_period(cls, data_source_ids, data_type, start_date, end_date, metrics):
+        """
+        Sum metrics of one data type per period over rollups starting within a date range
+        
+        Data types overlap (campaign rows repeat the totals of ad group
+        rows), so only one is summed. The dimension sets of a data type hold
+        disjoint rows, since a row missing a dimension value lands in a
+        smaller set, and are summed together.
+        
+        Returns:
+            List of (period_start, totals) tuples ordered by period, totals following metrics
+        """
+        columns = [func.coalesce(func.sum(getattr(cls, metric)), 0) for metric in metrics]
+        rows = db.session.query(cls.period_start, *columns).filter(
+            cls.data_source_id.in_(data_source_ids),
+            cls.data_type == data_type,
+            cls.period_start >= start_date,
+            cls.period_start <= end_date
+        ).group_by(cls.period_start).order_by(cls.period_start).all()
+        return [(row[0], tuple(row[1:])) for row in rows]
+
+
+class DailyMetricRollup(MetricRollup):
+    __tablename__ = 'metric_rollups_daily'
+    GRAIN = 'day'
+
+
+class WeeklyMetricRollup(MetricRollup):
+    """Rollups of ISO weeks, starting on Monday"""
+    __tablename__ = 'metric_rollups_weekly'
+    GRAIN = 'week'
+
+
+class MonthlyMetricRollup(MetricRollup):
+    __tablename__ = 'metric_rollups_monthly'
+    GRAIN = 'month'
+
+
+ROLLUP_MODELS = {model.GRAIN: model for model in (DailyMetricRollup, WeeklyMetricRollup, MonthlyMetricRollup)}
+
+
+def dimension_set_of(fact):
+    """Comma-separated dimensions an encoded fact row carries"""
+    return ','.join(
+        dimension for dimension in MetricFact.DIMENSIONS
+        if fact.get(f'{dimension}_key') is not None
+    )
+
+
+def add_facts_to_rollups(facts):
+    """Add newly inserted fact rows to every rollup grain"""
+    for model in ROLLUP_MODELS.values():
+        model.add_facts(facts)
+
+
+def remove_facts_from_rollups(facts):
+    """Subtract fact rows that are being deleted from every rollup grain, dropping emptied rollups"""
+    data_source_ids = {fact['data_source_id'] for fact in facts}
+    for model in ROLLUP_MODELS.values():
+        model.add_facts(facts, sign=-1)
+        if data_source_ids:
+            model.query.filter(
+                model.data_source_id.in_(data_source_ids),
+                model.row_count <= 0
+            ).delete(synchronize_session=False)
+
+
+def drop_facts_before(cutoff):
+    """
+    Delete the facts of days before cutoff and the rollups of periods that ended before it
+    
+    A week that straddles the cutoff keeps its rollup, with the dropped days
+    subtracted. The caller is responsible for committing.
+    
+    Returns:
+        Number of facts deleted
+    """
+    straddling_facts = [
+        row._asdict() for row in db.session.execute(db.select(MetricFact.__table__).where(
+            MetricFact.data_date >= WeeklyMetricRollup.period_start_of(cutoff),
+            MetricFact.data_date < cutoff
+        ))
+    ]
+    if straddling_facts:
+        remove_facts_from_rollups(straddling_facts)
+    
+    deleted = MetricFact.query.filter(MetricFact.data_date < cutoff).delete(synchronize_session=False)
+    for model in ROLLUP_MODELS.values():
+        model.query.filter(model.period_start < model.period_start_of(cutoff)).delete(synchronize_session=False)
+    return deleted
+
+
+def aggregate_rollups(data_source_ids, data_type, start_date, end_date, metrics, granularity='day'):
+    """
+    Sum metrics of one data type per period from the coarsest rollups that answer the range
+    
+    Whole weeks or months inside the range are read from their rollup and
+    the partial periods at either end from the daily rollup.
+    
+    Args:
+        data_source_ids: Data sources to include
+        data_type: Data type to sum
+        start_date: First day, inclusive
+        end_date: Last day, inclusive
+        metrics: Names from MetricRollup.METRICS to sum
+        granularity: Period of the results: day, week or month
+    
+    Returns:
+        List of (period_start, totals) tuples ordered by period, totals following metrics
+    """
+    if granularity not in ROLLUP_MODELS:
+        raise ValueError(f"Unsupported granularity: {granularity}")
+    model = ROLLUP_MODELS[granularity]
+    if model is DailyMetricRollup:
+        return DailyMetricRollup.sum_by_period(data_source_ids, data_type, start_date, end_date, metrics)
+    
+    # Whole periods inside the range
+    first_full = start_date
+    if model.period_start_of(start_date) != start_date:
+        first_full = model.period_end_of(start_date) + timedelta(days=1)
+    last_full = end_date
+    if model.period_end_of(end_date) != end_date:
+        last_full = model.period_start_of(end_date) - timedelta(days=1)
+    
+    if first_full > last_full:
+        return bucket_by_period(
+            DailyMetricRollup.sum_by_period(data_source_ids, data_type, start_date, end_date, metrics), granularity
+        )
+    
+    rows = model.sum_by_period(data_source_ids, data_type, first_full, last_full, metrics)
+    if start_date < first_full:
+        rows += DailyMetricRollup.sum_by_period(data_source_ids, data_type, start_date,
+                                                first_full - timedelta(days=1), metrics)
+    if last_full < end_date:
+        rows += DailyMetricRollup.sum_by_period(data_source_ids, data_type, last_full + timedelta(days=1),
+                                                end_date, metrics)
+    return bucket_by_period(rows, granularity)
+
+
+def bucket_by_period(rows, granularity):
+    """
+    Sum (day, totals) rows into the periods of a granularity
+    
+    Returns:
+        List of (period_start, totals) tuples ordered by period
+    """
+    model = ROLLUP_MODELS[granularity]
+    buckets = {}
+    for day, totals in rows:
+        period = model.period_start_of(day)
+        values = np.asarray(totals, dtype=float)
+        buckets[period] = buckets[period] + values if period in buckets else values
+    return [(period, tuple(buckets[period])) for period in sorted(buckets)]
@@ -0,0 +1,68 @@
+"""Store extracted_data.raw_data as binary
+
+raw_data holds a codec marker followed by compressed JSON, which needs a
+binary column. Existing JSON text is converted byte for byte and still
+decodes as legacy JSON. SQLite stores either type in any column, so only the
+declared type differs there and it is left alone. Columns that are already
+binary are skipped.
+
+Revision ID: 15e4dd555925
+Revises: be958a25c256
+Create Date: 2026-10-17 11:02:37.904415
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '15e4dd555925'
+down_revision = 'be958a25c256'
+branch_labels = None
+depends_on = None
+
+
+def raw_data_is_binary(bind):
+    columns = {column['name']: column['type'] for column in sa.inspect(bind).get_columns('extracted_data')}
+    return isinstance(columns['raw_data'], sa.LargeBinary)
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite' or raw_data_is_binary(bind):
+        return
+    if bind.dialect.name == 'postgresql':
+        op.execute("ALTER TABLE extracted_data ALTER COLUMN raw_data TYPE bytea USING convert_to(raw_data, 'UTF8')")
+    else:
+        op.alter_column('extracted_data', 'raw_data', type_=sa.LargeBinary(length=2 ** 32 - 1),
+                        existing_type=sa.Text(), existing_nullable=False)
+
+
+def downgrade():
+    # Compressed values cannot be cast back, so every row is decoded to JSON text
+    from extracted_data import ExtractedData
+
+    bind = op.get_bind()
+    with op.batch_alter_table('extracted_data') as batch_op:
+        batch_op.add_column(sa.Column('raw_data_text', sa.Text(), nullable=True))
+
+    table = sa.table('extracted_data', sa.column('id', sa.String), sa.column('raw_data', sa.LargeBinary),
+                     sa.column('raw_data_text', sa.Text))
+    while True:
+        rows = bind.execute(
+            sa.select(table.c.id, table.c.raw_data).where(table.c.raw_data_text.is_(None)).limit(1000)
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            table.update().where(table.c.id == sa.bindparam('row_id')).values(raw_data_text=sa.bindparam('text')),
+            [{'row_id': row.id, 'text': json.dumps(ExtractedData.decode_raw_data(row.raw_data), sort_keys=True)}
+             for row in rows]
+        )
+
+    with op.batch_alter_table('extracted_data') as batch_op:
+        batch_op.drop_column('raw_data')
+        batch_op.alter_column('raw_data_text', new_column_name='raw_data', existing_type=sa.Text(),
+                              nullable=False)
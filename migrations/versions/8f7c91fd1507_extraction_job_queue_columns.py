@@ -0,0 +1,54 @@
+"""Add worker lease columns to extraction_jobs
+
+Databases created before the job queue have extraction_jobs without the
+columns workers use to claim and lease jobs. db.create_all() does not alter
+existing tables, so they are added here. Columns and indexes that already
+exist (databases created by db.create_all() after the change) are skipped.
+
+Revision ID: 8f7c91fd1507
+Revises:
+Create Date: 2026-10-17 09:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f7c91fd1507'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def queue_columns():
+    return (
+        sa.Column('worker_id', sa.String(length=100), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=True, server_default='0'),
+        sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True),
+    )
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    existing_columns = {column['name'] for column in inspector.get_columns('extraction_jobs')}
+    existing_indexes = {index['name'] for index in inspector.get_indexes('extraction_jobs')}
+
+    with op.batch_alter_table('extraction_jobs') as batch_op:
+        for column in queue_columns():
+            if column.name not in existing_columns:
+                batch_op.add_column(column)
+
+    # claim_next compares attempts with MAX_ATTEMPTS, which NULL never passes
+    op.execute('UPDATE extraction_jobs SET attempts = 0 WHERE attempts IS NULL')
+
+    if 'idx_extraction_job_status_created' not in existing_indexes:
+        op.create_index('idx_extraction_job_status_created', 'extraction_jobs', ['status', 'created_at'])
+
+
+def downgrade():
+    op.drop_index('idx_extraction_job_status_created', table_name='extraction_jobs')
+    with op.batch_alter_table('extraction_jobs') as batch_op:
+        for column in reversed(queue_columns()):
+            batch_op.drop_column(column.name)
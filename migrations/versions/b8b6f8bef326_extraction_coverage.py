@@ -0,0 +1,54 @@
+"""Add the extraction_coverage table
+
+Gap detection reads the days each data source already extracted from
+extraction_coverage. Days that already have extracted_data rows are recorded
+as covered without a config_hash, so existing sources are not re-fetched.
+The table may already exist, empty, when the app created it on startup, so
+only its creation is skipped then and days already recorded are kept.
+
+Revision ID: b8b6f8bef326
+Revises: 15e4dd555925
+Create Date: 2026-10-17 14:21:09.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8b6f8bef326'
+down_revision = '15e4dd555925'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'extraction_coverage' not in sa.inspect(op.get_bind()).get_table_names():
+        create_table()
+    op.execute(
+        "INSERT INTO extraction_coverage (data_source_id, data_type, data_date, completed_at) "
+        "SELECT data_source_id, data_type, data_date, MAX(created_at) FROM extracted_data "
+        "WHERE NOT EXISTS (SELECT 1 FROM extraction_coverage c "
+        "WHERE c.data_source_id = extracted_data.data_source_id AND c.data_type = extracted_data.data_type "
+        "AND c.data_date = extracted_data.data_date) "
+        "GROUP BY data_source_id, data_type, data_date"
+    )
+
+
+def create_table():
+    op.create_table(
+        'extraction_coverage',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('data_source_id', sa.String(length=36),
+                  sa.ForeignKey('data_sources.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('data_type', sa.String(length=100), nullable=False),
+        sa.Column('data_date', sa.Date(), nullable=False),
+        sa.Column('config_hash', sa.String(length=64), nullable=True),
+        sa.Column('extraction_job_id', sa.String(length=36), nullable=True),
+        sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.UniqueConstraint('data_source_id', 'data_type', 'data_date', name='unique_extraction_coverage')
+    )
+
+
+def downgrade():
+    op.drop_table('extraction_coverage')
@@ -0,0 +1,30 @@
+"""Add the scheduler index on data_sources
+
+The scheduler polls active data sources by next_extraction_at. Tables
+created before the scheduler existed lack the index, which is skipped when
+it already exists.
+
+Revision ID: be958a25c256
+Revises: 8f7c91fd1507
+Create Date: 2026-10-17 09:48:05.571126
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'be958a25c256'
+down_revision = '8f7c91fd1507'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing_indexes = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('data_sources')}
+    if 'idx_data_source_next_extraction' not in existing_indexes:
+        op.create_index('idx_data_source_next_extraction', 'data_sources', ['is_active', 'next_extraction_at'])
+
+
+def downgrade():
+    op.drop_index('idx_data_source_next_extraction', table_name='data_sources')
@@ -0,0 +1,99 @@
+from functools import lru_cache
+from typing import Dict, List, Tuple, Optional
+import logging
+import numpy as np
+from .record_batch import RecordBatch
+
+logger = logging.getLogger(__name__)
+
+# Platform field -> (canonical field, unit factor or None). Canonical names
+# follow the mock integration: date, campaign_name, ad_group_name, keyword,
+# device, age_group, impressions, clicks, cost, conversions and revenue.
+PLATFORM_FIELD_MAPPINGS: Dict[str, Dict[str, Tuple[str, Optional[float]]]] = {
+    'google_ads': {
+        'cost_micros': ('cost', 1e-6),
+        'conversions_value': ('revenue', None),
+        'keyword_text': ('keyword', None),
+        'age_range': ('age_group', None)
+    },
+    'facebook_ads': {
+        'spend': ('cost', None),
+        'conversion_values': ('revenue', None),
+        'date_start': ('date', None),
+        'adset_name': ('ad_group_name', None),
+        'age': ('age_group', None),
+        'device_platform': ('device', None)
+    }
+}
+PLATFORM_FIELD_MAPPINGS['meta_ads'] = PLATFORM_FIELD_MAPPINGS['facebook_ads']
+
+
+class NormalizationPlan:
+    """
+    Field renames and unit conversions for one platform and set of columns
+    
+    Plans are compiled once per (platform, columns) and applied to whole
+    batches, so per-row work is limited to the columns that are scaled.
+    """
+    
+    def __init__(self, renames: List[Tuple[str, str]], scales: List[Tuple[str, float]]):
+        """
+        Initialize the plan
+        
+        Args:
+            renames: (source column, canonical column) pairs
+            scales: (canonical column, factor) pairs applied after renaming
+        """
+        self.renames = renames
+        self.scales = scales
+    
+    def apply(self, batch: RecordBatch) -> RecordBatch:
+        """Normalize a batch in place and return it"""
+        if not self.renames:
+            return batch
+        # Rebuild the mapping so renamed columns keep their position
+        renamed = dict(self.renames)
+        batch.columns = {renamed.get(name, name): values for name, values in batch.columns.items()}
+        for name, factor in self.scales:
+            batch.columns[name] = self._scale(batch.columns[name], factor)
+        return batch
+    
+    @staticmethod
+    def _scale(values: List, factor: float) -> List:
+        """Multiply a column by a unit factor, leaving missing values as None"""
+        if any(value is None for value in values):
+            return [None if value is None else round(value * factor, 6) for value in values]
+        return np.round(np.asarray(values, dtype=float) * factor, 6).tolist()
+
+
+@lru_cache(maxsize=512)
+def compile_plan(platform: str, column_names: Tuple[str, ...]) -> NormalizationPlan:
+    """
+    Compile the normalization plan for a platform's batch columns
+    
+    Args:
+        platform: Platform name of the batch
+        column_names: Column names of the batch, in order
+    
+    Returns:
+        Cached plan for this platform and column set
+    """
+    mapping = PLATFORM_FIELD_MAPPINGS.get(platform, {})
+    renames, scales = [], []
+    for name in column_names:
+        if name not in mapping:
+            continue
+        target, factor = mapping[name]
+        # Never overwrite a column the platform already returned under the canonical name
+        if target in column_names:
+            logger.debug(f"Not normalizing {platform} field {name}: {target} already present")
+            continue
+        renames.append((name, target))
+        if factor is not None:
+            scales.append((target, factor))
+    return NormalizationPlan(renames, scales)
+
+
+def normalize_batch(batch: RecordBatch) -> RecordBatch:
+    """Rename platform fields to canonical names and convert units for a whole batch"""
+    return compile_plan(batch.platform, tuple(batch.columns)).apply(batch)
@@ -0,0 +1,184 @@
+"""
+Monthly range partitioning of extracted_data on PostgreSQL
+
+Set EXTRACTED_DATA_PARTITIONING=monthly before the table is created to make
+extracted_data a table partitioned by data_date, with one partition per
+month. Partitions are created ahead of time by the scheduler and on demand
+for backfilled months, and retention drops whole partitions instead of
+deleting rows. The metric facts and rollups of those months are deleted
+along with them.
+"""
+
+from datetime import date, datetime, timezone
+from typing import Iterable, List, Set, Tuple
+import logging
+import os
+import re
+import threading
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from user import db
+from metric_rollup import drop_facts_before
+from extraction_coverage import ExtractionCoverage
+
+logger = logging.getLogger(__name__)
+
+
+def partitioning_configured() -> bool:
+    """Whether monthly partitioning of extracted_data is requested by the environment"""
+    return os.getenv('EXTRACTED_DATA_PARTITIONING', '').lower() == 'monthly'
+
+
+class ExtractedDataPartitions:
+    """Creates and drops the monthly partitions of extracted_data"""
+    
+    TABLE_NAME = 'extracted_data'
+    
+    # Months after the current one that always have a partition
+    MONTHS_AHEAD = 3
+    
+    # Months of data kept by drop_expired_partitions (two years, per the design doc)
+    DEFAULT_RETENTION_MONTHS = 24
+    
+    _BOUND_PATTERN = re.compile(r"FROM \('(\d{4}-\d{2}-\d{2})'\) TO \('(\d{4}-\d{2}-\d{2})'\)")
+    
+    # First day of the months known to have a committed partition in this process
+    _known_months: Set[date] = set()
+    _lock = threading.Lock()
+    
+    @classmethod
+    def is_enabled(cls) -> bool:
+        """Whether partitioning is configured and the database is PostgreSQL"""
+        return partitioning_configured() and db.session.get_bind().dialect.name == 'postgresql'
+    
+    @classmethod
+    def ensure_for_dates(cls, dates: Iterable[date]) -> None:
+        """
+        Create the partitions needed to store rows of the given days
+        
+        Runs in the caller's transaction, so the caller commits. Partitions
+        only enter the process cache once that transaction commits.
+        """
+        if not cls.is_enabled():
+            return
+        months = {cls._month_start(day) for day in dates if day}
+        with cls._lock:
+            missing = months - cls._known_months
+        if not missing:
+            return
+        
+        existing = {start for _, start, _ in cls.list_partitions()}
+        with cls._lock:
+            cls._known_months.update(existing)
+        for month in sorted(missing - existing):
+            cls._create_partition(month)
+    
+    @classmethod
+    def ensure_ahead(cls, months_ahead: int = None, today: date = None) -> None:
+        """Create partitions from the current month to months_ahead months later, then commit"""
+        if not cls.is_enabled():
+            return
+        today = today or datetime.now(timezone.utc).date()
+        months_ahead = cls.MONTHS_AHEAD if months_ahead is None else months_ahead
+        cls.ensure_for_dates(cls._add_months(cls._month_start(today), offset) for offset in range(months_ahead + 1))
+        db.session.commit()
+    
+    @classmethod
+    def drop_expired_partitions(cls, retention_months: int = None, today: date = None) -> List[str]:
+        """
+        Drop partitions whose whole month is older than the retention period, then commit
+        
+        The metric facts of the dropped months and the rollups of periods
+        before the cutoff are deleted in the same transaction, so aggregates
+        never count rows that are gone.
+        
+        Args:
+            retention_months: Months of data to keep, including the current one;
+                defaults to EXTRACTED_DATA_RETENTION_MONTHS or DEFAULT_RETENTION_MONTHS
+            today: Reference day, defaults to today (UTC)
+        
+        Returns:
+            Names of the dropped partitions
+        """
+        if not cls.is_enabled():
+            return []
+        if retention_months is None:
+            retention_months = int(os.getenv('EXTRACTED_DATA_RETENTION_MONTHS', cls.DEFAULT_RETENTION_MONTHS))
+        today = today or datetime.now(timezone.utc).date()
+        cutoff = cls._add_months(cls._month_start(today), -(retention_months - 1))
+        
+        dropped = []
+        dropped_months = set()
+        for name, start, end in cls.list_partitions():
+            if end <= cutoff:
+                db.session.execute(text(f'DROP TABLE IF EXISTS "{name}"'))
+                dropped.append(name)
+                dropped_months.add(start)
+                logger.info(f"Dropped partition {name} ({start} to {end}) past the {retention_months} month retention")
+        if dropped:
+            facts = drop_facts_before(cutoff)
+            # The dropped days have to be extracted again if they are requested
+            ExtractionCoverage.query.filter(ExtractionCoverage.data_date < cutoff).delete(synchronize_session=False)
+            logger.info(f"Deleted {facts} metric facts and the rollups before {cutoff}")
+        db.session.commit()
+        with cls._lock:
+            cls._known_months.difference_update(dropped_months)
+        return dropped
+    
+    @classmethod
+    def list_partitions(cls) -> List[Tuple[str, date, date]]:
+        """(name, first day, day after the last day) of each partition of extracted_data, ordered by date"""
+        rows = db.session.execute(text(
+            "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) "
+            "FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :table_name"
+        ), {'table_name': cls.TABLE_NAME}).all()
+        partitions = []
+        for name, bound in rows:
+            match = cls._BOUND_PATTERN.search(bound or '')
+            if match:
+                partitions.append((name, date.fromisoformat(match.group(1)), date.fromisoformat(match.group(2))))
+        return sorted(partitions, key=lambda partition: partition[1])
+    
+    @classmethod
+    def _create_partition(cls, month: date) -> None:
+        name = cls.partition_name(month)
+        next_month = cls._add_months(month, 1)
+        db.session.execute(text(
+            f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF {cls.TABLE_NAME} '
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')"
+        ))
+        db.session.info.setdefault('pending_partition_months', set()).add(month)
+        logger.info(f"Created partition {name}")
+    
+    @classmethod
+    def partition_name(cls, month: date) -> str:
+        """Name of the partition holding a month, e.g. extracted_data_p2024_01"""
+        return f'{cls.TABLE_NAME}_p{month.year:04d}_{month.month:02d}'
+    
+    @staticmethod
+    def _month_start(day) -> date:
+        if isinstance(day, datetime):
+            day = day.date()
+        return day.replace(day=1)
+    
+    @staticmethod
+    def _add_months(month: date, offset: int) -> date:
+        index = month.year * 12 + month.month - 1 + offset
+        return date(index // 12, index % 12 + 1, 1)
+
+
+@event.listens_for(Session, 'after_commit')
+def _cache_committed_partitions(session):
+    months = session.info.pop('pending_partition_months', None)
+    if months:
+        with ExtractedDataPartitions._lock:
+            ExtractedDataPartitions._known_months.update(months)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_pending_partitions(session, previous_transaction):
+    session.info.pop('pending_partition_months', None)
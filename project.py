@@ -19,6 +19,7 @@ class Project(db.Model):
     credentials = db.relationship('Credential', backref='project', lazy=True, cascade='all, delete-orphan')
     data_sources = db.relationship('DataSource', backref='project', lazy=True, cascade='all, delete-orphan')
     webhook_configs = db.relationship('WebhookConfig', backref='project', lazy=True, cascade='all, delete-orphan')
+    dimension_values = db.relationship('DimensionValue', backref='project', lazy=True, cascade='all, delete-orphan')
     
     # Unique constraint for user_id and name combination
     __table_args__ = (db.UniqueConstraint('user_id', 'name', name='unique_user_project_name'),)
@@ -1,9 +1,10 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from marshmallow import Schema, fields, ValidationError
+from marshmallow import Schema, fields, ValidationError, validates_schema
 from user import db, User
 from project import Project
-from data_source import DataSource
+from data_source import DataSource, ExtractionJob
+from data_extraction import DataExtractionService
 from datetime import datetime, timezone
 import json
 
@@ -26,12 +27,36 @@ class DataSourceCreateSchema(Schema):
     extraction_config = fields.Dict(load_default={})
     schedule_config = fields.Dict(load_default={})
 
+class ExtractionRequestSchema(Schema):
+    start_date = fields.Date(required=True)
+    end_date = fields.Date(required=True)
+    force_refresh = fields.Bool(load_default=False)
+    backfill = fields.Bool(load_default=False)
+    window_days = fields.Int(validate=lambda x: x > 0, load_default=None)
+
+    @validates_schema
+    def validate_date_range(self, data, **kwargs):
+        if data.get('start_date') and data.get('end_date') and data['start_date'] > data['end_date']:
+            raise ValidationError('start_date must not be after end_date', 'end_date')
+
 # ----------------------- Helpers ----------------------- #
 
 def get_current_user():
     current_user_id = get_jwt_identity()
     return User.query.get(current_user_id)
 
+def queue_extraction(service, data_source_id, data):
+    """Queue an extraction or a windowed backfill described by an ExtractionRequestSchema payload"""
+    if data['backfill']:
+        return service.backfill_data_source(
+            data_source_id, data['start_date'], data['end_date'],
+            window_days=data['window_days'], enqueue=True
+        )
+    return service.enqueue_extraction(
+        data_source_id, data['start_date'], data['end_date'],
+        force_refresh=data['force_refresh']
+    )
+
 # ----------------------- Routes ----------------------- #
 
 @project_bp.route('', methods=['GET'])
@@ -126,6 +151,62 @@ def list_data_sources(project_id):
     sources = DataSource.query.filter_by(project_id=project_id).order_by(DataSource.created_at.desc()).all()
     return jsonify({'data_sources': [ds.to_dict() for ds in sources]}), 200
 
+# -------- Extraction jobs -------- #
+
+@project_bp.route('/<project_id>/data-sources/<data_source_id>/extract', methods=['POST'])
+@jwt_required()
+def extract_data_source(project_id, data_source_id):
+    """Queue an extraction (or a windowed backfill) for a worker and return immediately"""
+    user = get_current_user()
+    project = Project.query.filter_by(id=project_id, user_id=user.id).first()
+    if not project:
+        return jsonify({'error': 'Project not found'}), 404
+    data_source = DataSource.query.filter_by(id=data_source_id, project_id=project_id).first()
+    if not data_source:
+        return jsonify({'error': 'Data source not found'}), 404
+    try:
+        data = ExtractionRequestSchema().load(request.json or {})
+    except ValidationError as err:
+        return jsonify({'error': 'Validation failed', 'details': err.messages}), 400
+
+    result = queue_extraction(DataExtractionService(), data_source_id, data)
+    if not result['success']:
+        return jsonify({'error': result['error']}), 400
+    return jsonify(result), 202
+
+@project_bp.route('/<project_id>/extract', methods=['POST'])
+@jwt_required()
+def extract_project(project_id):
+    """Queue one extraction job per active data source of a project"""
+    user = get_current_user()
+    project = Project.query.filter_by(id=project_id, user_id=user.id).first()
+    if not project:
+        return jsonify({'error': 'Project not found'}), 404
+    try:
+        data = ExtractionRequestSchema().load(request.json or {})
+    except ValidationError as err:
+        return jsonify({'error': 'Validation failed', 'details': err.messages}), 400
+
+    service = DataExtractionService()
+    sources = DataSource.query.filter_by(project_id=project_id, is_active=True).all()
+    results = [dict(queue_extraction(service, ds.id, data), data_source_id=ds.id) for ds in sources]
+    return jsonify({'message': f'Queued extraction for {len(results)} data sources', 'results': results}), 202
+
+@project_bp.route('/<project_id>/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_extraction_job(project_id, job_id):
+    user = get_current_user()
+    project = Project.query.filter_by(id=project_id, user_id=user.id).first()
+    if not project:
+        return jsonify({'error': 'Project not found'}), 404
+    job = ExtractionJob.query.join(DataSource).filter(
+        ExtractionJob.id == job_id,
+        DataSource.project_id == project_id
+    ).first()
+    if not job:
+        return jsonify({'error': 'Extraction job not found'}), 404
+    return jsonify({'job': job.to_dict()}), 200
+
 # -------- Export endpoint -------- #
 
 @project_bp.route('/<project_id>/export', methods=['GET'])
@@ -0,0 +1,186 @@
+from typing import Dict, Any, Callable, Tuple
+import fcntl
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class MemoryBucketStore:
+    """Bucket state that only lives in the current process"""
+    
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+    
+    def update(self, key: str, func: Callable[[Dict[str, Any]], Tuple[Dict[str, Any], Any]]) -> Any:
+        """Apply func to the bucket state atomically and return its result"""
+        with self._lock:
+            state, result = func(dict(self._buckets.get(key, {})))
+            self._buckets[key] = state
+            return result
+
+
+class FileBucketStore:
+    """
+    Bucket state shared by every process on the host through a directory
+    
+    Each bucket lives in its own file and is read, updated and written
+    back while holding an exclusive flock, so concurrent workers never
+    spend the same tokens twice.
+    """
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, re.sub(r'[^A-Za-z0-9_.-]', '_', key) + '.json')
+    
+    def update(self, key: str, func: Callable[[Dict[str, Any]], Tuple[Dict[str, Any], Any]]) -> Any:
+        """Apply func to the bucket state atomically and return its result"""
+        fd = os.open(self._path(key), os.O_RDWR | os.O_CREAT, 0o600)
+        with os.fdopen(fd, 'r+') as bucket_file:
+            fcntl.flock(bucket_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    state = json.loads(bucket_file.read() or '{}')
+                except ValueError:
+                    state = {}
+                state, result = func(state)
+                bucket_file.seek(0)
+                bucket_file.truncate()
+                json.dump(state, bucket_file)
+                bucket_file.flush()
+                return result
+            finally:
+                fcntl.flock(bucket_file, fcntl.LOCK_UN)
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter keyed by platform and account
+    
+    Each bucket refills at its base rate scaled by a factor that adapts to
+    the usage reported by the platform, and can be blocked outright for a
+    penalty period after a throttling error.
+    """
+    
+    # Usage share at which the rate starts to be reduced
+    TARGET_USAGE = 0.5
+    # Lowest fraction of the base rate the bucket is slowed down to
+    MIN_RATE_FACTOR = 0.1
+    # Seconds for a slowed-down bucket to climb back from zero to its base rate
+    FACTOR_RECOVERY_SECONDS = 300
+    
+    def __init__(self, store=None):
+        """
+        Initialize the limiter
+        
+        Args:
+            store: Bucket state store, shared across processes for FileBucketStore
+        """
+        self.store = store or MemoryBucketStore()
+    
+    def acquire(self, key: str, rate: float, capacity: float, tokens: float = 1) -> float:
+        """
+        Take tokens from a bucket, waiting until they are available
+        
+        A request costing more than the bucket's capacity waits for a full
+        bucket and leaves it in debt, which later requests wait out.
+        
+        Args:
+            key: Bucket key (platform and account)
+            rate: Base refill rate in tokens per second
+            capacity: Maximum burst size
+            tokens: Number of tokens the request costs
+        
+        Returns:
+            Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            wait = self.store.update(key, lambda state: self._take(state, rate, capacity, tokens))
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+    
+    def penalize(self, key: str, seconds: float) -> None:
+        """Block a bucket for a number of seconds and halve its rate after a throttling error"""
+        logger.warning(f"Rate limit hit for {key}, pausing requests for {seconds:.0f} seconds")
+        blocked_until = time.time() + seconds
+        
+        def block(state):
+            state['blocked_until'] = max(state.get('blocked_until', 0), blocked_until)
+            state['factor'] = max(self.MIN_RATE_FACTOR, state.get('factor', 1.0) / 2)
+            state['tokens'] = 0
+            state['updated_at'] = time.time()
+            return state, None
+        
+        self.store.update(key, block)
+    
+    def adapt(self, key: str, usage: float) -> None:
+        """
+        Scale a bucket's rate to the usage reported by the platform
+        
+        Args:
+            key: Bucket key
+            usage: Share of the platform quota in use, from 0 to 1
+        """
+        if usage <= self.TARGET_USAGE:
+            factor = 1.0
+        else:
+            factor = max(self.MIN_RATE_FACTOR, (1 - usage) / (1 - self.TARGET_USAGE))
+        
+        def set_factor(state):
+            state['factor'] = factor
+            return state, None
+        
+        self.store.update(key, set_factor)
+    
+    def _take(self, state: Dict[str, Any], rate: float, capacity: float,
+              cost: float = 1) -> Tuple[Dict[str, Any], float]:
+        """Refill and take cost tokens, returning the seconds to wait if they are not available"""
+        now = time.time()
+        elapsed = max(0.0, now - state.get('updated_at', now))
+        # Slowed-down buckets gradually return to the base rate
+        factor = min(1.0, state.get('factor', 1.0) + elapsed / self.FACTOR_RECOVERY_SECONDS)
+        effective_rate = rate * factor
+        tokens = min(capacity, state.get('tokens', capacity) + elapsed * effective_rate)
+        state['factor'] = factor
+        state['updated_at'] = now
+        
+        blocked_until = state.get('blocked_until', 0)
+        if blocked_until > now:
+            state['tokens'] = tokens
+            return state, blocked_until - now
+        
+        needed = min(cost, capacity)
+        if tokens >= needed:
+            state['tokens'] = tokens - cost
+            return state, 0.0
+        
+        state['tokens'] = tokens
+        return state, (needed - tokens) / effective_rate
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    Return the process-wide rate limiter
+    
+    Set RATE_LIMIT_DIR to share buckets between all worker processes on
+    the host.
+    """
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            state_dir = os.getenv('RATE_LIMIT_DIR')
+            _rate_limiter = RateLimiter(store=FileBucketStore(state_dir) if state_dir else None)
+        return _rate_limiter
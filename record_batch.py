@@ -0,0 +1,168 @@
+from collections.abc import Mapping, Sequence
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional, Iterable, Iterator
+
+class RecordView(Mapping):
+    """
+    Read-only view of one row of a RecordBatch in the legacy record shape
+    
+    Behaves like {'platform': ..., 'extracted_at': ..., 'data': {...}}
+    without allocating anything until 'data' is read.
+    """
+    
+    __slots__ = ('_batch', '_index')
+    
+    KEYS = ('platform', 'extracted_at', 'data')
+    
+    def __init__(self, batch: 'RecordBatch', index: int):
+        self._batch = batch
+        self._index = index
+    
+    def __getitem__(self, key: str) -> Any:
+        if key == 'platform':
+            return self._batch.platform
+        if key == 'extracted_at':
+            return self._batch.extracted_at
+        if key == 'data':
+            return self.data
+        raise KeyError(key)
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.KEYS)
+    
+    def __len__(self) -> int:
+        return len(self.KEYS)
+    
+    @property
+    def data(self) -> Dict[str, Any]:
+        """Dimensions and metrics of the row"""
+        index = self._index
+        return {name: column[index] for name, column in self._batch.columns.items()}
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Materialize the row as a legacy record"""
+        return {'platform': self._batch.platform, 'extracted_at': self._batch.extracted_at, 'data': self.data}
+
+
+class RecordBatch(Sequence):
+    """
+    Columnar batch of extracted records
+    
+    Each dimension and metric is stored once as a column, and platform and
+    extracted_at are stored once for the whole batch instead of in every
+    record. Indexing or iterating yields RecordView objects, so code
+    written for lists of records keeps working.
+    """
+    
+    __slots__ = ('platform', 'extracted_at', 'columns', '_length')
+    
+    def __init__(self, platform: str, columns: Dict[str, Iterable[Any]], extracted_at: str = None):
+        """
+        Initialize the batch
+        
+        Args:
+            platform: Platform the records were extracted from
+            columns: Column name to values, all of the same length
+            extracted_at: ISO timestamp of the extraction, defaults to now
+        """
+        self.platform = platform
+        self.extracted_at = extracted_at or datetime.now(timezone.utc).isoformat()
+        # NumPy arrays become lists of Python scalars so values stay JSON serializable
+        self.columns = {
+            name: values.tolist() if hasattr(values, 'tolist') else list(values)
+            for name, values in columns.items()
+        }
+        lengths = {len(values) for values in self.columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"RecordBatch columns have different lengths: {sorted(lengths)}")
+        self._length = lengths.pop() if lengths else 0
+    
+    @classmethod
+    def from_rows(cls, platform: str, names: List[str], rows: Iterable[Iterable[Any]],
+                  extracted_at: str = None) -> 'RecordBatch':
+        """Build a batch from row tuples whose values follow names"""
+        rows = list(rows)
+        columns = {name: [row[position] for row in rows] for position, name in enumerate(names)}
+        return cls(platform, columns, extracted_at)
+    
+    @classmethod
+    def from_records(cls, records: Iterable[Mapping], platform: str = None) -> 'RecordBatch':
+        """
+        Build a batch from legacy records
+        
+        Args:
+            records: Records shaped like format_data_record output, or plain data dicts
+            platform: Platform used when the records don't carry one
+        
+        Returns:
+            Batch whose columns are the union of the record keys
+        """
+        if isinstance(records, RecordBatch):
+            return records
+        records = list(records)
+        data = [record.get('data', record) for record in records]
+        names = []
+        for row in data:
+            for name in row:
+                if name not in names:
+                    names.append(name)
+        first = records[0] if records else {}
+        return cls(
+            first.get('platform', platform),
+            {name: [row.get(name) for row in data] for name in names},
+            first.get('extracted_at')
+        )
+    
+    def __len__(self) -> int:
+        return self._length
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return RecordBatch(
+                self.platform,
+                {name: values[index] for name, values in self.columns.items()},
+                self.extracted_at
+            )
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('RecordBatch index out of range')
+        return RecordView(self, index)
+    
+    def __iter__(self) -> Iterator[RecordView]:
+        for index in range(self._length):
+            yield RecordView(self, index)
+    
+    @property
+    def column_names(self) -> List[str]:
+        return list(self.columns)
+    
+    def column(self, name: str) -> Optional[List[Any]]:
+        """Values of a column, or None if the batch doesn't have it"""
+        return self.columns.get(name)
+    
+    def set_column(self, name: str, values: Iterable[Any]) -> None:
+        """Add or replace a column"""
+        values = values.tolist() if hasattr(values, 'tolist') else list(values)
+        if self.columns and len(values) != self._length:
+            raise ValueError(f"Column {name} has {len(values)} values, expected {self._length}")
+        self.columns[name] = values
+        self._length = len(values)
+    
+    def drop_columns(self, names: Iterable[str]) -> None:
+        """Remove columns, ignoring names the batch doesn't have"""
+        for name in names:
+            self.columns.pop(name, None)
+    
+    def iter_data(self) -> Iterator[Dict[str, Any]]:
+        """Yield the dimensions and metrics of each row as a dict"""
+        names = list(self.columns)
+        for values in zip(*self.columns.values()):
+            yield dict(zip(names, values))
+    
+    def to_records(self) -> List[Dict[str, Any]]:
+        """Materialize the batch as legacy records"""
+        return [
+            {'platform': self.platform, 'extracted_at': self.extracted_at, 'data': data}
+            for data in self.iter_data()
+        ]
@@ -0,0 +1,175 @@
+"""
+Extraction scheduler process
+
+Polls data sources whose next_extraction_at is due, queues a 'scheduled'
+ExtractionJob for each of them and computes their next run from
+schedule_config. The queued jobs are run by worker.py. Active sources with
+a schedule but no next run yet are scheduled when it starts. When extracted_data
+is partitioned it also creates upcoming monthly partitions and drops the
+ones past retention. Start with:
+    
+    python scheduler.py
+"""
+
+import os
+import signal
+import threading
+import time
+import logging
+from datetime import datetime, timezone
+
+from main import app
+from user import db
+from data_source import DataSource, ExtractionJob
+from data_extraction import DataExtractionService
+from partitioning import ExtractedDataPartitions
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionScheduler:
+    """Turns due data source schedules into queued extraction jobs"""
+    
+    def __init__(self, poll_interval: float = None, batch_size: int = None):
+        """
+        Initialize the scheduler
+        
+        Args:
+            poll_interval: Seconds between polls for due data sources
+            batch_size: Maximum number of due data sources handled per poll
+        """
+        self.poll_interval = poll_interval or float(os.getenv('SCHEDULER_POLL_INTERVAL', 30))
+        self.batch_size = batch_size or int(os.getenv('SCHEDULER_BATCH_SIZE', 100))
+        self.maintenance_interval = float(os.getenv('SCHEDULER_MAINTENANCE_INTERVAL', 3600))
+        self._next_maintenance_at = 0.0
+        self.service = DataExtractionService()
+        self._stop_event = threading.Event()
+    
+    def run_forever(self):
+        """Poll for due data sources until stop() is called"""
+        logger.info("Extraction scheduler started")
+        while not self._stop_event.is_set():
+            try:
+                if time.monotonic() >= self._next_maintenance_at:
+                    self._next_maintenance_at = time.monotonic() + self.maintenance_interval
+                    self.run_maintenance()
+                # Keep polling immediately while full batches of due sources remain
+                if self.run_once() < self.batch_size:
+                    self._stop_event.wait(self.poll_interval)
+            except Exception as e:
+                logger.error(f"Extraction scheduler error: {str(e)}")
+                self._stop_event.wait(self.poll_interval)
+        logger.info("Extraction scheduler stopped")
+    
+    def run_once(self) -> int:
+        """
+        Queue jobs for one batch of due data sources
+        
+        Returns:
+            Number of due data sources handled
+        """
+        with app.app_context():
+            now = datetime.now(timezone.utc)
+            try:
+                due_sources = DataSource.query.filter(
+                    DataSource.is_active == True,
+                    DataSource.next_extraction_at <= now
+                ).order_by(DataSource.next_extraction_at).limit(self.batch_size).with_for_update(skip_locked=True).all()
+                due = [(data_source, data_source.next_extraction_at) for data_source in due_sources]
+                
+                claimed = []
+                for data_source, scheduled_at in due:
+                    # Advancing next_extraction_at conditionally claims the run,
+                    # so concurrent schedulers never queue the same run twice
+                    next_run = data_source.get_next_extraction_at(after=now)
+                    updated = DataSource.query.filter(
+                        DataSource.id == data_source.id,
+                        DataSource.next_extraction_at == scheduled_at
+                    ).update({'next_extraction_at': next_run}, synchronize_session=False)
+                    if updated:
+                        claimed.append(data_source)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            
+            for data_source in claimed:
+                self._enqueue(data_source, now)
+            
+            return len(due)
+    
+    def run_maintenance(self):
+        """
+        Schedule sources that have no next run yet, create upcoming
+        extracted_data partitions and drop expired ones
+        """
+        with app.app_context():
+            try:
+                scheduled = self.schedule_unscheduled_sources()
+                if scheduled:
+                    logger.info(f"Scheduled {scheduled} data sources that had no next extraction time")
+                if not ExtractedDataPartitions.is_enabled():
+                    return
+                ExtractedDataPartitions.ensure_ahead()
+                dropped = ExtractedDataPartitions.drop_expired_partitions()
+                if dropped:
+                    logger.info(f"Dropped expired partitions: {', '.join(dropped)}")
+            except Exception:
+                db.session.rollback()
+                raise
+    
+    def schedule_unscheduled_sources(self) -> int:
+        """
+        Set next_extraction_at on active sources whose schedule_config was
+        saved before the scheduler existed, which the due query never matches
+        
+        Returns:
+            Number of data sources scheduled
+        """
+        scheduled = 0
+        last_id = ''
+        while True:
+            sources = DataSource.query.filter(
+                DataSource.is_active == True,
+                DataSource.next_extraction_at.is_(None),
+                DataSource.id > last_id
+            ).order_by(DataSource.id).limit(self.batch_size).all()
+            if not sources:
+                return scheduled
+            
+            for data_source in sources:
+                # Sources without an enabled schedule keep NULL
+                if data_source.schedule_next_extraction():
+                    scheduled += 1
+            last_id = sources[-1].id
+            db.session.commit()
+    
+    def stop(self, *args):
+        """Ask the scheduler to exit after the current poll"""
+        self._stop_event.set()
+    
+    def _enqueue(self, data_source: DataSource, now: datetime):
+        """Queue a scheduled job unless the source already has one in flight"""
+        in_flight = ExtractionJob.query.filter(
+            ExtractionJob.data_source_id == data_source.id,
+            ExtractionJob.status.in_(['queued', 'running'])
+        ).first()
+        if in_flight:
+            logger.info(f"Skipping scheduled run for {data_source.id}: job {in_flight.id} is {in_flight.status}")
+            return
+        
+        start_date, end_date = data_source.get_scheduled_date_range(now)
+        result = self.service.enqueue_extraction(data_source.id, start_date, end_date, job_type='scheduled')
+        if result['success']:
+            logger.info(f"Queued scheduled job {result['extraction_job_id']} for {data_source.id} "
+                        f"({start_date} to {end_date})")
+        else:
+            logger.error(f"Failed to queue scheduled job for {data_source.id}: {result['error']}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    scheduler = ExtractionScheduler()
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    signal.signal(signal.SIGINT, scheduler.stop)
+    scheduler.run_forever()
@@ -0,0 +1,73 @@
+import os
+
+import pytest
+from cryptography.fernet import Fernet
+from flask import Flask
+
+os.environ.setdefault('CREDENTIAL_ENCRYPTION_KEY', Fernet.generate_key().decode())
+
+from user import db, User
+from project import Project
+from credential import Credential
+from data_source import DataSource, ExtractionJob
+from extracted_data import ExtractedData
+from extraction_coverage import ExtractionCoverage
+from metric_fact import MetricFact
+from dimension_value import DimensionValue
+from metric_rollup import DailyMetricRollup, WeeklyMetricRollup, MonthlyMetricRollup
+from webhook import WebhookConfig
+from stub_server import StubServer
+
+
+@pytest.fixture
+def app(tmp_path):
+    """App with a fresh SQLite database and an active app context"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.db'}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+    # Process-wide caches hold ids of the previous database
+    DimensionValue.clear_cache()
+    MetricFact._project_ids.clear()
+
+
+@pytest.fixture
+def data_source(app):
+    user = User('owner@example.com', 'password', 'Test', 'Owner')
+    db.session.add(user)
+    db.session.commit()
+    project = Project(user.id, 'Test project')
+    db.session.add(project)
+    db.session.commit()
+    credential = Credential(project.id, 'google_ads', 'api_key', {'api_key': 'test'})
+    db.session.add(credential)
+    db.session.commit()
+    data_source = DataSource(
+        project.id, credential.id, 'google_ads', 'Test source',
+        {'metrics': ['impressions', 'clicks', 'cost'], 'dimensions': ['date', 'campaign_name']},
+        {}
+    )
+    db.session.add(data_source)
+    db.session.commit()
+    return data_source
+
+
+@pytest.fixture
+def extraction_job(data_source):
+    job = ExtractionJob(data_source.id, 'manual')
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+@pytest.fixture
+def stub_server():
+    """Local HTTP server standing in for a platform API"""
+    server = StubServer()
+    server.start()
+    yield server
+    server.stop()
@@ -0,0 +1,61 @@
+from data_extraction import DataExtractionService
+
+
+class StubIntegration:
+    """Integration returning one record per requested day, or none"""
+
+    METRIC_VALUES = {'impressions': 100, 'clicks': 5, 'cost': 2.5}
+
+    def __init__(self, empty=False):
+        self.empty = empty
+        self.requested_spans = []
+        self.requested_metrics = []
+
+    def validate_credentials(self):
+        return True
+
+    def iter_extract(self, start_date, end_date, metrics, dimensions, filters):
+        self.requested_spans.append((start_date.date(), end_date.date()))
+        self.requested_metrics.append(list(metrics))
+        if self.empty:
+            return
+        yield [
+            dict({'date': day.isoformat(), 'campaign_name': 'Brand'},
+                 **{metric: self.METRIC_VALUES.get(metric, 1) for metric in metrics})
+            for day in DataExtractionService._iter_days(start_date.date(), end_date.date())
+        ]
+
+
+class FailingIntegration(StubIntegration):
+    """Integration whose connection drops after the first batch of a span"""
+
+    def __init__(self, fail_times=1):
+        super().__init__()
+        self.fail_times = fail_times
+
+    def iter_extract(self, start_date, end_date, metrics, dimensions, filters):
+        self.requested_spans.append((start_date.date(), end_date.date()))
+        yield [{'date': start_date.date().isoformat(), 'campaign_name': 'Brand',
+                'impressions': 100, 'clicks': 5, 'cost': 2.5}]
+        if self.fail_times:
+            self.fail_times -= 1
+            raise ConnectionError('connection reset')
+        yield [{'date': start_date.date().isoformat(), 'campaign_name': 'Generic',
+                'impressions': 50, 'clicks': 1, 'cost': 0.5}]
+
+
+class StubFactory:
+    """Integration factory handing out the same integration for every platform"""
+
+    def __init__(self, integration):
+        self.integration = integration
+
+    def create_integration(self, platform, credentials, config):
+        return self.integration
+
+
+def make_service(integration):
+    """Extraction service extracting through the given integration"""
+    service = DataExtractionService()
+    service.integration_factory = StubFactory(integration)
+    return service
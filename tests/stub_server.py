@@ -0,0 +1,128 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+
+
+def load_fixture(name):
+    """Raw bytes of a recorded response in tests/fixtures"""
+    return (FIXTURES_DIR / name).read_bytes()
+
+
+class StubResponse:
+    """
+    Canned response of the stub server
+
+    With chunk_size set the body is sent with chunked transfer encoding,
+    one flushed chunk of at most chunk_size bytes at a time, the way a
+    streaming endpoint delivers it.
+    """
+
+    def __init__(self, status=200, body=b'', chunk_size=None, headers=None):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+        self.status = status
+        self.body = body
+        self.chunk_size = chunk_size
+        self.headers = {'Content-Type': 'application/json', **(headers or {})}
+
+
+class StubRequest:
+    """Request received by the stub server"""
+
+    def __init__(self, method, path, query, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+    def form(self):
+        """Form-encoded body as a dict of single values"""
+        return {key: values[-1] for key, values in parse_qs(self.body.decode('utf-8')).items()}
+
+
+class StubServer:
+    """
+    Local HTTP server replaying recorded platform responses
+
+    Routes map (method, path) to a StubResponse or to a callable taking the
+    StubRequest and returning one. Every request is kept in requests.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def route(self, method, path, response):
+        self.routes[(method, path)] = response
+
+    def requests_to(self, path):
+        return [request for request in self.requests if request.path == path]
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _respond(self, request):
+        response = self.routes.get((request.method, request.path))
+        if response is None:
+            return StubResponse(404, {'error': {'message': f'No stub for {request.method} {request.path}'}})
+        return response(request) if callable(response) else response
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _handle(self):
+                url = urlsplit(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                request = StubRequest(self.command, url.path, parse_qs(url.query),
+                                      dict(self.headers), self.rfile.read(length))
+                stub.requests.append(request)
+                response = stub._respond(request)
+
+                self.send_response(response.status)
+                for name, value in response.headers.items():
+                    self.send_header(name, value)
+                if response.chunk_size:
+                    self.send_header('Transfer-Encoding', 'chunked')
+                    self.end_headers()
+                    body = response.body
+                    for start in range(0, len(body), response.chunk_size):
+                        chunk = body[start:start + response.chunk_size]
+                        self.wfile.write(f'{len(chunk):x}\r\n'.encode('ascii') + chunk + b'\r\n')
+                        self.wfile.flush()
+                    self.wfile.write(b'0\r\n\r\n')
+                else:
+                    self.send_header('Content-Length', str(len(response.body)))
+                    self.end_headers()
+                    self.wfile.write(response.body)
+
+            do_GET = _handle
+            do_POST = _handle
+            do_DELETE = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,72 @@
+from datetime import date, datetime
+
+from user import db
+from data_source import ExtractionJob
+from stub_integration import StubIntegration, FailingIntegration, make_service
+
+
+def test_backfill_is_split_into_windows(data_source):
+    integration = StubIntegration()
+
+    result = make_service(integration).backfill_data_source(
+        data_source.id, datetime(2024, 1, 1), datetime(2024, 1, 17), window_days=7, max_workers=1
+    )
+
+    assert result['success']
+    assert result['total_windows'] == 3
+    assert result['records_count'] == 17
+    assert [(window['start'], window['end']) for window in result['results']] == [
+        ('2024-01-01', '2024-01-07'), ('2024-01-08', '2024-01-14'), ('2024-01-15', '2024-01-17')
+    ]
+    assert sorted(integration.requested_spans) == [
+        (date(2024, 1, 1), date(2024, 1, 7)), (date(2024, 1, 8), date(2024, 1, 14)),
+        (date(2024, 1, 15), date(2024, 1, 17))
+    ]
+    assert {job.status for job in ExtractionJob.query.filter_by(job_type='backfill')} == {'completed'}
+
+
+def test_rerun_only_extracts_windows_that_did_not_complete(data_source):
+    integration = FailingIntegration()
+    service = make_service(integration)
+
+    first = service.backfill_data_source(data_source.id, datetime(2024, 1, 1), datetime(2024, 1, 14),
+                                         window_days=7, max_workers=1)
+
+    assert not first['success']
+    assert first['failed_windows'] == 1
+    assert [window['success'] for window in first['results']] == [False, True]
+
+    integration.requested_spans.clear()
+    second = service.backfill_data_source(data_source.id, datetime(2024, 1, 1), datetime(2024, 1, 14),
+                                          window_days=7, max_workers=1)
+
+    assert second['success']
+    assert second['skipped_windows'] == 1
+    assert integration.requested_spans == [(date(2024, 1, 1), date(2024, 1, 7))]
+    assert second['results'][1]['message'] == 'Window already completed'
+    assert ExtractionJob.query.filter_by(job_type='backfill').count() == 2
+
+
+def test_enqueued_backfill_leaves_the_windows_to_workers(data_source):
+    integration = StubIntegration()
+    service = make_service(integration)
+
+    result = service.backfill_data_source(data_source.id, datetime(2024, 1, 1), datetime(2024, 1, 10),
+                                          window_days=7, enqueue=True)
+
+    assert result['success']
+    assert result['queued_windows'] == 2
+    assert integration.requested_spans == []
+    jobs = [db.session.get(ExtractionJob, job_id) for job_id in result['extraction_job_ids']]
+    assert [job.status for job in jobs] == ['queued', 'queued']
+    assert [job.get_job_config()['start_date'] for job in jobs] == ['2024-01-01', '2024-01-08']
+
+    # Queueing again does not duplicate windows a worker has yet to run
+    again = service.backfill_data_source(data_source.id, datetime(2024, 1, 1), datetime(2024, 1, 10),
+                                         window_days=7, enqueue=True)
+    assert again['queued_windows'] == 0
+    assert again['extraction_job_ids'] == result['extraction_job_ids']
+
+    claimed = ExtractionJob.claim_next('worker-1', lease_seconds=60)
+    assert service.run_extraction_job(claimed.id)['records_count'] == 7
+    assert integration.requested_spans == [(date(2024, 1, 1), date(2024, 1, 7))]
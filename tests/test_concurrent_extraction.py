@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from data_extraction import DataExtractionService
+
+
+class ConcurrencyRecordingService(DataExtractionService):
+    """
+    Service whose per-source extraction is a stub recording how many
+    extractions run at once, overall and per platform
+
+    Sources whose id starts with 'fail' raise, and each source sleeps for the
+    number of milliseconds after its last '-' so they finish out of order.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.lock = threading.Lock()
+        self.in_flight = Counter()
+        self.peak = Counter()
+        self.platforms = {}
+
+    def extract_data_for_source(self, data_source_id, start_date, end_date, force_refresh=False):
+        platform = self.platforms[data_source_id]
+        with self.lock:
+            self.in_flight[platform] += 1
+            self.in_flight['total'] += 1
+            for key in (platform, 'total'):
+                self.peak[key] = max(self.peak[key], self.in_flight[key])
+        try:
+            time.sleep(int(data_source_id.rsplit('-', 1)[1]) / 1000)
+            if data_source_id.startswith('fail'):
+                raise ConnectionError('connection reset')
+            return {'success': True, 'records_count': 1, 'data_source_id': data_source_id}
+        finally:
+            with self.lock:
+                self.in_flight[platform] -= 1
+                self.in_flight['total'] -= 1
+
+
+def make_sources(service, platform, count, delay_ms, prefix='source'):
+    sources = []
+    for index in range(count):
+        data_source_id = f'{prefix}-{platform}-{index}-{delay_ms}'
+        service.platforms[data_source_id] = platform
+        sources.append({'data_source_id': data_source_id, 'name': data_source_id, 'platform': platform})
+    return sources
+
+
+def extract(service, sources):
+    return service._extract_sources_concurrently(sources, datetime(2024, 1, 1), datetime(2024, 1, 7), False)
+
+
+def test_global_and_platform_limits_are_respected(app):
+    service = ConcurrencyRecordingService(max_workers=4, platform_limits={'google_ads': 2, 'facebook_ads': 3})
+    sources = (make_sources(service, 'google_ads', 6, 40) + make_sources(service, 'facebook_ads', 6, 40)
+               + make_sources(service, 'bing_ads', 3, 40))
+
+    results = extract(service, sources)
+
+    assert all(result['success'] for result in results)
+    assert service.peak['total'] == 4
+    assert service.peak['google_ads'] == 2
+    assert service.peak['facebook_ads'] <= 3
+    assert service.peak['bing_ads'] <= 4
+
+
+def test_busy_platform_does_not_starve_the_others(app):
+    service = ConcurrencyRecordingService(max_workers=4, platform_limits={'google_ads': 1})
+    sources = make_sources(service, 'google_ads', 4, 40) + make_sources(service, 'facebook_ads', 2, 40)
+
+    extract(service, sources)
+
+    # The queued Google Ads sources are skipped over instead of blocking the pool
+    assert service.peak['google_ads'] == 1
+    assert service.peak['facebook_ads'] == 2
+
+
+def test_results_keep_the_order_of_the_sources(app):
+    service = ConcurrencyRecordingService(max_workers=4)
+    sources = (make_sources(service, 'google_ads', 1, 80) + make_sources(service, 'facebook_ads', 1, 5)
+               + make_sources(service, 'bing_ads', 1, 40))
+
+    results = extract(service, sources)
+
+    assert [result['data_source_id'] for result in results] == [source['data_source_id'] for source in sources]
+
+
+def test_failing_source_does_not_affect_the_others(app):
+    service = ConcurrencyRecordingService(max_workers=2)
+    sources = (make_sources(service, 'google_ads', 1, 5) + make_sources(service, 'google_ads', 1, 5, prefix='fail')
+               + make_sources(service, 'facebook_ads', 2, 20))
+
+    results = extract(service, sources)
+
+    assert [result['success'] for result in results] == [True, False, True, True]
+    assert results[1]['error'] == 'connection reset'
@@ -0,0 +1,84 @@
+from datetime import date, datetime, timedelta, timezone
+
+from user import db
+from credential import Credential
+from src.integrations.base import AuthenticationError
+from stub_integration import StubIntegration, make_service
+
+
+class RevokedTokenIntegration(StubIntegration):
+    """Integration whose first extraction is rejected with an authentication error"""
+
+    def __init__(self, valid=True):
+        super().__init__()
+        self.valid = valid
+        self.validations = 0
+        self.rejected = False
+
+    def validate_credentials(self):
+        self.validations += 1
+        return self.valid
+
+    def iter_extract(self, start_date, end_date, metrics, dimensions, filters):
+        if not self.rejected:
+            self.rejected = True
+            raise AuthenticationError('Access token has expired')
+        yield from super().iter_extract(start_date, end_date, metrics, dimensions, filters)
+
+
+def get_credential(data_source):
+    return db.session.get(Credential, data_source.credential_id)
+
+
+def test_validation_is_fresh_until_its_ttl_runs_out(data_source):
+    credential = get_credential(data_source)
+    assert not credential.is_validation_fresh()
+
+    credential.record_validation(True)
+    assert credential.is_validation_fresh()
+    assert not credential.is_validation_fresh(ttl_seconds=0)
+
+    credential.last_validated_at = datetime.now(timezone.utc) - timedelta(seconds=Credential.VALIDATION_TTL_SECONDS + 1)
+    assert not credential.is_validation_fresh()
+
+    credential.record_validation(False)
+    assert not credential.is_validation_fresh()
+
+
+def test_fresh_validation_is_reused_across_extractions(data_source):
+    integration = RevokedTokenIntegration()
+    integration.rejected = True
+    service = make_service(integration)
+
+    service.extract_data_for_source(data_source.id, datetime(2024, 1, 1), datetime(2024, 1, 1))
+    service.extract_data_for_source(data_source.id, datetime(2024, 1, 2), datetime(2024, 1, 2))
+
+    assert integration.validations == 1
+
+
+def test_authentication_error_revalidates_and_retries_the_span(data_source):
+    get_credential(data_source).record_validation(True)
+    integration = RevokedTokenIntegration(valid=True)
+
+    result = make_service(integration).extract_data_for_source(data_source.id, datetime(2024, 1, 1),
+                                                               datetime(2024, 1, 2))
+
+    assert result['success']
+    assert result['records_count'] == 2
+    # The cached validation was bypassed once, after the rejection
+    assert integration.validations == 1
+    assert integration.requested_spans == [(date(2024, 1, 1), date(2024, 1, 2))]
+
+
+def test_credential_rejected_again_is_marked_invalid(data_source):
+    get_credential(data_source).record_validation(True)
+    integration = RevokedTokenIntegration(valid=False)
+
+    result = make_service(integration).extract_data_for_source(data_source.id, datetime(2024, 1, 1),
+                                                               datetime(2024, 1, 1))
+
+    assert not result['success']
+    assert 'Access token has expired' in result['error']
+    credential = get_credential(data_source)
+    assert credential.validation_status == 'invalid'
+    assert not credential.is_validation_fresh()
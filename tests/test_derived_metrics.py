@@ -0,0 +1,117 @@
+from datetime import date, datetime
+
+import numpy as np
+
+from user import db
+from derived_metrics import compute_derived_metrics, add_derived_metrics, split_metrics
+from data_extraction import DataExtractionService
+from extracted_data import ExtractedData
+from src.integrations.record_batch import RecordBatch
+from stub_integration import StubIntegration, make_service
+
+
+def test_derived_metrics_are_computed_from_aggregated_inputs():
+    columns = {
+        'impressions': np.array([1000.0, 200.0]),
+        'clicks': np.array([50.0, 4.0]),
+        'cost': np.array([25.0, 3.0]),
+        'revenue': np.array([100.0, 6.0]),
+        'conversions': np.array([5.0, 1.0])
+    }
+
+    results = compute_derived_metrics(columns, ['ctr', 'cpc', 'cpm', 'roas', 'cost_per_conversion',
+                                                'conversion_rate'])
+
+    assert results['ctr'].tolist() == [5.0, 2.0]
+    assert results['cpc'].tolist() == [0.5, 0.75]
+    assert results['cpm'].tolist() == [25.0, 15.0]
+    assert results['roas'].tolist() == [4.0, 2.0]
+    assert results['cost_per_conversion'].tolist() == [5.0, 3.0]
+    assert results['conversion_rate'].tolist() == [10.0, 25.0]
+
+
+def test_zero_denominators_give_zero():
+    columns = {'impressions': np.array([0.0]), 'clicks': np.array([0.0]), 'cost': np.array([0.0]),
+               'revenue': np.array([10.0])}
+
+    results = compute_derived_metrics(columns, ['ctr', 'cpc', 'cpm', 'roas'])
+
+    assert {name: values.tolist() for name, values in results.items()} == {
+        'ctr': [0.0], 'cpc': [0.0], 'cpm': [0.0], 'roas': [0.0]
+    }
+
+
+def test_metrics_without_their_inputs_are_skipped():
+    assert compute_derived_metrics({'clicks': np.array([1.0])}, ['ctr', 'unknown']) == {}
+
+
+def test_split_metrics_adds_the_inputs_of_derived_metrics():
+    assert split_metrics(['cost', 'ctr', 'average_cpc']) == (['cost', 'clicks', 'impressions'], ['ctr', 'average_cpc'])
+
+
+def test_derived_metrics_are_added_to_records_with_numeric_inputs():
+    records = [{'clicks': 5, 'impressions': 100, 'cost': 2.5}, {'clicks': None, 'impressions': 10}]
+
+    add_derived_metrics(records, ['ctr', 'average_cpc'])
+
+    assert records[0] == {'clicks': 5, 'impressions': 100, 'cost': 2.5, 'ctr': 5.0, 'average_cpc': 0.5}
+    assert records[1] == {'clicks': None, 'impressions': 10}
+
+
+def store(data_source, extraction_job, columns, day):
+    DataExtractionService()._store_records(data_source.id, extraction_job.id, 'campaign',
+                                           RecordBatch('google_ads', columns), day, day)
+    db.session.commit()
+
+
+def test_ratios_are_read_from_stored_totals_instead_of_the_platform_values(data_source, extraction_job):
+    store(data_source, extraction_job, {
+        'date': ['2024-01-01', '2024-01-01'],
+        'campaign_name': ['Brand', 'Generic'],
+        'impressions': [100, 900],
+        'clicks': [10, 10],
+        'cost_micros': [5000000, 15000000],
+        'ctr': [0.1, 0.0111],
+        'average_cpc': [500000, 1500000]
+    }, date(2024, 1, 1))
+    store(data_source, extraction_job, {
+        'date': ['2024-01-02'], 'campaign_name': ['Brand'], 'impressions': [0], 'clicks': [0], 'cost_micros': [0]
+    }, date(2024, 1, 2))
+
+    row = ExtractedData.query.filter_by(data_date=date(2024, 1, 1)).first()
+    assert 'ctr' not in row.get_processed_data()
+    assert 'ctr' in row.get_raw_data()['data']
+
+    totals = ExtractedData.aggregate_metrics_by_date([data_source.id], date(2024, 1, 1), date(2024, 1, 2),
+                                                     ['ctr', 'cpc', 'cpm'])
+
+    # Ratios of the day totals, not averages of the per-campaign ratios
+    assert totals == {
+        '2024-01-01': {'ctr': 2.0, 'cpc': 1.0, 'cpm': 20.0},
+        '2024-01-02': {'ctr': 0, 'cpc': 0, 'cpm': 0}
+    }
+
+
+def test_derived_metrics_are_requested_as_their_platform_inputs():
+    service = DataExtractionService()
+
+    assert service._get_requested_metrics('google_ads', ['ctr', 'average_cpc']) == \
+        ['clicks', 'impressions', 'cost_micros']
+    assert service._get_requested_metrics('facebook_ads', ['impressions', 'cpm', 'roas']) == \
+        ['impressions', 'spend', 'conversion_values']
+    assert service._get_requested_metrics('google_ads', ['clicks', 'conversions']) == ['clicks', 'conversions']
+
+
+def test_source_configured_with_only_ctr_stores_its_inputs(data_source):
+    data_source.set_extraction_config({'metrics': ['ctr'], 'dimensions': ['date', 'campaign_name']})
+    db.session.commit()
+    integration = StubIntegration()
+
+    result = make_service(integration).extract_data_for_source(data_source.id, datetime(2024, 1, 1),
+                                                               datetime(2024, 1, 2))
+
+    assert result['success']
+    assert integration.requested_metrics == [['clicks', 'impressions']]
+    assert ExtractedData.query.first().get_processed_data()['clicks'] == 5
+    assert ExtractedData.aggregate_metrics_by_date([data_source.id], date(2024, 1, 1), date(2024, 1, 2),
+                                                   ['ctr']) == {'2024-01-01': {'ctr': 5.0}, '2024-01-02': {'ctr': 5.0}}
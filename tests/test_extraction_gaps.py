@@ -0,0 +1,132 @@
+from datetime import date, datetime
+
+from user import db
+from data_extraction import DataExtractionService
+from extracted_data import ExtractedData
+from extraction_coverage import ExtractionCoverage
+from stub_integration import StubIntegration, FailingIntegration, make_service
+
+
+def cover(data_source, *days):
+    config = data_source.get_extraction_config()
+    ExtractionCoverage.record_days(data_source.id, 'campaign', ExtractionCoverage.config_hash_of(config),
+                                   None, days)
+    db.session.commit()
+
+
+def test_all_days_are_missing_without_coverage(data_source):
+    service = DataExtractionService()
+
+    spans = service.find_missing_date_spans(data_source.id, datetime(2024, 1, 1), datetime(2024, 1, 10))
+
+    assert spans == [(date(2024, 1, 1), date(2024, 1, 10))]
+
+
+def test_interior_leading_and_trailing_gaps_are_found(data_source):
+    cover(data_source, date(2024, 1, 3), date(2024, 1, 4), date(2024, 1, 7))
+
+    spans = DataExtractionService().find_missing_date_spans(data_source.id, datetime(2024, 1, 1),
+                                                            datetime(2024, 1, 10))
+
+    assert spans == [
+        (date(2024, 1, 1), date(2024, 1, 2)),
+        (date(2024, 1, 5), date(2024, 1, 6)),
+        (date(2024, 1, 8), date(2024, 1, 10))
+    ]
+
+
+def test_fully_covered_range_has_no_gaps(data_source):
+    cover(data_source, *DataExtractionService._iter_days(date(2024, 1, 1), date(2024, 1, 5)))
+
+    assert DataExtractionService().find_missing_date_spans(data_source.id, datetime(2024, 1, 1),
+                                                           datetime(2024, 1, 5)) == []
+
+
+def test_days_extracted_with_another_config_or_data_type_are_missing(data_source):
+    ExtractionCoverage.record_days(data_source.id, 'campaign', 'other-config', None, [date(2024, 1, 1)])
+    ExtractionCoverage.record_days(data_source.id, 'ad_group',
+                                   ExtractionCoverage.config_hash_of(data_source.get_extraction_config()),
+                                   None, [date(2024, 1, 2)])
+    # Legacy coverage has no config_hash and matches any config
+    ExtractionCoverage.record_days(data_source.id, 'campaign', None, None, [date(2024, 1, 3)])
+    db.session.commit()
+
+    spans = DataExtractionService().find_missing_date_spans(data_source.id, datetime(2024, 1, 1),
+                                                            datetime(2024, 1, 3))
+
+    assert spans == [(date(2024, 1, 1), date(2024, 1, 2))]
+
+
+def test_only_missing_spans_are_requested_from_the_platform(data_source):
+    cover(data_source, date(2024, 1, 3), date(2024, 1, 4))
+    integration = StubIntegration()
+
+    result = make_service(integration).extract_data_for_source(data_source.id, datetime(2024, 1, 1),
+                                                               datetime(2024, 1, 6))
+
+    assert result['success']
+    assert result['records_count'] == 4
+    assert integration.requested_spans == [(date(2024, 1, 1), date(2024, 1, 2)),
+                                           (date(2024, 1, 5), date(2024, 1, 6))]
+    assert DataExtractionService().find_missing_date_spans(data_source.id, datetime(2024, 1, 1),
+                                                           datetime(2024, 1, 6)) == []
+
+
+def test_nothing_is_requested_when_the_range_is_covered(data_source):
+    cover(data_source, *DataExtractionService._iter_days(date(2024, 1, 1), date(2024, 1, 3)))
+    integration = StubIntegration()
+
+    result = make_service(integration).extract_data_for_source(data_source.id, datetime(2024, 1, 1),
+                                                               datetime(2024, 1, 3))
+
+    assert result == {'success': True, 'message': 'Data already exists', 'records_count': 0}
+    assert integration.requested_spans == []
+
+
+def test_days_without_rows_are_not_fetched_again(data_source):
+    integration = StubIntegration(empty=True)
+    service = make_service(integration)
+
+    first = service.extract_data_for_source(data_source.id, datetime(2024, 1, 1), datetime(2024, 1, 3))
+    second = service.extract_data_for_source(data_source.id, datetime(2024, 1, 1), datetime(2024, 1, 3))
+
+    assert first['success']
+    assert first['records_count'] == 0
+    assert second['message'] == 'Data already exists'
+    assert integration.requested_spans == [(date(2024, 1, 1), date(2024, 1, 3))]
+    assert ExtractedData.query.count() == 0
+
+
+def test_span_failing_partway_is_not_left_half_stored(data_source):
+    integration = FailingIntegration()
+    service = make_service(integration)
+
+    failed = service.extract_data_for_source(data_source.id, datetime(2024, 1, 1), datetime(2024, 1, 1))
+
+    assert not failed['success']
+    assert 'connection reset' in failed['error']
+    assert ExtractedData.query.count() == 0
+    assert service.find_missing_date_spans(data_source.id, datetime(2024, 1, 1),
+                                           datetime(2024, 1, 1)) == [(date(2024, 1, 1), date(2024, 1, 1))]
+
+    retried = service.extract_data_for_source(data_source.id, datetime(2024, 1, 1), datetime(2024, 1, 1))
+
+    assert retried['success']
+    assert retried['records_count'] == 2
+    assert sorted(row.get_processed_data()['campaign_name'] for row in ExtractedData.query) == ['Brand', 'Generic']
+
+
+def test_rows_left_by_an_interrupted_run_are_replaced(data_source, extraction_job):
+    # A worker that died mid-span committed a batch without covering the day
+    make_service(StubIntegration())._store_records(
+        data_source.id, extraction_job.id, 'campaign',
+        [{'date': '2024-01-01', 'campaign_name': 'Stale', 'impressions': 1, 'clicks': 0, 'cost': 0}],
+        date(2024, 1, 1), date(2024, 1, 1)
+    )
+    db.session.commit()
+
+    result = make_service(StubIntegration()).extract_data_for_source(data_source.id, datetime(2024, 1, 1),
+                                                                     datetime(2024, 1, 1))
+
+    assert result['success']
+    assert [row.get_processed_data()['campaign_name'] for row in ExtractedData.query] == ['Brand']
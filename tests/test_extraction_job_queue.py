@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta, timezone
+
+from user import db
+from data_source import ExtractionJob
+
+
+def queue_job(data_source, created_at=None):
+    job = ExtractionJob(data_source.id, 'manual', status='queued', attempts=0,
+                        created_at=created_at or datetime.now(timezone.utc))
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+
+def expire_lease(job_id):
+    job = db.session.get(ExtractionJob, job_id)
+    job.lease_expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+    db.session.commit()
+
+
+def test_claim_next_takes_the_oldest_queued_job(data_source):
+    now = datetime.now(timezone.utc)
+    newer = queue_job(data_source, now)
+    older = queue_job(data_source, now - timedelta(minutes=5))
+
+    job = ExtractionJob.claim_next('worker-1', lease_seconds=60)
+
+    assert job.id == older
+    assert job.status == 'running'
+    assert job.worker_id == 'worker-1'
+    assert job.attempts == 1
+    assert job.lease_expires_at is not None
+    assert ExtractionJob.claim_next('worker-2', lease_seconds=60).id == newer
+    assert ExtractionJob.claim_next('worker-3', lease_seconds=60) is None
+
+
+def test_claim_next_ignores_jobs_that_are_not_queued(data_source, extraction_job):
+    assert extraction_job.status == 'pending'
+    assert ExtractionJob.claim_next('worker-1', lease_seconds=60) is None
+
+
+def test_leased_job_is_not_claimed_again_until_the_lease_expires(data_source):
+    job_id = queue_job(data_source)
+    assert ExtractionJob.claim_next('worker-1', lease_seconds=60).id == job_id
+    assert ExtractionJob.claim_next('worker-2', lease_seconds=60) is None
+
+    expire_lease(job_id)
+    job = ExtractionJob.claim_next('worker-2', lease_seconds=60)
+
+    assert job.id == job_id
+    assert job.worker_id == 'worker-2'
+    assert job.attempts == 2
+
+
+def test_renew_lease_only_extends_the_holders_lease(data_source):
+    job_id = queue_job(data_source)
+    ExtractionJob.claim_next('worker-1', lease_seconds=60)
+    expire_lease(job_id)
+
+    assert not ExtractionJob.renew_lease(job_id, 'worker-2', lease_seconds=60)
+    assert ExtractionJob.renew_lease(job_id, 'worker-1', lease_seconds=60)
+    assert ExtractionJob.claim_next('worker-2', lease_seconds=60) is None
+
+
+def test_job_is_failed_after_its_last_allowed_attempt(data_source):
+    job_id = queue_job(data_source)
+    for attempt in range(ExtractionJob.MAX_ATTEMPTS):
+        assert ExtractionJob.claim_next(f'worker-{attempt}', lease_seconds=60).id == job_id
+        expire_lease(job_id)
+
+    assert ExtractionJob.claim_next('worker-last', lease_seconds=60) is None
+    assert ExtractionJob.fail_abandoned_jobs() == 1
+
+    db.session.expire_all()
+    job = db.session.get(ExtractionJob, job_id)
+    assert job.status == 'failed'
+    assert job.lease_expires_at is None
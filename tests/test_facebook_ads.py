@@ -0,0 +1,191 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from src.integrations import base
+from src.integrations.facebook_ads import FacebookAdsIntegration
+from src.integrations.rate_limiter import RateLimiter
+from stub_server import StubResponse
+
+GRAPH = '/v18.0'
+
+
+def make_integration(stub_server, **config):
+    config = dict({
+        'graph_base_url': stub_server.url,
+        'poll_initial_interval': 0.01,
+        'poll_max_interval': 0.01,
+        'rate_limit_per_second': 1000
+    }, **config)
+    return FacebookAdsIntegration({'access_token': 'token', 'app_id': 'app', 'app_secret': 'secret', 'account_id': '42'}, config)
+
+
+def report_statuses(*statuses):
+    """Route handler answering status polls with the given statuses, repeating the last"""
+    remaining = list(statuses)
+
+    def respond(request):
+        status = remaining.pop(0) if len(remaining) > 1 else remaining[0]
+        return StubResponse(body={'async_status': status, 'async_percent_completion': 100 if status == 'Job Completed' else 40})
+    return respond
+
+
+def results_pages(*pages):
+    """Route handler serving result pages linked by 'after' cursors"""
+    def respond(request):
+        index = int(request.query.get('after', ['0'])[0])
+        body = {'data': pages[index]}
+        if index + 1 < len(pages):
+            body['paging'] = {'cursors': {'after': str(index + 1)}, 'next': 'https://graph.facebook.com/next'}
+        return StubResponse(body=body)
+    return respond
+
+
+def insights_row(date, campaign, impressions, spend, actions=None, conversion_values=None):
+    row = {'date_start': date, 'date_stop': date, 'campaign_name': campaign,
+           'impressions': str(impressions), 'spend': str(spend)}
+    if actions is not None:
+        row['actions'] = actions
+    if conversion_values is not None:
+        row['conversion_values'] = conversion_values
+    return row
+
+
+def test_report_run_is_polled_until_complete_and_every_page_is_read(stub_server):
+    stub_server.route('POST', f'{GRAPH}/act_42/insights', StubResponse(body={'report_run_id': 'run-1'}))
+    stub_server.route('GET', f'{GRAPH}/run-1', report_statuses('Job Not Started', 'Job Running', 'Job Completed'))
+    stub_server.route('GET', f'{GRAPH}/run-1/insights', results_pages(
+        [insights_row('2024-01-01', 'Brand', 100, '12.50'), insights_row('2024-01-01', 'Retargeting', 40, '3.10')],
+        [insights_row('2024-01-02', 'Brand', 90, '11.00')]
+    ))
+    integration = make_integration(stub_server)
+
+    records = integration.extract_data(datetime(2024, 1, 1), datetime(2024, 1, 2))
+
+    assert [record['data'] for record in records] == [
+        {'date_start': '2024-01-01', 'campaign_name': 'Brand', 'impressions': 100, 'clicks': None, 'spend': 12.5},
+        {'date_start': '2024-01-01', 'campaign_name': 'Retargeting', 'impressions': 40, 'clicks': None, 'spend': 3.1},
+        {'date_start': '2024-01-02', 'campaign_name': 'Brand', 'impressions': 90, 'clicks': None, 'spend': 11.0},
+    ]
+    [submission] = stub_server.requests_to(f'{GRAPH}/act_42/insights')
+    params = submission.form()
+    assert params['async'] == 'true'
+    assert params['level'] == 'campaign'
+    assert json.loads(params['time_range']) == {'since': '2024-01-01', 'until': '2024-01-02'}
+    assert len(stub_server.requests_to(f'{GRAPH}/run-1')) == 3
+    assert [request.query.get('after') for request in stub_server.requests_to(f'{GRAPH}/run-1/insights')] == [None, ['1']]
+
+
+def test_failed_report_run_is_resubmitted(stub_server):
+    run_ids = iter(['run-failed', 'run-retry'])
+    stub_server.route('POST', f'{GRAPH}/act_42/insights', lambda request: StubResponse(body={'report_run_id': next(run_ids)}))
+    stub_server.route('GET', f'{GRAPH}/run-failed', report_statuses('Job Failed'))
+    stub_server.route('GET', f'{GRAPH}/run-retry', report_statuses('Job Completed'))
+    stub_server.route('GET', f'{GRAPH}/run-retry/insights', results_pages([insights_row('2024-01-01', 'Brand', 100, '12.50')]))
+    integration = make_integration(stub_server)
+
+    records = integration.extract_data(datetime(2024, 1, 1), datetime(2024, 1, 1))
+
+    assert len(records) == 1
+    assert len(stub_server.requests_to(f'{GRAPH}/act_42/insights')) == 2
+
+
+def test_action_stat_lists_are_summed_over_the_configured_action_types(stub_server):
+    actions = [
+        {'action_type': 'link_click', 'value': '30'},
+        {'action_type': 'purchase', 'value': '3'},
+        {'action_type': 'offsite_conversion.fb_pixel_lead', 'value': '2'}
+    ]
+    conversion_values = [
+        {'action_type': 'purchase', 'value': '149.97'},
+        {'action_type': 'offsite_conversion.fb_pixel_lead', 'value': '20'}
+    ]
+    stub_server.route('POST', f'{GRAPH}/act_42/insights', StubResponse(body={'report_run_id': 'run-1'}))
+    stub_server.route('GET', f'{GRAPH}/run-1', report_statuses('Job Completed'))
+    stub_server.route('GET', f'{GRAPH}/run-1/insights', results_pages([
+        insights_row('2024-01-01', 'Brand', 100, '12.50', actions, conversion_values),
+        # Rows without matching actions omit the lists
+        insights_row('2024-01-01', 'Retargeting', 40, '3.10')
+    ]))
+    metrics = ['spend', 'actions', 'conversion_values']
+
+    purchases = make_integration(stub_server, action_types=['purchase'])
+    every_type = make_integration(stub_server)
+
+    assert [record['data'] for record in purchases.extract_data(datetime(2024, 1, 1), datetime(2024, 1, 1), metrics)] == [
+        {'date_start': '2024-01-01', 'campaign_name': 'Brand', 'spend': 12.5, 'actions': 3, 'conversion_values': 149.97},
+        {'date_start': '2024-01-01', 'campaign_name': 'Retargeting', 'spend': 3.1, 'actions': 0, 'conversion_values': 0}
+    ]
+    rows = [record['data'] for record in every_type.extract_data(datetime(2024, 1, 1), datetime(2024, 1, 1), metrics)]
+    assert rows[0]['actions'] == 35
+    assert rows[0]['conversion_values'] == pytest.approx(169.97)
+
+
+def test_action_types_can_be_set_per_metric():
+    integration = FacebookAdsIntegration({'access_token': 'token'}, {
+        'action_types': {'actions': ['link_click'], 'conversion_values': ['purchase']}
+    })
+    row = {
+        'actions': [{'action_type': 'link_click', 'value': '30'}, {'action_type': 'purchase', 'value': '3'}],
+        'conversion_values': [{'action_type': 'purchase', 'value': '149.97'}],
+        'video_play_actions': [{'action_type': 'video_view', 'value': '12'}]
+    }
+
+    assert integration._convert_row(row, ['actions', 'conversion_values', 'video_views'], []) == (30, 149.97, 12)
+
+
+def test_batch_request_demultiplexes_responses_and_retries_failed_calls(stub_server):
+    def batch(request):
+        calls = json.loads(request.form()['batch'])
+        assert [call['relative_url'] for call in calls] == [
+            'act_1?fields=id%2Cname', 'act_2?fields=id%2Cname', 'act_3?fields=id%2Cname'
+        ]
+        return StubResponse(body=[
+            {'code': 200, 'body': json.dumps({'id': 'act_1', 'name': 'One'})},
+            None,
+            {'code': 400, 'body': json.dumps({'error': {'message': 'Unsupported get request', 'code': 100}})}
+        ])
+    stub_server.route('POST', f'{GRAPH}/', batch)
+    stub_server.route('GET', f'{GRAPH}/act_2', StubResponse(body={'id': 'act_2', 'name': 'Two'}))
+    stub_server.route('GET', f'{GRAPH}/act_3', StubResponse(400, {'error': {'message': 'Unsupported get request', 'code': 100}}))
+    integration = make_integration(stub_server)
+
+    results = integration.batch_request([('GET', f'act_{n}', {'fields': 'id,name'}) for n in (1, 2, 3)])
+
+    assert results[0] == {'id': 'act_1', 'name': 'One'}
+    assert results[1] == {'id': 'act_2', 'name': 'Two'}
+    assert 'Unsupported get request' in results[2]['error']['message']
+
+
+def test_batch_request_raises_when_responses_do_not_match_the_calls(stub_server):
+    stub_server.route('POST', f'{GRAPH}/', StubResponse(body=[{'code': 200, 'body': '{"id": "act_1"}'}]))
+    integration = make_integration(stub_server)
+
+    with pytest.raises(Exception, match='returned 1 responses for 2 calls'):
+        integration.batch_request([('GET', 'act_1', {}), ('GET', 'act_2', {})])
+
+
+def test_batch_request_takes_one_rate_limit_token_per_call(stub_server, monkeypatch):
+    class RecordingLimiter(RateLimiter):
+        def __init__(self):
+            super().__init__()
+            self.costs = []
+
+        def acquire(self, key, rate, capacity, tokens=1):
+            self.costs.append(tokens)
+            return super().acquire(key, rate, capacity, tokens)
+
+    limiter = RecordingLimiter()
+    monkeypatch.setattr(base, 'get_rate_limiter', lambda: limiter)
+    monkeypatch.setattr(FacebookAdsIntegration, 'BATCH_MAX_SIZE', 3)
+    stub_server.route('POST', f'{GRAPH}/', lambda request: StubResponse(body=[
+        {'code': 200, 'body': json.dumps({'id': call['relative_url']})}
+        for call in json.loads(request.form()['batch'])
+    ]))
+    integration = make_integration(stub_server)
+
+    results = integration.batch_request([('GET', f'act_{n}', {}) for n in range(5)])
+
+    assert [result['id'] for result in results] == [f'act_{n}' for n in range(5)]
+    assert limiter.costs == [3, 2]
@@ -0,0 +1,110 @@
+import json
+import uuid
+from datetime import datetime
+
+import pytest
+
+from src.integrations.base import AuthenticationError
+from src.integrations.google_ads import GoogleAdsIntegration, JsonArrayStreamParser
+from stub_server import StubResponse, load_fixture
+
+RECORDED_STREAM = load_fixture('google_ads_search_stream.json')
+STREAM_PATH = '/v14/customers/1234567890/googleAds:searchStream'
+
+
+def make_integration(stub_server, **config):
+    # Unique OAuth client so tokens cached by other tests are not reused
+    credentials = {
+        'client_id': f'client-{uuid.uuid4()}',
+        'client_secret': 'secret',
+        'refresh_token': 'refresh',
+        'developer_token': 'developer-token',
+        'customer_id': '123-456-7890'
+    }
+    config = dict({'api_base_url': stub_server.url, 'token_url': f'{stub_server.url}/token'}, **config)
+    stub_server.route('POST', '/token', StubResponse(body={'access_token': 'stub-token', 'expires_in': 3600}))
+    return GoogleAdsIntegration(credentials, config)
+
+
+def extract(integration, batch_size=None):
+    batches = list(integration.iter_extract(datetime(2024, 1, 1), datetime(2024, 1, 2), batch_size=batch_size))
+    return batches, [record['data'] for batch in batches for record in batch]
+
+
+def test_parser_yields_the_same_elements_for_every_split_point():
+    text = RECORDED_STREAM.decode('utf-8')
+    expected = json.loads(text)
+    for split in range(len(text) + 1):
+        parser = JsonArrayStreamParser()
+        elements = list(parser.feed(text[:split])) + list(parser.feed(text[split:]))
+        assert elements == expected, f'split at {split}'
+
+
+def test_parser_yields_each_element_once_it_is_complete():
+    parser = JsonArrayStreamParser()
+    text = RECORDED_STREAM.decode('utf-8')
+    second_start = text.index('\n,\n') + 3
+    second_end = text.rindex('}')
+
+    assert list(parser.feed(text[:second_start])) == [json.loads(text)[0]]
+    assert list(parser.feed(text[second_start:second_end])) == []
+    assert list(parser.feed(text[second_end:])) == [json.loads(text)[1]]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 7, 64, 64 * 1024])
+def test_search_stream_replay_flattens_rows_across_chunk_boundaries(stub_server, chunk_size):
+    stub_server.route('POST', STREAM_PATH, StubResponse(body=RECORDED_STREAM, chunk_size=chunk_size))
+    integration = make_integration(stub_server)
+    integration.STREAM_CHUNK_SIZE = chunk_size
+
+    batches, rows = extract(integration, batch_size=2)
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert rows == [
+        {'date': '2024-01-01', 'campaign_name': 'Brand [Exact] {EU}',
+         'impressions': 3400, 'clicks': 120, 'cost_micros': 45670000},
+        {'date': '2024-01-01', 'campaign_name': 'Winter "Sale" \\ Café – Überraschung ☃',
+         'impressions': 87, 'clicks': 0, 'cost_micros': 0},
+        {'date': '2024-01-02', 'campaign_name': 'Brand [Exact] {EU}',
+         'impressions': 2950, 'clicks': 98, 'cost_micros': 39120000},
+        {'date': '2024-01-02', 'campaign_name': 'Winter "Sale" \\ Café – Überraschung ☃',
+         'impressions': 112, 'clicks': 4, 'cost_micros': 1830000},
+        {'date': '2024-01-02', 'campaign_name': 'Emoji 🎄 ]} test',
+         'impressions': 40, 'clicks': 1, 'cost_micros': 250000},
+    ]
+
+
+def test_search_stream_sends_one_gaql_query_with_auth_headers(stub_server):
+    stub_server.route('POST', STREAM_PATH, StubResponse(body=RECORDED_STREAM, chunk_size=512))
+    integration = make_integration(stub_server)
+
+    extract(integration)
+
+    [request] = stub_server.requests_to(STREAM_PATH)
+    assert request.headers['Authorization'] == 'Bearer stub-token'
+    assert request.headers['developer-token'] == 'developer-token'
+    assert request.json() == {'query': (
+        "SELECT segments.date, campaign.name, metrics.impressions, metrics.clicks, metrics.cost_micros "
+        "FROM campaign WHERE segments.date BETWEEN '2024-01-01' AND '2024-01-02'"
+    )}
+    [token_request] = stub_server.requests_to('/token')
+    assert token_request.form()['grant_type'] == 'refresh_token'
+
+
+def test_search_stream_raises_error_messages_sent_mid_stream(stub_server):
+    first_message = json.dumps(json.loads(RECORDED_STREAM)[0])
+    error = json.dumps({'error': {'code': 429, 'message': 'Resource has been exhausted', 'status': 'RESOURCE_EXHAUSTED'}})
+    body = f'[{first_message},{error}]'.encode('utf-8')
+    stub_server.route('POST', STREAM_PATH, StubResponse(body=body, chunk_size=100))
+    integration = make_integration(stub_server)
+
+    with pytest.raises(Exception, match='Resource has been exhausted'):
+        extract(integration)
+
+
+def test_search_stream_unauthorized_raises_authentication_error(stub_server):
+    stub_server.route('POST', STREAM_PATH, StubResponse(401, {'error': {'message': 'Request had invalid authentication credentials'}}))
+    integration = make_integration(stub_server)
+
+    with pytest.raises(AuthenticationError):
+        extract(integration)
@@ -0,0 +1,212 @@
+from datetime import date
+
+import pytest
+
+import dimension_value
+import extracted_data
+import metric_rollup
+from user import db
+from extracted_data import ExtractedData
+from metric_fact import MetricFact
+from dimension_value import DimensionValue
+from metric_rollup import DailyMetricRollup, WeeklyMetricRollup, MonthlyMetricRollup
+
+
+def build_rows(data_source, extraction_job, records, data_type='campaign'):
+    rows = [
+        ExtractedData.build_row(data_source.id, extraction_job.id, data_type, record['date'], {'data': record}, record)
+        for record in records
+    ]
+    return rows, records
+
+
+def record(day, campaign, impressions, clicks, cost, conversions=0, revenue=0):
+    return {'date': day, 'campaign_name': campaign, 'impressions': impressions, 'clicks': clicks,
+            'cost': cost, 'conversions': conversions, 'revenue': revenue}
+
+
+RECORDS = [
+    record('2024-01-30', 'Brand', 1000, 50, 25.0, 2, 80.0),
+    record('2024-01-31', 'Brand', 1200, 60, 30.0, 3, 120.0),
+    record('2024-01-31', 'Generic', 800, 20, 16.0),
+    record('2024-02-01', 'Brand', 900, 45, 22.5, 1, 40.0),
+]
+
+
+def rollup_totals(model):
+    return {
+        row.period_start: (row.row_count, row.impressions, row.clicks, row.cost)
+        for row in model.query.order_by(model.period_start)
+    }
+
+
+def test_bulk_insert_creates_facts_and_rollups(data_source, extraction_job):
+    rows, processed = build_rows(data_source, extraction_job, RECORDS)
+
+    assert ExtractedData.bulk_insert(rows, processed) == 4
+    db.session.commit()
+
+    facts = {fact.id: fact for fact in MetricFact.query}
+    assert set(facts) == {row['id'] for row in rows}
+    brand = facts[rows[0]['id']]
+    assert (brand.data_date, brand.impressions, brand.clicks, brand.cost, brand.revenue) == (
+        date(2024, 1, 30), 1000, 50, 25.0, 80.0
+    )
+    assert db.session.get(DimensionValue, brand.campaign_name_key).value == 'Brand'
+    assert facts[rows[1]['id']].campaign_name_key == brand.campaign_name_key
+    assert facts[rows[2]['id']].campaign_name_key != brand.campaign_name_key
+
+    assert rollup_totals(DailyMetricRollup) == {
+        date(2024, 1, 30): (1, 1000, 50, 25.0),
+        date(2024, 1, 31): (2, 2000, 80, 46.0),
+        date(2024, 2, 1): (1, 900, 45, 22.5),
+    }
+    # 2024-01-29 is the Monday of the week
+    assert rollup_totals(WeeklyMetricRollup) == {date(2024, 1, 29): (4, 3900, 175, 93.5)}
+    assert rollup_totals(MonthlyMetricRollup) == {
+        date(2024, 1, 1): (3, 3000, 130, 71.0),
+        date(2024, 2, 1): (1, 900, 45, 22.5),
+    }
+
+
+def test_bulk_insert_skips_duplicates_on_conflict(data_source, extraction_job):
+    rows, processed = build_rows(data_source, extraction_job, RECORDS)
+    ExtractedData.bulk_insert(rows, processed)
+    db.session.commit()
+
+    # Same records extracted again get new ids but the same data_hash
+    again, processed_again = build_rows(data_source, extraction_job, RECORDS + [RECORDS[0]])
+    assert ExtractedData.bulk_insert(again, processed_again) == 0
+    db.session.commit()
+
+    assert ExtractedData.query.count() == 4
+    assert MetricFact.query.count() == 4
+    assert rollup_totals(WeeklyMetricRollup) == {date(2024, 1, 29): (4, 3900, 175, 93.5)}
+
+
+def test_bulk_insert_keeps_one_copy_of_duplicates_within_a_batch(data_source, extraction_job):
+    rows, processed = build_rows(data_source, extraction_job, [RECORDS[0], RECORDS[1], RECORDS[0]])
+
+    assert ExtractedData.bulk_insert(rows, processed) == 2
+    db.session.commit()
+
+    assert {fact.id for fact in MetricFact.query} == {rows[0]['id'], rows[1]['id']}
+    assert rollup_totals(DailyMetricRollup) == {
+        date(2024, 1, 30): (1, 1000, 50, 25.0),
+        date(2024, 1, 31): (1, 1200, 60, 30.0),
+    }
+
+
+def test_rollups_and_facts_give_the_same_aggregates(data_source, extraction_job):
+    rows, processed = build_rows(data_source, extraction_job, RECORDS)
+    ExtractedData.bulk_insert(rows, processed)
+    db.session.commit()
+    metrics = ['impressions', 'clicks', 'cost', 'revenue', 'ctr', 'roas']
+
+    from_rollups = ExtractedData.aggregate_metrics_by_date([data_source.id], '2024-01-30', '2024-02-01', metrics)
+    from_facts = ExtractedData.aggregate_metrics_by_date(
+        [data_source.id], '2024-01-30', '2024-02-01', metrics, filters={'campaign_name': ['Brand', 'Generic']}
+    )
+    from_json = {
+        day: {metric: values[metric] for metric in metrics}
+        for day, values in ExtractedData.aggregate_metrics_by_date(
+            [data_source.id], '2024-01-30', '2024-02-01', metrics + ['frequency']
+        ).items()
+    }
+
+    assert from_rollups == from_facts == from_json
+    assert from_rollups['2024-01-31'] == {
+        'impressions': 2000, 'clicks': 80, 'cost': 46, 'revenue': 120, 'ctr': 4, 'roas': 2.61
+    }
+    assert ExtractedData.aggregate_metrics_by_date(
+        [data_source.id], '2024-01-30', '2024-02-01', ['clicks'], filters={'campaign_name': 'Generic'}
+    ) == {'2024-01-31': {'clicks': 20}}
+
+
+def test_weekly_and_monthly_aggregates_combine_rollup_grains(data_source, extraction_job):
+    rows, processed = build_rows(data_source, extraction_job, RECORDS)
+    ExtractedData.bulk_insert(rows, processed)
+    db.session.commit()
+
+    assert ExtractedData.aggregate_metrics_by_date(
+        [data_source.id], '2024-01-01', '2024-02-29', ['impressions'], granularity='month'
+    ) == {'2024-01-01': {'impressions': 3000}, '2024-02-01': {'impressions': 900}}
+    assert ExtractedData.aggregate_metrics_by_date(
+        [data_source.id], '2024-01-31', '2024-02-04', ['impressions'], granularity='week'
+    ) == {'2024-01-29': {'impressions': 2900}}
+
+
+def test_delete_date_range_removes_facts_and_subtracts_rollups(data_source, extraction_job):
+    rows, processed = build_rows(data_source, extraction_job, RECORDS)
+    ExtractedData.bulk_insert(rows, processed)
+    db.session.commit()
+
+    assert ExtractedData.delete_date_range(data_source.id, 'campaign', date(2024, 1, 31), date(2024, 1, 31)) == 2
+    db.session.commit()
+
+    assert MetricFact.query.count() == 2
+    assert rollup_totals(DailyMetricRollup) == {
+        date(2024, 1, 30): (1, 1000, 50, 25.0),
+        date(2024, 2, 1): (1, 900, 45, 22.5),
+    }
+    assert rollup_totals(WeeklyMetricRollup) == {date(2024, 1, 29): (2, 1900, 95, 47.5)}
+
+
+def test_filters_on_dimensions_facts_do_not_store_use_processed_data(data_source, extraction_job):
+    records = [dict(RECORDS[0], placement='feed'), dict(RECORDS[1], placement='stories')]
+    rows, processed = build_rows(data_source, extraction_job, records)
+    ExtractedData.bulk_insert(rows, processed)
+    db.session.commit()
+
+    assert ExtractedData.aggregate_metrics_by_date(
+        [data_source.id], '2024-01-30', '2024-01-31', ['clicks'], filters={'placement': 'stories'}
+    ) == {'2024-01-31': {'clicks': 60}}
+    with pytest.raises(ValueError, match='placement'):
+        MetricFact.dimension_filter_clauses([data_source.id], {'placement': 'stories'})
+
+
+def test_bulk_insert_skips_duplicates_without_on_conflict_support(data_source, extraction_job, monkeypatch):
+    for module in (extracted_data, metric_rollup, dimension_value):
+        monkeypatch.setattr(module, 'dialect_insert', lambda table: None)
+    rows, processed = build_rows(data_source, extraction_job, RECORDS + [RECORDS[0]])
+    assert ExtractedData.bulk_insert(rows, processed) == 4
+    db.session.commit()
+
+    again, processed_again = build_rows(data_source, extraction_job, RECORDS)
+    assert ExtractedData.bulk_insert(again, processed_again) == 0
+    db.session.commit()
+
+    assert ExtractedData.query.count() == 4
+    assert MetricFact.query.count() == 4
+    assert rollup_totals(WeeklyMetricRollup) == {date(2024, 1, 29): (4, 3900, 175, 93.5)}
+
+
+def test_aggregates_count_one_data_type(data_source, extraction_job):
+    campaign_rows, campaign_processed = build_rows(data_source, extraction_job, RECORDS[:2])
+    ad_group_records = [dict(RECORDS[0], ad_group_name='Exact', clicks=30), dict(RECORDS[0], ad_group_name='Phrase', clicks=20)]
+    ad_group_rows, ad_group_processed = build_rows(data_source, extraction_job, ad_group_records, data_type='ad_group')
+    ExtractedData.bulk_insert(campaign_rows + ad_group_rows, campaign_processed + ad_group_processed)
+    db.session.commit()
+
+    for filters in (None, {'campaign_name': 'Brand'}):
+        assert ExtractedData.aggregate_metrics_by_date(
+            [data_source.id], '2024-01-30', '2024-01-31', ['clicks'], filters=filters
+        ) == {'2024-01-30': {'clicks': 50}, '2024-01-31': {'clicks': 60}}
+        assert ExtractedData.aggregate_metrics_by_date(
+            [data_source.id], '2024-01-30', '2024-01-31', ['clicks'], filters=filters, data_type='ad_group'
+        ) == {'2024-01-30': {'clicks': 50}}
+    assert ExtractedData.aggregate_metrics_by_date(
+        [data_source.id], '2024-01-01', '2024-01-31', ['clicks'], granularity='month', data_type='ad_group'
+    ) == {'2024-01-01': {'clicks': 50}}
+
+
+def test_rollup_periods_follow_the_grain():
+    day = date(2024, 2, 14)
+
+    assert (DailyMetricRollup.period_start_of(day), DailyMetricRollup.period_end_of(day)) == (day, day)
+    assert (WeeklyMetricRollup.period_start_of(day), WeeklyMetricRollup.period_end_of(day)) == (
+        date(2024, 2, 12), date(2024, 2, 18)
+    )
+    assert (MonthlyMetricRollup.period_start_of(day), MonthlyMetricRollup.period_end_of(day)) == (
+        date(2024, 2, 1), date(2024, 2, 29)
+    )
@@ -0,0 +1,54 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from src.integrations.base import MockIntegration
+
+METRICS = ['impressions', 'clicks', 'cost', 'conversions', 'revenue']
+DIMENSIONS = ['date', 'campaign_name', 'device']
+
+
+@pytest.fixture(autouse=True)
+def small_generation_chunks(monkeypatch):
+    # 30 days x 4 campaigns x 3 devices spans several generation chunks
+    monkeypatch.setattr(MockIntegration, 'GENERATION_CHUNK_SIZE', 50)
+
+
+def generate(seed, batch_size):
+    integration = MockIntegration('mock', {'api_key': 'test'}, {'seed': seed})
+    batches = list(integration.iter_columns(datetime(2024, 1, 1), datetime(2024, 1, 30), METRICS, DIMENSIONS,
+                                            batch_size=batch_size))
+    assert all(len(batch['date']) <= batch_size for batch in batches)
+    return {name: np.concatenate([batch[name] for batch in batches]) for name in batches[0]}
+
+
+def assert_same_columns(first, second):
+    assert list(first) == list(second)
+    for name in first:
+        assert np.array_equal(first[name], second[name]), name
+
+
+def test_seeded_output_does_not_depend_on_the_batch_size():
+    reference = generate(seed=7, batch_size=1000)
+
+    assert len(reference['date']) == 360
+    for batch_size in (1, 7, 50, 64, 359):
+        assert_same_columns(generate(seed=7, batch_size=batch_size), reference)
+
+
+def test_seeded_output_is_the_same_on_every_run():
+    assert_same_columns(generate(seed=7, batch_size=64), generate(seed=7, batch_size=64))
+    records = [
+        MockIntegration('mock', {'api_key': 'test'}, {'seed': 7}).extract_data(
+            datetime(2024, 1, 1), datetime(2024, 1, 3), METRICS, DIMENSIONS)
+        for _ in range(2)
+    ]
+    assert [record['data'] for record in records[0]] == [record['data'] for record in records[1]]
+
+
+def test_different_seeds_give_different_data():
+    first, second = generate(seed=7, batch_size=64), generate(seed=8, batch_size=64)
+
+    assert np.array_equal(first['date'], second['date'])
+    assert not np.array_equal(first['impressions'], second['impressions'])
@@ -0,0 +1,60 @@
+from src.integrations.normalization import compile_plan, normalize_batch
+from src.integrations.record_batch import RecordBatch
+
+
+def test_plans_are_compiled_once_per_platform_and_columns():
+    compile_plan.cache_clear()
+
+    first = compile_plan('google_ads', ('date', 'cost_micros', 'clicks'))
+    second = compile_plan('google_ads', ('date', 'cost_micros', 'clicks'))
+    other_columns = compile_plan('google_ads', ('date', 'cost_micros'))
+    other_platform = compile_plan('facebook_ads', ('date', 'cost_micros', 'clicks'))
+
+    assert first is second
+    assert other_columns is not first
+    assert other_platform.renames == []
+    assert compile_plan.cache_info().hits == 1
+
+
+def test_batches_share_the_cached_plan():
+    compile_plan.cache_clear()
+
+    for _ in range(3):
+        normalize_batch(RecordBatch('google_ads', {'date': ['2024-01-01'], 'cost_micros': [1500000]}))
+
+    assert compile_plan.cache_info().misses == 1
+    assert compile_plan.cache_info().hits == 2
+
+
+def test_fields_are_renamed_in_place_and_units_converted():
+    batch = RecordBatch('google_ads', {
+        'date': ['2024-01-01', '2024-01-02'],
+        'cost_micros': [1500000, 250000],
+        'conversions_value': [10.0, 0.0],
+        'clicks': [3, 1]
+    })
+
+    normalize_batch(batch)
+
+    assert batch.column_names == ['date', 'cost', 'revenue', 'clicks']
+    assert batch.column('cost') == [1.5, 0.25]
+    assert batch.column('revenue') == [10.0, 0.0]
+
+
+def test_missing_values_stay_missing_when_scaled():
+    batch = normalize_batch(RecordBatch('google_ads', {'cost_micros': [1000000, None]}))
+
+    assert batch.column('cost') == [1.0, None]
+
+
+def test_canonical_column_returned_by_the_platform_is_not_overwritten():
+    batch = normalize_batch(RecordBatch('facebook_ads', {'spend': [5.0], 'cost': [7.0]}))
+
+    assert batch.column_names == ['spend', 'cost']
+    assert batch.column('cost') == [7.0]
+
+
+def test_unknown_platforms_are_left_alone():
+    batch = normalize_batch(RecordBatch('bing_ads', {'cost_micros': [1000000]}))
+
+    assert batch.columns == {'cost_micros': [1000000]}
@@ -0,0 +1,59 @@
+from datetime import date
+
+from user import db
+from extracted_data import ExtractedData
+from metric_fact import MetricFact
+from metric_rollup import DailyMetricRollup, WeeklyMetricRollup, MonthlyMetricRollup
+from partitioning import ExtractedDataPartitions
+
+
+def store(data_source, extraction_job, days):
+    rows = []
+    processed = []
+    for day in days:
+        record = {'date': day, 'campaign_name': 'Brand', 'impressions': 100, 'clicks': 10}
+        rows.append(ExtractedData.build_row(data_source.id, extraction_job.id, 'campaign', day, record, record))
+        processed.append(record)
+    ExtractedData.bulk_insert(rows, processed)
+    db.session.commit()
+
+
+def test_primary_key_is_the_id_unless_partitioning_is_configured():
+    assert [column.name for column in ExtractedData.__table__.primary_key] == ['id']
+
+
+def test_dropping_expired_partitions_prunes_facts_and_rollups(data_source, extraction_job, monkeypatch):
+    # 2024-02-01 is a Thursday, so the week of 2024-01-29 straddles the cutoff
+    store(data_source, extraction_job, ['2024-01-15', '2024-01-30', '2024-01-31', '2024-02-01', '2024-02-02'])
+    monkeypatch.setattr(ExtractedDataPartitions, 'is_enabled', classmethod(lambda cls: True))
+    monkeypatch.setattr(ExtractedDataPartitions, 'list_partitions', classmethod(lambda cls: [
+        ('extracted_data_p2024_01', date(2024, 1, 1), date(2024, 2, 1)),
+        ('extracted_data_p2024_02', date(2024, 2, 1), date(2024, 3, 1)),
+    ]))
+
+    dropped = ExtractedDataPartitions.drop_expired_partitions(retention_months=1, today=date(2024, 2, 15))
+
+    assert dropped == ['extracted_data_p2024_01']
+    assert sorted(fact.data_date for fact in MetricFact.query) == [date(2024, 2, 1), date(2024, 2, 2)]
+    assert [row.period_start for row in DailyMetricRollup.query.order_by(DailyMetricRollup.period_start)] == [
+        date(2024, 2, 1), date(2024, 2, 2)
+    ]
+    assert [(row.period_start, row.row_count, row.clicks) for row in WeeklyMetricRollup.query] == [
+        (date(2024, 1, 29), 2, 20)
+    ]
+    assert [(row.period_start, row.row_count) for row in MonthlyMetricRollup.query] == [(date(2024, 2, 1), 2)]
+    assert ExtractedData.aggregate_metrics_by_date(
+        [data_source.id], '2024-01-29', '2024-02-04', ['clicks'], granularity='week'
+    ) == {'2024-01-29': {'clicks': 20}}
+
+
+def test_nothing_is_pruned_when_no_partition_expired(data_source, extraction_job, monkeypatch):
+    store(data_source, extraction_job, ['2024-01-30', '2024-02-01'])
+    monkeypatch.setattr(ExtractedDataPartitions, 'is_enabled', classmethod(lambda cls: True))
+    monkeypatch.setattr(ExtractedDataPartitions, 'list_partitions', classmethod(lambda cls: [
+        ('extracted_data_p2024_01', date(2024, 1, 1), date(2024, 2, 1)),
+    ]))
+
+    assert ExtractedDataPartitions.drop_expired_partitions(retention_months=2, today=date(2024, 2, 15)) == []
+    assert MetricFact.query.count() == 2
+    assert WeeklyMetricRollup.query.one().row_count == 2
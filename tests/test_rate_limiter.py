@@ -0,0 +1,103 @@
+import multiprocessing
+
+import pytest
+
+from src.integrations import rate_limiter
+from src.integrations.rate_limiter import RateLimiter, FileBucketStore
+
+
+class FakeClock:
+    """Stands in for the time module; sleeping advances the clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, 'time', clock)
+    return clock
+
+
+def test_full_bucket_allows_a_burst_then_waits_for_refill(clock):
+    limiter = RateLimiter()
+
+    assert [limiter.acquire('ads:1', rate=1, capacity=5) for _ in range(5)] == [0, 0, 0, 0, 0]
+    assert limiter.acquire('ads:1', rate=1, capacity=5) == pytest.approx(1.0)
+
+
+def test_bucket_refills_at_its_rate_up_to_its_capacity(clock):
+    limiter = RateLimiter()
+    for _ in range(4):
+        limiter.acquire('ads:1', rate=2, capacity=4)
+
+    clock.sleep(1.25)
+    assert [limiter.acquire('ads:1', rate=2, capacity=4) for _ in range(2)] == [0, 0]
+    assert limiter.acquire('ads:1', rate=2, capacity=4) == pytest.approx(0.25)
+
+    clock.sleep(100)
+    assert [limiter.acquire('ads:1', rate=2, capacity=4) for _ in range(4)] == [0, 0, 0, 0]
+    assert limiter.acquire('ads:1', rate=2, capacity=4) == pytest.approx(0.5)
+
+
+def test_buckets_are_independent_per_key(clock):
+    limiter = RateLimiter()
+    limiter.acquire('ads:1', rate=1, capacity=1)
+
+    assert limiter.acquire('ads:2', rate=1, capacity=1) == 0
+    assert limiter.acquire('ads:1', rate=1, capacity=1) == pytest.approx(1.0)
+
+
+def test_requests_can_cost_several_tokens(clock):
+    limiter = RateLimiter()
+
+    assert limiter.acquire('ads:1', rate=10, capacity=10, tokens=5) == 0
+    assert limiter.acquire('ads:1', rate=10, capacity=10, tokens=5) == 0
+    assert limiter.acquire('ads:1', rate=10, capacity=10, tokens=5) == pytest.approx(0.5)
+
+
+def test_request_costing_more_than_the_capacity_leaves_the_bucket_in_debt(clock):
+    limiter = RateLimiter()
+
+    assert limiter.acquire('ads:1', rate=10, capacity=10, tokens=30) == 0
+    assert limiter.acquire('ads:1', rate=10, capacity=10) == pytest.approx(2.1)
+
+
+def test_penalized_bucket_waits_out_the_penalty(clock):
+    limiter = RateLimiter()
+    limiter.penalize('ads:1', 30)
+
+    assert limiter.acquire('ads:1', rate=100, capacity=10) >= 30
+
+
+def take_without_waiting(directory, attempts, results):
+    limiter = RateLimiter(store=FileBucketStore(directory))
+    taken = 0
+    for _ in range(attempts):
+        if limiter.store.update('ads:1', lambda state: limiter._take(state, 0.001, 20)) == 0:
+            taken += 1
+    results.put(taken)
+
+
+def test_file_store_shares_tokens_between_processes(tmp_path):
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    processes = [
+        context.Process(target=take_without_waiting, args=(str(tmp_path), 15, results))
+        for _ in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=30)
+
+    # Four processes asking for 60 tokens only get the 20 the shared bucket holds
+    assert sum(results.get(timeout=5) for _ in processes) == 20
+    assert all(process.exitcode == 0 for process in processes)
@@ -0,0 +1,37 @@
+import json
+import zlib
+from datetime import date
+
+from user import db
+from extracted_data import ExtractedData
+
+RAW = {'platform': 'google_ads', 'data': {'campaign_name': 'Café', 'impressions': 5}}
+
+
+def test_raw_data_round_trips_through_the_compressed_column(data_source, extraction_job):
+    row = ExtractedData(data_source.id, extraction_job.id, 'campaign', date(2024, 1, 1), RAW, RAW['data'])
+    db.session.add(row)
+    db.session.commit()
+    db.session.expire_all()
+
+    stored = ExtractedData.query.filter_by(id=row.id).one()
+    assert stored.raw_data[:1] == ExtractedData.RAW_DATA_CODEC_DEFLATE_DICT
+    assert stored.get_raw_data() == RAW
+
+
+def test_legacy_json_text_still_decodes():
+    legacy = json.dumps(RAW, sort_keys=True)
+
+    # As read from a text column, and from a column converted to binary
+    assert ExtractedData.decode_raw_data(legacy) == RAW
+    assert ExtractedData.decode_raw_data(legacy.encode('utf-8')) == RAW
+    assert ExtractedData.decode_raw_data(memoryview(legacy.encode('utf-8'))) == RAW
+
+
+def test_every_codec_decodes():
+    payload = json.dumps(RAW).encode('utf-8')
+
+    assert ExtractedData.decode_raw_data(ExtractedData.RAW_DATA_CODEC_JSON + payload) == RAW
+    assert ExtractedData.decode_raw_data(ExtractedData.RAW_DATA_CODEC_ZLIB + zlib.compress(payload)) == RAW
+    assert ExtractedData.decode_raw_data(ExtractedData.encode_raw_data(RAW)) == RAW
+    assert ExtractedData.decode_raw_data(None) == {}
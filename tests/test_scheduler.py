@@ -0,0 +1,128 @@
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+# scheduler.py builds the app from main at import time; keep it off disk
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+import scheduler
+from user import db
+from data_source import DataSource, ExtractionJob
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def next_run(data_source, schedule_config, after):
+    data_source.set_schedule_config(schedule_config)
+    return data_source.compute_next_extraction_at(after)
+
+
+def test_daily_runs_at_the_configured_time(data_source):
+    config = {'frequency': 'daily', 'time': '06:30'}
+
+    assert next_run(data_source, config, utc(2024, 3, 10, 5, 0)) == utc(2024, 3, 10, 6, 30)
+    assert next_run(data_source, config, utc(2024, 3, 10, 6, 30)) == utc(2024, 3, 11, 6, 30)
+    assert next_run(data_source, config, utc(2024, 12, 31, 23, 0)) == utc(2025, 1, 1, 6, 30)
+
+
+def test_weekly_day_of_week_counts_from_sunday(data_source):
+    # 2024-03-13 is a Wednesday
+    assert next_run(data_source, {'frequency': 'weekly', 'day_of_week': 0, 'time': '08:00'},
+                    utc(2024, 3, 13, 12, 0)) == utc(2024, 3, 17, 8, 0)
+    assert next_run(data_source, {'frequency': 'weekly', 'day_of_week': 1, 'time': '08:00'},
+                    utc(2024, 3, 13, 12, 0)) == utc(2024, 3, 18, 8, 0)
+    assert next_run(data_source, {'frequency': 'weekly', 'day_of_week': 0, 'time': '08:00'},
+                    utc(2024, 3, 17, 9, 0)) == utc(2024, 3, 24, 8, 0)
+    assert next_run(data_source, {'frequency': 'weekly', 'day_of_week': 3, 'time': '13:00'},
+                    utc(2024, 3, 13, 12, 0)) == utc(2024, 3, 13, 13, 0)
+
+
+def test_monthly_day_is_clamped_to_short_months(data_source):
+    config = {'frequency': 'monthly', 'day_of_month': 31, 'time': '00:00'}
+
+    assert next_run(data_source, config, utc(2024, 2, 1)) == utc(2024, 2, 29)
+    assert next_run(data_source, config, utc(2023, 2, 1)) == utc(2023, 2, 28)
+    assert next_run(data_source, config, utc(2024, 2, 29, 1, 0)) == utc(2024, 3, 31)
+    assert next_run(data_source, config, utc(2024, 4, 30, 1, 0)) == utc(2024, 5, 31)
+    assert next_run(data_source, config, utc(2024, 12, 31, 1, 0)) == utc(2025, 1, 31)
+
+
+def test_time_is_local_to_the_configured_timezone(data_source):
+    config = {'frequency': 'daily', 'time': '09:00', 'timezone': 'America/New_York'}
+
+    assert next_run(data_source, config, utc(2024, 1, 15, 12, 0)) == utc(2024, 1, 15, 14, 0)
+    # Daylight saving time starts in New York on 2024-03-10
+    assert next_run(data_source, config, utc(2024, 3, 10, 12, 0)) == utc(2024, 3, 10, 13, 0)
+    # 01:00 UTC is still the previous evening in New York
+    assert next_run(data_source, config, utc(2024, 3, 12, 1, 0)) == utc(2024, 3, 12, 13, 0)
+
+
+def test_unscheduled_sources_have_no_next_run(data_source):
+    assert next_run(data_source, {'frequency': 'manual'}, utc(2024, 1, 1)) is None
+    assert next_run(data_source, {'frequency': 'daily', 'enabled': False}, utc(2024, 1, 1)) is None
+    assert next_run(data_source, {}, utc(2024, 1, 1)) is None
+
+
+def test_jitter_stays_within_its_bounds(data_source):
+    data_source.set_schedule_config({'frequency': 'daily', 'time': '06:00', 'jitter_seconds': 600})
+    scheduled = utc(2024, 3, 11, 6, 0)
+
+    runs = [data_source.get_next_extraction_at(utc(2024, 3, 10, 12, 0)) for _ in range(200)]
+
+    assert all(scheduled <= run <= scheduled + timedelta(seconds=600) for run in runs)
+    assert len(set(runs)) > 1
+
+    data_source.set_schedule_config({'frequency': 'daily', 'time': '06:00', 'jitter_seconds': 0})
+    assert data_source.get_next_extraction_at(utc(2024, 3, 10, 12, 0)) == scheduled
+
+
+@pytest.fixture
+def due_source(app, data_source, monkeypatch):
+    monkeypatch.setattr(scheduler, 'app', app)
+    data_source.set_schedule_config({'frequency': 'daily', 'time': '06:00', 'jitter_seconds': 0})
+    data_source.next_extraction_at = datetime.now(timezone.utc) - timedelta(minutes=1)
+    db.session.commit()
+    return data_source
+
+
+def test_run_once_queues_a_job_and_reschedules_the_source(due_source):
+    handled = scheduler.ExtractionScheduler(poll_interval=1, batch_size=10).run_once()
+
+    assert handled == 1
+    job = ExtractionJob.query.filter_by(data_source_id=due_source.id).one()
+    assert job.status == 'queued'
+    assert job.job_type == 'scheduled'
+    db.session.expire_all()
+    assert db.session.get(DataSource, due_source.id).next_extraction_at.replace(tzinfo=timezone.utc) > \
+        datetime.now(timezone.utc)
+    assert scheduler.ExtractionScheduler(poll_interval=1, batch_size=10).run_once() == 0
+
+
+def test_only_one_of_two_racing_schedulers_claims_a_run(due_source, monkeypatch):
+    # Both schedulers read the due source before either advances it
+    barrier = threading.Barrier(2, timeout=5)
+    get_next_extraction_at = DataSource.get_next_extraction_at
+
+    def wait_for_other_scheduler(self, after=None):
+        barrier.wait()
+        return get_next_extraction_at(self, after)
+
+    monkeypatch.setattr(DataSource, 'get_next_extraction_at', wait_for_other_scheduler)
+    claimed = []
+    monkeypatch.setattr(scheduler.ExtractionScheduler, '_enqueue',
+                        lambda self, data_source, now: claimed.append(data_source.id))
+    schedulers = [scheduler.ExtractionScheduler(poll_interval=1, batch_size=10) for _ in range(2)]
+    handled = []
+
+    threads = [threading.Thread(target=lambda s=s: handled.append(s.run_once())) for s in schedulers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert handled == [1, 1]
+    assert claimed == [due_source.id]
@@ -0,0 +1,124 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.integrations import token_cache
+from src.integrations.token_cache import AccessTokenCache, FileTokenStore
+from src.integrations.google_ads import GoogleAdsIntegration
+from src.integrations.base import AuthenticationError
+from stub_server import StubResponse
+
+
+class FakeDatetime:
+    """Stands in for datetime in token_cache with a clock the test moves"""
+
+    current = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    FakeDatetime.current = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    monkeypatch.setattr(token_cache, 'datetime', FakeDatetime)
+    return FakeDatetime
+
+
+class TokenEndpoint:
+    """fetch callable handing out numbered tokens"""
+
+    def __init__(self, expires_in=3600, delay=0):
+        self.expires_in = expires_in
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self):
+        time.sleep(self.delay)
+        self.calls += 1
+        return f'token-{self.calls}', self.expires_in
+
+
+def test_token_is_reused_until_the_expiry_margin(clock):
+    cache = AccessTokenCache(expiry_margin=60)
+    fetch = TokenEndpoint(expires_in=3600)
+
+    assert cache.get_token('key', fetch) == 'token-1'
+    clock.current += timedelta(seconds=3539)
+    assert cache.get_token('key', fetch) == 'token-1'
+    clock.current += timedelta(seconds=1)
+    assert cache.get_token('key', fetch) == 'token-2'
+    assert fetch.calls == 2
+
+
+def test_invalidated_token_is_fetched_again(clock):
+    cache = AccessTokenCache()
+    fetch = TokenEndpoint()
+    cache.get_token('key', fetch)
+
+    cache.invalidate('key')
+
+    assert cache.get_token('key', fetch) == 'token-2'
+
+
+def test_failed_fetch_is_not_cached(clock):
+    cache = AccessTokenCache()
+    responses = iter([(None, 0), ('token', 3600)])
+
+    assert cache.get_token('key', lambda: next(responses)) is None
+    assert cache.get_token('key', lambda: next(responses)) == 'token'
+
+
+def test_concurrent_callers_fetch_a_token_once():
+    cache = AccessTokenCache()
+    fetch = TokenEndpoint(delay=0.05)
+    tokens = []
+
+    threads = [threading.Thread(target=lambda: tokens.append(cache.get_token('key', fetch))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert tokens == ['token-1'] * 8
+    assert fetch.calls == 1
+
+
+def test_file_store_shares_tokens_between_caches(tmp_path, clock):
+    first = AccessTokenCache(shared_store=FileTokenStore(str(tmp_path)))
+    second = AccessTokenCache(shared_store=FileTokenStore(str(tmp_path)))
+    fetch = TokenEndpoint()
+
+    assert first.get_token('key', fetch) == 'token-1'
+    assert second.get_token('key', fetch) == 'token-1'
+    assert fetch.calls == 1
+
+    # An expired shared entry is refreshed instead of reused
+    clock.current += timedelta(hours=1)
+    assert second.get_token('key', fetch) == 'token-2'
+    assert first.get_token('key', fetch) == 'token-2'
+
+    second.invalidate('key')
+    assert FileTokenStore(str(tmp_path)).get('key') is None
+
+
+def test_google_ads_drops_a_rejected_token(stub_server):
+    credentials = {'client_id': 'client-rejected', 'client_secret': 'secret', 'refresh_token': 'refresh',
+                   'developer_token': 'developer-token', 'customer_id': '123-456-7890'}
+    tokens = iter(['revoked-token', 'fresh-token'])
+    stub_server.route('POST', '/token',
+                      lambda request: StubResponse(body={'access_token': next(tokens), 'expires_in': 3600}))
+    stub_server.route('POST', '/v14/customers/1234567890/googleAds:searchStream',
+                      StubResponse(401, {'error': {'code': 401, 'message': 'Request had invalid authentication'}}))
+    integration = GoogleAdsIntegration(credentials, {'api_base_url': stub_server.url,
+                                                     'token_url': f'{stub_server.url}/token'})
+    token_cache.get_token_cache().invalidate(integration._get_token_cache_key())
+
+    with pytest.raises(AuthenticationError):
+        list(integration.iter_extract(datetime(2024, 1, 1), datetime(2024, 1, 2)))
+
+    assert integration._get_access_token() == 'fresh-token'
+    assert len(stub_server.requests_to('/token')) == 2
@@ -0,0 +1,174 @@
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Callable, Tuple
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+class MemoryTokenStore:
+    """Token store that only lives in the current process"""
+    
+    def __init__(self):
+        self._tokens = {}
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._tokens.get(key)
+    
+    def set(self, key: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._tokens[key] = entry
+    
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._tokens.pop(key, None)
+
+
+class FileTokenStore:
+    """
+    Token store shared by every process on the host through a directory
+    
+    Each token is written to its own file with an atomic rename, so
+    readers never see a partial write. Files are only readable by the
+    owner since they contain live access tokens.
+    """
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.json')
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key)) as token_file:
+                return json.load(token_file)
+        except (OSError, ValueError):
+            return None
+    
+    def set(self, key: str, entry: Dict[str, Any]) -> None:
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.token-')
+            with os.fdopen(fd, 'w') as token_file:
+                json.dump(entry, token_file)
+            os.replace(temp_path, self._path(key))
+        except OSError as e:
+            logger.warning(f"Failed to write shared token cache entry: {str(e)}")
+    
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+
+class AccessTokenCache:
+    """
+    Process-wide cache for OAuth access tokens
+    
+    Tokens are kept in memory and, when a shared store is configured, in a
+    store visible to every worker process. A token is reused until
+    expiry_margin seconds before its expires_in runs out.
+    """
+    
+    def __init__(self, shared_store=None, expiry_margin: int = 60):
+        """
+        Initialize the cache
+        
+        Args:
+            shared_store: Optional store shared across processes (e.g. FileTokenStore)
+            expiry_margin: Seconds before expiry at which a token is refreshed
+        """
+        self.memory_store = MemoryTokenStore()
+        self.shared_store = shared_store
+        self.expiry_margin = expiry_margin
+        self._key_locks = {}
+        self._locks_lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        """Build a cache key from credential parts without keeping secrets in clear"""
+        return hashlib.sha256(':'.join(str(part) for part in parts).encode()).hexdigest()
+    
+    def get_token(self, key: str, fetch: Callable[[], Tuple[Optional[str], int]]) -> Optional[str]:
+        """
+        Return a cached access token, fetching a new one when needed
+        
+        Args:
+            key: Cache key for the credential
+            fetch: Callable returning (access_token, expires_in_seconds)
+        
+        Returns:
+            Access token, or None if fetching failed
+        """
+        token = self._get_valid(key)
+        if token:
+            return token
+        
+        # Only one thread per key hits the token endpoint at a time
+        with self._get_key_lock(key):
+            token = self._get_valid(key)
+            if token:
+                return token
+            
+            access_token, expires_in = fetch()
+            if not access_token:
+                return None
+            
+            entry = {
+                'access_token': access_token,
+                'expires_at': datetime.now(timezone.utc).timestamp() + int(expires_in or 0)
+            }
+            self.memory_store.set(key, entry)
+            if self.shared_store:
+                self.shared_store.set(key, entry)
+            return access_token
+    
+    def invalidate(self, key: str) -> None:
+        """Drop a token, e.g. after the API rejected it"""
+        self.memory_store.delete(key)
+        if self.shared_store:
+            self.shared_store.delete(key)
+    
+    def _get_valid(self, key: str) -> Optional[str]:
+        """Return an unexpired token from memory or the shared store"""
+        now = datetime.now(timezone.utc).timestamp()
+        entry = self.memory_store.get(key)
+        if entry and entry['expires_at'] - self.expiry_margin > now:
+            return entry['access_token']
+        
+        if self.shared_store:
+            entry = self.shared_store.get(key)
+            if entry and entry.get('expires_at', 0) - self.expiry_margin > now:
+                self.memory_store.set(key, entry)
+                return entry['access_token']
+        
+        return None
+    
+    def _get_key_lock(self, key: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+
+_token_cache = None
+_token_cache_lock = threading.Lock()
+
+def get_token_cache() -> AccessTokenCache:
+    """
+    Return the process-wide access token cache
+    
+    Set TOKEN_CACHE_DIR to share tokens between all worker processes on
+    the host.
+    """
+    global _token_cache
+    with _token_cache_lock:
+        if _token_cache is None:
+            cache_dir = os.getenv('TOKEN_CACHE_DIR')
+            _token_cache = AccessTokenCache(shared_store=FileTokenStore(cache_dir) if cache_dir else None)
+        return _token_cache
@@ -7,6 +7,23 @@ import json
 
 db = SQLAlchemy()
 
+def dialect_insert(table):
+    """
+    INSERT statement for table that supports ON CONFLICT, or None
+    
+    Returns the PostgreSQL or SQLite insert() of the current session's
+    database. Other databases have no ON CONFLICT clause, and callers fall
+    back to checking for existing rows themselves.
+    """
+    dialect_name = db.session.get_bind().dialect.name
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert(table)
+
 class User(db.Model):
     __tablename__ = 'users'
     
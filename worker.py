@@ -0,0 +1,123 @@
+"""
+Extraction worker process
+
+Claims queued ExtractionJob rows from the database and runs them outside
+the web server, so slow platform APIs never block gunicorn workers. Start
+as many worker processes as needed with:
+    
+    python worker.py
+"""
+
+import os
+import signal
+import socket
+import threading
+import logging
+import uuid
+
+from main import app
+from user import db
+from data_source import ExtractionJob
+from data_extraction import DataExtractionService
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionWorker:
+    """Polls the extraction job queue and runs claimed jobs one at a time"""
+    
+    def __init__(self,
+                 worker_id: str = None,
+                 poll_interval: float = None,
+                 lease_seconds: int = None,
+                 heartbeat_interval: float = None):
+        """
+        Initialize the worker
+        
+        Args:
+            worker_id: Identifier recorded on claimed jobs
+            poll_interval: Seconds to wait when the queue is empty
+            lease_seconds: How long a claim stays valid without a heartbeat
+            heartbeat_interval: Seconds between lease renewals while a job runs
+        """
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.poll_interval = poll_interval or float(os.getenv('WORKER_POLL_INTERVAL', 5))
+        self.lease_seconds = lease_seconds or int(os.getenv('WORKER_LEASE_SECONDS', 300))
+        self.heartbeat_interval = heartbeat_interval or float(os.getenv('WORKER_HEARTBEAT_INTERVAL', 60))
+        self.service = DataExtractionService()
+        self._stop_event = threading.Event()
+    
+    def run_forever(self):
+        """Process jobs until stop() is called"""
+        logger.info(f"Extraction worker {self.worker_id} started")
+        while not self._stop_event.is_set():
+            try:
+                if not self.run_once():
+                    self._stop_event.wait(self.poll_interval)
+            except Exception as e:
+                logger.error(f"Extraction worker {self.worker_id} error: {str(e)}")
+                self._stop_event.wait(self.poll_interval)
+        logger.info(f"Extraction worker {self.worker_id} stopped")
+    
+    def run_once(self) -> bool:
+        """
+        Claim and run a single job
+        
+        Returns:
+            True if a job was processed, False if the queue was empty
+        """
+        with app.app_context():
+            try:
+                ExtractionJob.fail_abandoned_jobs()
+                job = ExtractionJob.claim_next(self.worker_id, self.lease_seconds)
+            except Exception:
+                db.session.rollback()
+                raise
+            
+            if not job:
+                return False
+            
+            job_id = job.id
+            logger.info(f"Worker {self.worker_id} claimed job {job_id} (attempt {job.attempts})")
+            
+            heartbeat_stop = threading.Event()
+            heartbeat = threading.Thread(target=self._heartbeat_loop, args=(job_id, heartbeat_stop), daemon=True)
+            heartbeat.start()
+            try:
+                result = self.service.run_extraction_job(job_id)
+            finally:
+                heartbeat_stop.set()
+                heartbeat.join()
+            
+            if result.get('success'):
+                logger.info(f"Job {job_id} completed with {result.get('records_count', 0)} records")
+            else:
+                logger.error(f"Job {job_id} failed: {result.get('error')}")
+            return True
+    
+    def stop(self, *args):
+        """Ask the worker to exit after the current job"""
+        self._stop_event.set()
+    
+    def _heartbeat_loop(self, job_id: str, stop_event: threading.Event):
+        """Renew the job lease periodically until stop_event is set"""
+        while not stop_event.wait(self.heartbeat_interval):
+            with app.app_context():
+                try:
+                    renewed = ExtractionJob.renew_lease(job_id, self.worker_id, self.lease_seconds)
+                    if not renewed:
+                        # The job either just finished or was reclaimed by another worker
+                        if not stop_event.is_set():
+                            logger.warning(f"Worker {self.worker_id} lost the lease on job {job_id}")
+                        return
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Heartbeat failed for job {job_id}: {str(e)}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    worker = ExtractionWorker()
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run_forever()